@@ -0,0 +1,50 @@
+"""
+Benchmark of the silent member reports of ActivityTracker on a big group, no network needed.
+
+A group of --members members posts once each, then pages of the members silent since the middle of the group's
+history are requested. Reported: the time to fill the group and the slowest report of --reports runs.
+The run fails when a report takes longer than --budget seconds.
+
+    python -m benchmarks.activity_report [--members 50000] [--reports 100] [--budget 0.01]
+"""
+
+import argparse
+import sys
+import time
+from typing import List
+
+from bot.activity_tracker import ActivityTracker
+from spec.fakes import FakeActivityStorage
+
+
+GROUP = "#benchmark"
+
+
+def main(arguments: List[str]) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--members", type=int, default=50_000, help="members of the group")
+    parser.add_argument("--reports", type=int, default=100, help="reports to request")
+    parser.add_argument("--budget", type=float, default=0.01, help="seconds a single report may take")
+    options = parser.parse_args(arguments)
+
+    activity_tracker = ActivityTracker(activity_storage=FakeActivityStorage(), max_delay=60)
+    started = time.perf_counter()
+    for index in range(options.members):
+        activity_tracker.record_text(identifier=f"member_{index}@", timestamp=index * 1_000, group=GROUP)
+    print(f"filled {options.members} members in {time.perf_counter() - started:.3f} s")
+
+    slowest = 0.0
+    for report in range(options.reports):
+        started = time.perf_counter()
+        activity_tracker.get_silent_members(group=GROUP, since=options.members * 500, offset=report * 20)
+        slowest = max(slowest, time.perf_counter() - started)
+    activity_tracker.drain()
+    print(f"slowest of {options.reports} reports: {slowest * 1000:.3f} ms, budget {options.budget * 1000:.1f} ms")
+    if slowest > options.budget:
+        print("REGRESSION silent member report over budget")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,81 @@
+"""
+Memory benchmark of the objects the bot keeps per user and per substitution.
+
+Reported per object kind: bytes per instance on its own, and bytes per entry once held in its registry,
+including the registry's dicts and indexes. Measured with tracemalloc, so only Python allocations count.
+
+    python -m benchmarks.memory_footprint [--count 100000]
+"""
+
+import argparse
+import gc
+import sys
+import tracemalloc
+from typing import Callable, List
+
+from bot.command import SubstitutionCommand
+from bot.command_identifier import CommandIdentifier
+from bot.command_registry import CommandRegistry
+from bot.message import Message
+from bot.security_level import SecurityLevel
+from bot.user import User
+from bot.user_registry import UserRegistry
+from spec.fakes import FakeProfileStorage
+
+
+def measure(name: str, count: int, build: Callable[[], object]) -> float:
+    gc.collect()
+    tracemalloc.start()
+    before, _ = tracemalloc.get_traced_memory()
+    built = build()
+    after, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del built
+    bytes_per_entry = (after - before) / count
+    print(f"{name:<32} {bytes_per_entry:>10.1f} B")
+    return bytes_per_entry
+
+
+def main(arguments: List[str]) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--count", type=int, default=100_000, help="instances per measurement")
+    options = parser.parse_args(arguments)
+    count = options.count
+    # the strings are created up front, so only the objects holding them are measured
+    identifiers = [f"member_{index}_abc@talk.kik.com" for index in range(count)]
+    triggers = [f"trigger {index}" for index in range(count)]
+    substitutions = [f"response {index}" for index in range(count)]
+
+    def build_user_registry():
+        profile_storage = FakeProfileStorage()
+        profile_storage.all_profiles = [User(identifier=identifier, security_level=SecurityLevel.USER) for identifier in identifiers]
+        return UserRegistry(profile_storage=profile_storage)
+
+    def build_command_registry():
+        command_registry = CommandRegistry(bot_name="Benchmark")
+        for trigger, substitution in zip(triggers, substitutions):
+            command_registry.register_substitution(trigger=trigger, substitution=substitution, security_level=SecurityLevel.USER)
+        return command_registry
+
+    print(f"{'object':<32} {'per entry':>12}")
+    measure("User", count, lambda: [User(identifier=identifier, security_level=SecurityLevel.USER) for identifier in identifiers])
+    measure("User in UserRegistry", count, build_user_registry)
+    measure(
+        "SubstitutionCommand",
+        count,
+        lambda: [
+            SubstitutionCommand(CommandIdentifier.GET_SUBSTITUTION, trigger, substitution, SecurityLevel.USER)
+            for trigger, substitution in zip(triggers, substitutions)
+        ],
+    )
+    measure("Substitution in CommandRegistry", count, build_command_registry)
+    measure(
+        "Message",
+        count,
+        lambda: [Message(body=trigger, sent_by=identifier, sent_in="#group") for trigger, identifier in zip(triggers, identifiers)],
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
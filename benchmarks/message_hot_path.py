@@ -0,0 +1,184 @@
+"""
+Benchmark of ChatBot.process_message on synthetic message streams.
+
+Every scenario builds a real CommandRegistry and UserRegistry, backed by the FakeProfileStorage from spec/fakes.py so
+no AWS is needed, and replays a seeded stream of messages. Reported per scenario:
+    messages/sec, p50 and p99 latency in microseconds,
+    allocated bytes per message (mean tracemalloc peak while processing a message, measured in a separate pass).
+Timings are the best of three passes with the garbage collector paused, like timeit.
+Results are compared with benchmarks/baseline.json, the run fails when a scenario regresses past the tolerance.
+
+    python -m benchmarks.message_hot_path [--update-baseline] [--tolerance 0.5] [--quick]
+"""
+
+import argparse
+import gc
+import json
+import random
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+from statistics import quantiles
+from typing import Dict, List, Tuple
+
+from bot.chat_bot import ChatBot
+from bot.command_registry import CommandRegistry
+from bot.message import Message
+from bot.security_level import SecurityLevel
+from bot.user import User
+from bot.user_registry import UserRegistry
+from spec.fakes import FakeProfileStorage
+
+
+BASELINE_PATH = Path(__file__).parent / "baseline.json"
+GROUP = "#benchmark"
+BUILTIN_MESSAGES = ["Usage", "Theme", "List", "User List", "Set Theme benchmark"]
+MIXES: Dict[str, Tuple[float, float, float]] = {
+    # share of (substitution hits, builtin commands, chatter that matches nothing)
+    "substitutions": (1.0, 0.0, 0.0),
+    "builtins": (0.0, 1.0, 0.0),
+    "chatter": (0.0, 0.0, 1.0),
+    "mixed": (0.3, 0.1, 0.6),
+}
+
+
+class Scenario:
+    def __init__(self, substitutions: int, users: int, mix: str, messages: int):
+        self.substitutions = substitutions
+        self.users = users
+        self.mix = mix
+        self.messages = messages
+
+    @property
+    def name(self) -> str:
+        return f"subs={self.substitutions} users={self.users} mix={self.mix}"
+
+
+def build_chat_bot(scenario: Scenario) -> ChatBot:
+    profile_storage = FakeProfileStorage()
+    levels = [SecurityLevel.USER, SecurityLevel.USER, SecurityLevel.USER, SecurityLevel.ADMIN, SecurityLevel.GUEST]
+    profile_storage.all_profiles = [
+        User(identifier=f"user_{index}@", security_level=levels[index % len(levels)]) for index in range(scenario.users)
+    ]
+    command_registry = CommandRegistry(bot_name="Benchmark")
+    for index in range(scenario.substitutions):
+        command_registry.register_substitution(
+            trigger=f"trigger {index}", substitution=f"response {index}", security_level=SecurityLevel.USER
+        )
+    return ChatBot(
+        name="Benchmark",
+        owner_identifier="owner@",
+        users_registry=UserRegistry(profile_storage=profile_storage),
+        command_registry=command_registry,
+    )
+
+
+def build_messages(scenario: Scenario, seed: int = 42) -> List[Message]:
+    randomizer = random.Random(seed)
+    substitution_share, builtin_share, _ = MIXES[scenario.mix]
+    messages = []
+    for _ in range(scenario.messages):
+        sender = f"user_{randomizer.randrange(max(scenario.users, 1))}@" if randomizer.random() < 0.9 else "guest@"
+        roll = randomizer.random()
+        if roll < substitution_share and scenario.substitutions:
+            body = f"Trigger {randomizer.randrange(scenario.substitutions)}"
+        elif roll < substitution_share + builtin_share:
+            body = randomizer.choice(BUILTIN_MESSAGES)
+        else:
+            body = f"just chatting about item {randomizer.randrange(1_000_000)} in the group"
+        messages.append(Message(body=body, sent_by=sender, sent_in=GROUP))
+    return messages
+
+
+def time_messages(chat_bot: ChatBot, messages: List[Message]) -> Tuple[float, List[int]]:
+    latencies = []
+    gc.disable()
+    try:
+        started = time.perf_counter()
+        for message in messages:
+            message_started = time.perf_counter_ns()
+            chat_bot.process_message(message)
+            latencies.append(time.perf_counter_ns() - message_started)
+        return time.perf_counter() - started, latencies
+    finally:
+        gc.enable()
+
+
+def run_scenario(scenario: Scenario, repeats: int = 3) -> Dict[str, float]:
+    chat_bot = build_chat_bot(scenario)
+    messages = build_messages(scenario)
+    for message in messages[: len(messages) // 10]:
+        chat_bot.process_message(message)
+
+    elapsed, latencies = min((time_messages(chat_bot, messages) for _ in range(repeats)), key=lambda run: run[0])
+
+    allocated = 0
+    tracemalloc.start()
+    for message in messages:
+        tracemalloc.reset_peak()
+        current, _ = tracemalloc.get_traced_memory()
+        chat_bot.process_message(message)
+        allocated += tracemalloc.get_traced_memory()[1] - current
+    tracemalloc.stop()
+
+    percentiles = quantiles(latencies, n=100)
+    return {
+        "messages_per_second": len(messages) / elapsed,
+        "p50_us": percentiles[49] / 1000,
+        "p99_us": percentiles[98] / 1000,
+        "bytes_per_message": allocated / len(messages),
+    }
+
+
+def scenarios(quick: bool) -> List[Scenario]:
+    sizes = [10, 1_000] if quick else [10, 1_000, 100_000]
+    messages = 500 if quick else 2_000
+    grid = [Scenario(substitutions=size, users=1_000, mix="mixed", messages=messages) for size in sizes]
+    grid += [Scenario(substitutions=1_000, users=size, mix="mixed", messages=messages) for size in sizes if size != 1_000]
+    grid += [Scenario(substitutions=1_000, users=1_000, mix=mix, messages=messages) for mix in MIXES if mix != "mixed"]
+    return grid
+
+
+def find_regressions(name: str, result: Dict[str, float], baseline: Dict[str, float], tolerance: float) -> List[str]:
+    regressions = []
+    if result["messages_per_second"] < baseline["messages_per_second"] * (1 - tolerance):
+        regressions.append(f"{name}: {result['messages_per_second']:.0f} msg/s, baseline {baseline['messages_per_second']:.0f}")
+    for metric in ["p99_us", "bytes_per_message"]:
+        if result[metric] > baseline[metric] * (1 + tolerance):
+            regressions.append(f"{name}: {metric} {result[metric]:.1f}, baseline {baseline[metric]:.1f}")
+    return regressions
+
+
+def main(arguments: List[str]) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--update-baseline", action="store_true", help="store these results as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=0.5, help="allowed relative regression before failing")
+    parser.add_argument("--quick", action="store_true", help="skip the 100k scenarios and replay fewer messages")
+    options = parser.parse_args(arguments)
+
+    baselines = json.loads(BASELINE_PATH.read_text()) if BASELINE_PATH.exists() else {}
+    results = {}
+    regressions = []
+    print(f"{'scenario':<45} {'msg/s':>10} {'p50 us':>9} {'p99 us':>9} {'B/msg':>9}")
+    for scenario in scenarios(quick=options.quick):
+        result = run_scenario(scenario)
+        results[scenario.name] = result
+        print(
+            f"{scenario.name:<45} {result['messages_per_second']:>10.0f} {result['p50_us']:>9.1f} "
+            f"{result['p99_us']:>9.1f} {result['bytes_per_message']:>9.0f}"
+        )
+        if scenario.name in baselines:
+            regressions += find_regressions(scenario.name, result, baselines[scenario.name], options.tolerance)
+
+    if options.update_baseline:
+        BASELINE_PATH.write_text(json.dumps({**baselines, **results}, indent=2, sort_keys=True) + "\n")
+        print(f"Baseline written to {BASELINE_PATH}")
+        return 0
+    for regression in regressions:
+        print(f"REGRESSION {regression}")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
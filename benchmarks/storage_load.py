@@ -0,0 +1,80 @@
+"""
+Load benchmark of ProfileStorage against the in-process fake DynamoDB, no network needed.
+
+Scenarios:
+    roster import: registering a roster of new members through UserRegistry
+    startup scan: building a UserRegistry from a filled profiles table, serially and with parallel segments
+    role changes: granting and revoking roles of existing members
+Every call to the fake sleeps for --latency seconds and a --throttle share of batch items comes back unprocessed.
+Reported per scenario: elapsed time, items/s and the DynamoDB requests made per operation.
+
+    python -m benchmarks.storage_load [--users 5000] [--latency 0.002] [--throttle 0.05] [--segments 4]
+"""
+
+import argparse
+import sys
+import time
+from typing import Callable, Dict, List
+
+from bot.profile_storage import ProfileStorage
+from bot.schema_marker import SchemaMarker
+from bot.security_level import SecurityLevel
+from bot.user import User
+from bot.user_registry import UserRegistry
+from spec.fake_dynamo import FakeDynamoSession
+
+
+def measure(name: str, session: FakeDynamoSession, items: int, action: Callable[[], None]) -> Dict[str, float]:
+    session.request_counts.clear()
+    started = time.perf_counter()
+    action()
+    elapsed = time.perf_counter() - started
+    requests = ", ".join(f"{operation}={count}" for operation, count in sorted(session.request_counts.items()))
+    print(f"{name:<28} {elapsed:>8.3f} s {items / elapsed:>10.0f} items/s   {requests}")
+    return {"elapsed": elapsed, "items_per_second": items / elapsed}
+
+
+def fill_profiles(profile_storage: ProfileStorage, users: int) -> None:
+    profile_storage.store_profiles([User(identifier=f"user_{index}@", security_level=SecurityLevel.USER) for index in range(users)])
+
+
+def main(arguments: List[str]) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--users", type=int, default=5_000, help="roster size")
+    parser.add_argument("--latency", type=float, default=0.002, help="seconds every DynamoDB call takes")
+    parser.add_argument("--throttle", type=float, default=0.05, help="share of batch items DynamoDB leaves unprocessed")
+    parser.add_argument("--segments", type=int, default=4, help="parallel scan segments for the startup scan")
+    options = parser.parse_args(arguments)
+
+    session = FakeDynamoSession(latency=options.latency, throttle_rate=options.throttle)
+    profile_storage = ProfileStorage(session=session, schema_marker=SchemaMarker(path=None))
+    profile_storage.provision()
+
+    users_registry = UserRegistry(profile_storage=profile_storage)
+
+    def import_roster():
+        for index in range(options.users):
+            users_registry.register_user(identifier=f"member_{index}@", role=SecurityLevel.USER)
+
+    print(f"{'scenario':<28} {'elapsed':>10} {'throughput':>16}   requests")
+    measure("roster import (register)", session, options.users, import_roster)
+    measure("roster import (batched)", session, options.users, lambda: fill_profiles(profile_storage, options.users))
+    measure("startup scan (serial)", session, 2 * options.users, lambda: UserRegistry(profile_storage=profile_storage))
+    measure(
+        f"startup scan ({options.segments} segments)",
+        session,
+        2 * options.users,
+        lambda: UserRegistry(profile_storage=profile_storage, scan_segments=options.segments),
+    )
+
+    def change_roles():
+        for index in range(options.users // 10):
+            users_registry.register_user(identifier=f"member_{index}@", role=SecurityLevel.ADMIN)
+            users_registry.register_user(identifier=f"member_{index}@", role=SecurityLevel.USER)
+
+    measure("role changes", session, 2 * (options.users // 10), change_roles)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -2,6 +2,7 @@ from bot.chat_bot import ChatBot
 from bot.command_registry import CommandRegistry
 from bot.message import Message
 from bot.profile_storage import ProfileStorage
+from bot.substitution_storage import SubstitutionStorage
 from bot.user_registry import UserRegistry
 
 
@@ -46,6 +47,6 @@ if __name__ == "__main__":
     bot_name = "Dotty bot"
     profile_storage = ProfileStorage()
     users_registry = UserRegistry(profile_storage=profile_storage)
-    command_registry = CommandRegistry(bot_name=bot_name)
+    command_registry = CommandRegistry(bot_name=bot_name, substitution_storage=SubstitutionStorage())
     dotty_bot = ChatBot(name=bot_name, owner_identifier="Pascal", users_registry=users_registry, command_registry=command_registry)
     bot_loop(the_bot=dotty_bot)
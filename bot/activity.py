@@ -0,0 +1,35 @@
+from typing import Dict, Optional
+
+
+class Activity:
+    """
+    The last text post, image/video post and message read of a user, as epoch milliseconds, 0 when never seen.
+    group_posts holds the last text or media post per group.
+    """
+
+    def __init__(
+        self, identifier: str, last_text: int = 0, last_media: int = 0, last_read: int = 0, group_posts: Optional[Dict[str, int]] = None
+    ):
+        self._identifier: str = identifier
+        self._last_text: int = last_text
+        self._last_media: int = last_media
+        self._last_read: int = last_read
+        self._group_posts: Dict[str, int] = group_posts or {}
+
+    def get_user_identifier(self) -> str:
+        return self._identifier
+
+    def get_last_text(self) -> int:
+        return self._last_text
+
+    def get_last_media(self) -> int:
+        return self._last_media
+
+    def get_last_read(self) -> int:
+        return self._last_read
+
+    def get_group_posts(self) -> Dict[str, int]:
+        return self._group_posts
+
+    def get_last_seen(self) -> int:
+        return max(self._last_text, self._last_media, self._last_read)
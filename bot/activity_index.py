@@ -0,0 +1,37 @@
+from bisect import bisect_left, insort
+from typing import Dict, List, Tuple
+
+
+class ActivityIndex:
+    """
+    The members of one group sorted by their last post, oldest first, so the members silent since a moment
+    are always a prefix of the index and a report is a bisect plus a slice instead of a sort over every member.
+    """
+
+    def __init__(self):
+        self._timestamps: Dict[str, int] = {}
+        self._entries: List[Tuple[int, str]] = []
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, identifier: str) -> int:
+        return self._timestamps.get(identifier, 0)
+
+    def update(self, identifier: str, timestamp: int) -> bool:
+        """Adds the member or moves it to a newer timestamp, False when the index didn't change."""
+        previous = self._timestamps.get(identifier)
+        if previous is not None:
+            if timestamp <= previous:
+                return False
+            del self._entries[bisect_left(self._entries, (previous, identifier))]
+        self._timestamps[identifier] = timestamp
+        insort(self._entries, (timestamp, identifier))
+        return True
+
+    def count_silent_since(self, timestamp: int) -> int:
+        return bisect_left(self._entries, (timestamp, ""))
+
+    def get_silent_since(self, timestamp: int, offset: int = 0, limit: int = 20) -> List[Tuple[int, str]]:
+        end = self.count_silent_since(timestamp)
+        return self._entries[min(offset, end) : min(offset + limit, end)]
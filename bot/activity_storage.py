@@ -0,0 +1,61 @@
+from typing import Iterator, List, Optional
+
+from bot.activity import Activity
+from bot.batch_writer import BatchWriter, BatchWriteReport
+from bot.dynamo_storage import DynamoStorage
+from bot.metrics import instrument
+from bot.schema_marker import SchemaMarker
+
+
+class ActivityStorage(DynamoStorage):
+    def __init__(self, session=None, endpoint_url: Optional[str] = None, schema_marker: Optional[SchemaMarker] = None):
+        super().__init__(session=session, endpoint_url=endpoint_url, schema_marker=schema_marker)
+        self._activity_batch_writer: Optional[BatchWriter] = None
+
+    @property
+    def _batch_writer(self) -> BatchWriter:
+        if self._activity_batch_writer is None:
+            self._activity_batch_writer = self._get_batch_writer(table_name="activity", key_name="identifier")
+        return self._activity_batch_writer
+
+    def provision(self) -> None:
+        if not self._table_exists(table_name="activity"):
+            new_table = self._dyn_db_resource.create_table(
+                TableName="activity",
+                KeySchema=[
+                    {"AttributeName": "identifier", "KeyType": "HASH"},
+                ],
+                AttributeDefinitions=[
+                    {"AttributeName": "identifier", "AttributeType": "S"},
+                ],
+                ProvisionedThroughput={"ReadCapacityUnits": 5, "WriteCapacityUnits": 5},
+            )
+            new_table.wait_until_exists()
+        self.verify_schema()
+
+    def verify_schema(self) -> bool:
+        return self._verify_schema(table_name="activity")
+
+    @instrument(stage="storage")
+    def store_activities(self, activities: List[Activity]) -> BatchWriteReport:
+        return self._batch_writer.put_items(
+            {
+                "identifier": activity.get_user_identifier(),
+                "last_text": activity.get_last_text(),
+                "last_media": activity.get_last_media(),
+                "last_read": activity.get_last_read(),
+                "group_posts": activity.get_group_posts(),
+            }
+            for activity in activities
+        )
+
+    def iterate_activities(self, total_segments: int = 1) -> Iterator[Activity]:
+        attributes = ["identifier", "last_text", "last_media", "last_read", "group_posts"]
+        for item in self._scan(table_name="activity", attributes=attributes, total_segments=total_segments):
+            yield Activity(
+                identifier=item["identifier"],
+                last_text=int(item.get("last_text", 0)),
+                last_media=int(item.get("last_media", 0)),
+                last_read=int(item.get("last_read", 0)),
+                group_posts={group: int(timestamp) for group, timestamp in item.get("group_posts", {}).items()},
+            )
@@ -0,0 +1,123 @@
+import threading
+from array import array
+from typing import Dict, List, Optional, Set, Tuple
+
+from bot.activity import Activity
+from bot.activity_index import ActivityIndex
+from bot.activity_storage import ActivityStorage
+from bot.batch_writer import BatchWriteReport
+from bot.metrics import instrument
+from bot.statics import ago, timestamp_to_datetime
+from bot.write_behind_queue import WriteBehindQueue
+
+
+class ActivityTracker:
+    """
+    Keeps the last text, media and read timestamp of every user in three array columns, indexed by a slot per user.
+    Recording an event only updates a slot and marks the user dirty, the write-behind queue coalesces the dirty users
+    and flushes their current columns to the activity storage in batches.
+    Every group also gets an ActivityIndex of its members by their last post in that group, for the silent member
+    reports, reads and posts in other groups don't count there.
+    """
+
+    def __init__(self, activity_storage: ActivityStorage, max_delay: float = 30.0, max_pending: int = 500):
+        self._activity_storage = activity_storage
+        self._slots: Dict[str, int] = {}
+        self._identifiers: List[str] = []
+        self._last_text = array("q")
+        self._last_media = array("q")
+        self._last_read = array("q")
+        self._group_indexes: Dict[str, ActivityIndex] = {}
+        self._member_groups: Dict[str, Set[str]] = {}
+        self._lock = threading.Lock()
+        self._write_queue = WriteBehindQueue(flush=self._flush, max_delay=max_delay, max_pending=max_pending, name="activity-write-behind")
+
+    def record_text(self, identifier: str, timestamp: int, group: Optional[str] = None) -> None:
+        self._record(self._last_text, identifier=identifier, timestamp=timestamp, group=group, is_post=True)
+
+    def record_media(self, identifier: str, timestamp: int, group: Optional[str] = None) -> None:
+        self._record(self._last_media, identifier=identifier, timestamp=timestamp, group=group, is_post=True)
+
+    def record_read(self, identifier: str, timestamp: int, group: Optional[str] = None) -> None:
+        self._record(self._last_read, identifier=identifier, timestamp=timestamp, group=group, is_post=False)
+
+    def add_member(self, group: str, identifier: str) -> None:
+        with self._lock:
+            self._slot(identifier)
+            self._update_group_index(group=group, identifier=identifier, timestamp=0)
+
+    def get_silent_members(self, group: str, since: int, offset: int = 0, limit: int = 20) -> Tuple[List[Tuple[int, str]], int]:
+        """A page of the group's members without a post in it since the epoch milliseconds, oldest first, and their total."""
+        with self._lock:
+            group_index = self._group_indexes.get(group)
+            if not group_index:
+                return [], 0
+            return group_index.get_silent_since(since, offset=offset, limit=limit), group_index.count_silent_since(since)
+
+    def get_activity(self, identifier: str) -> Optional[Activity]:
+        with self._lock:
+            slot = self._slots.get(identifier)
+            if slot is None:
+                return None
+            group_posts = {group: self._group_indexes[group].get(identifier) for group in self._member_groups.get(identifier, ())}
+            return Activity(
+                identifier,
+                self._last_text[slot],
+                self._last_media[slot],
+                self._last_read[slot],
+                group_posts={group: timestamp for group, timestamp in group_posts.items() if timestamp},
+            )
+
+    def last_seen(self, identifier: str) -> Optional[str]:
+        activity = self.get_activity(identifier)
+        if not activity or not activity.get_last_seen():
+            return None
+        return ago(timestamp_to_datetime(activity.get_last_seen() / 1000))
+
+    @instrument(stage="activity_tracker")
+    def load_activities(self, total_segments: int = 1) -> None:
+        """Merges the stored activity into the columns, newer timestamps recorded in the meantime are kept."""
+        for activity in self._activity_storage.iterate_activities(total_segments=total_segments):
+            with self._lock:
+                slot = self._slot(activity.get_user_identifier())
+                self._last_text[slot] = max(self._last_text[slot], activity.get_last_text())
+                self._last_media[slot] = max(self._last_media[slot], activity.get_last_media())
+                self._last_read[slot] = max(self._last_read[slot], activity.get_last_read())
+                for group, timestamp in activity.get_group_posts().items():
+                    self._update_group_index(group=group, identifier=activity.get_user_identifier(), timestamp=timestamp)
+
+    def pending_count(self) -> int:
+        return self._write_queue.pending_count()
+
+    def drain(self, timeout: Optional[float] = None) -> None:
+        self._write_queue.drain(timeout=timeout)
+
+    def _record(self, column: array, identifier: str, timestamp: int, group: Optional[str], is_post: bool) -> None:
+        with self._lock:
+            slot = self._slot(identifier)
+            changed = False
+            if group:
+                changed = self._update_group_index(group=group, identifier=identifier, timestamp=timestamp if is_post else 0)
+            if timestamp > column[slot]:
+                column[slot] = timestamp
+                changed = True
+        if changed:
+            self._write_queue.put(key=identifier, item=identifier)
+
+    def _slot(self, identifier: str) -> int:
+        slot = self._slots.get(identifier)
+        if slot is None:
+            slot = self._slots[identifier] = len(self._identifiers)
+            self._identifiers.append(identifier)
+            self._last_text.append(0)
+            self._last_media.append(0)
+            self._last_read.append(0)
+        return slot
+
+    def _update_group_index(self, group: str, identifier: str, timestamp: int) -> bool:
+        """Adds the member to the group, with timestamp as its last post there, True when that post is new."""
+        self._member_groups.setdefault(identifier, set()).add(group)
+        return self._group_indexes.setdefault(group, ActivityIndex()).update(identifier, timestamp) and timestamp > 0
+
+    def _flush(self, identifiers: List[str]) -> BatchWriteReport:
+        return self._activity_storage.store_activities([self.get_activity(identifier) for identifier in identifiers])
@@ -0,0 +1,42 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, Union
+
+from bot.activity_tracker import ActivityTracker
+from bot.chat_bot import ChatBot
+from bot.command_registry import CommandRegistry
+from bot.message import Message
+from bot.sharded_command_registry import ShardedCommandRegistry
+from bot.user_registry import UserRegistry
+
+
+class AsyncChatBot(ChatBot):
+    """
+    ChatBot for asyncio callers.
+    Messages are processed on a small thread pool so a storage round-trip, like loading a group's substitutions,
+    never blocks the event loop.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        owner_identifier: str,
+        users_registry: UserRegistry,
+        command_registry: Union[CommandRegistry, ShardedCommandRegistry],
+        max_workers: int = 4,
+        activity_tracker: Optional[ActivityTracker] = None,
+    ):
+        super().__init__(
+            name=name,
+            owner_identifier=owner_identifier,
+            users_registry=users_registry,
+            command_registry=command_registry,
+            activity_tracker=activity_tracker,
+        )
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="chat-bot")
+
+    async def process_message_async(self, message: Message) -> Optional[str]:
+        return await asyncio.get_running_loop().run_in_executor(self._executor, self.process_message, message)
+
+    def shutdown(self) -> None:
+        self._executor.shutdown(wait=True)
@@ -0,0 +1,76 @@
+import time
+from typing import Any, Callable, Dict, Iterable, List
+
+
+class BatchWriteReport:
+    def __init__(self):
+        self.items_written: int = 0
+        self.requests: int = 0
+        self.retries: int = 0
+        self.elapsed_seconds: float = 0.0
+        self.unprocessed_items: List[Dict] = []
+        self.unprocessed_keys: List[Any] = []
+
+    def __repr__(self):
+        return (
+            f"{self.items_written} items in {self.requests} requests, {self.retries} retries, "
+            f"{len(self.unprocessed_items)} unprocessed, {self.items_per_second():.1f} items/s"
+        )
+
+    def items_per_second(self) -> float:
+        if not self.elapsed_seconds:
+            return 0.0
+        return self.items_written / self.elapsed_seconds
+
+
+class BatchWriter:
+    """
+    Writes items with BatchWriteItem, 25 puts per request.
+    Items DynamoDB hands back as UnprocessedItems are resent with exponential backoff;
+    whatever is still unprocessed after max_retries ends up in the report for the caller.
+    """
+
+    MAX_BATCH_SIZE = 25
+
+    def __init__(
+        self,
+        dyn_db_resource,
+        table_name: str,
+        key_name: str,
+        max_retries: int = 8,
+        base_delay: float = 0.05,
+        max_delay: float = 5.0,
+        sleep: Callable[[float], None] = time.sleep,
+    ):
+        self._dyn_db_resource = dyn_db_resource
+        self._table_name = table_name
+        self._key_name = key_name
+        self._max_retries = max_retries
+        self._base_delay = base_delay
+        self._max_delay = max_delay
+        self._sleep = sleep
+
+    def put_items(self, items: Iterable[Dict]) -> BatchWriteReport:
+        report = BatchWriteReport()
+        started = time.perf_counter()
+        unique_items = list({item[self._key_name]: item for item in items}.values())
+        for start in range(0, len(unique_items), self.MAX_BATCH_SIZE):
+            batch = [{"PutRequest": {"Item": item}} for item in unique_items[start : start + self.MAX_BATCH_SIZE]]
+            self._write_batch(batch, report)
+        report.elapsed_seconds = time.perf_counter() - started
+        return report
+
+    def _write_batch(self, batch: List[Dict], report: BatchWriteReport) -> None:
+        for attempt in range(self._max_retries + 1):
+            if attempt:
+                self._sleep(min(self._max_delay, self._base_delay * 2 ** (attempt - 1)))
+                report.retries += 1
+            response = self._dyn_db_resource.batch_write_item(RequestItems={self._table_name: batch})
+            report.requests += 1
+            unprocessed = response.get("UnprocessedItems", {}).get(self._table_name, [])
+            report.items_written += len(batch) - len(unprocessed)
+            if not unprocessed:
+                return
+            batch = unprocessed
+        report.unprocessed_items.extend(request["PutRequest"]["Item"] for request in batch)
+        report.unprocessed_keys.extend(request["PutRequest"]["Item"][self._key_name] for request in batch)
@@ -1,105 +1,204 @@
-from typing import Optional
+import re
+import time
+from typing import Optional, Union
 
-from bot.command import Command
+from bot.activity_tracker import ActivityTracker
+from bot.command import Command, PatternSubstitutionCommand
 from bot.command_identifier import CommandIdentifier
 from bot.command_registry import CommandRegistry
 from bot.message import Message
+from bot.metrics import instrument
 from bot.security_level import SecurityLevel
+from bot.sharded_command_registry import ShardedCommandRegistry
+from bot.statics import ago, jid_to_username, timestamp_to_datetime
 from bot.user_registry import UserRegistry
 
 
+SILENT_MEMBERS_PAGE_SIZE = 20
+DAY_IN_MILLISECONDS = 24 * 60 * 60 * 1000
+
+
+def _command_label(chat_bot, command: Command, *args, **kwargs) -> str:
+    return getattr(command.identifier, "name", str(command.identifier))
+
+
 class ChatBot:
-    def __init__(self, name: str, owner_identifier: str, users_registry: UserRegistry, command_registry: CommandRegistry):
+    def __init__(
+        self,
+        name: str,
+        owner_identifier: str,
+        users_registry: UserRegistry,
+        command_registry: Union[CommandRegistry, ShardedCommandRegistry],
+        activity_tracker: Optional[ActivityTracker] = None,
+    ):
         self._name: str = name
         self._theme: str = "No theme set"
         self._users_registry = users_registry
         self._users_registry.register_user(owner_identifier, SecurityLevel.OWNER)
         self._command_registry = command_registry
+        self._activity_tracker = activity_tracker
 
     def update_user(self, user_jid, role: SecurityLevel = SecurityLevel.UNKNOWN):
         if not self._users_registry.is_registered_user(identifier=user_jid):
             self._users_registry.register_user(identifier=user_jid, role=role)
 
+    @instrument(stage="chat_bot")
     def process_message(self, message: Message) -> str:
+        command_registry = self._command_registry.for_group(message.sent_in)
         user_security_level = self._get_user_security_level(message.sent_by)
-        command = self._command_registry.get_matching_command(message.body, user_security_level)
+        command = command_registry.get_matching_command(message.body, user_security_level, casefolded_message=message.get_casefolded_body())
         if command:
-            return self._process_command(command, message, user_security_level)
+            return self._process_command(command, message, user_security_level, command_registry)
 
     def _get_user_security_level(self, user_identifier) -> SecurityLevel:
-        if self._users_registry.is_registered_user(user_identifier):
-            return self._users_registry.get_user(user_identifier).get_user_clearance_level()
+        user = self._users_registry.find_user(user_identifier)
+        if user:
+            return user.get_user_clearance_level()
         return SecurityLevel.GUEST
 
-    def _process_command(self, command: Command, message: Message, user_security_level: SecurityLevel) -> Optional[str]:
+    @instrument(stage="command", label=_command_label)
+    def _process_command(
+        self, command: Command, message: Message, user_security_level: SecurityLevel, command_registry: CommandRegistry
+    ) -> Optional[str]:
         match command.identifier:
             # COMMANDS
             case CommandIdentifier.LIST_COMMANDS:
-                return self._list_commands(user_security_level=user_security_level)
+                return self._list_commands(user_security_level=user_security_level, command_registry=command_registry)
             # SUBSTITUTIONS
             case CommandIdentifier.SET_USER_SUBSTITUTION:
-                return self._set_substitution(command=command, message_body=message.body, security_level=SecurityLevel.USER)
+                return self._set_substitution(
+                    command=command, message=message, security_level=SecurityLevel.USER, command_registry=command_registry
+                )
             case CommandIdentifier.SET_ADMIN_SUBSTITUTION:
-                return self._set_substitution(command=command, message_body=message.body, security_level=SecurityLevel.ADMIN)
+                return self._set_substitution(
+                    command=command, message=message, security_level=SecurityLevel.ADMIN, command_registry=command_registry
+                )
             case CommandIdentifier.LIST_SUBSTITUTIONS:
-                return self._list_substitutions(user_security_level=user_security_level)
+                return self._list_substitutions(user_security_level=user_security_level, command_registry=command_registry)
             case CommandIdentifier.GET_SUBSTITUTION:
                 return str(command)
+            case CommandIdentifier.SET_PATTERN_SUBSTITUTION:
+                return self._set_pattern_substitution(command=command, message=message, command_registry=command_registry)
+            case CommandIdentifier.GET_PATTERN_SUBSTITUTION:
+                return self._render_pattern_substitution(command=command, message=message)
             # USERS
             case CommandIdentifier.LIST_USERS:
-                return self._list_users()
+                return self._list_users(command=command, message=message)
+            case CommandIdentifier.LAST_SEEN:
+                return self._last_seen(command=command, message=message)
+            case CommandIdentifier.LIST_SILENT_MEMBERS:
+                return self._list_silent_members(command=command, message=message)
             # THEME
             case CommandIdentifier.SET_THEME:
-                return self._set_theme(command=command, message_body=message.body)
+                return self._set_theme(command=command, message=message)
             case CommandIdentifier.GET_THEME:
                 return self._get_theme()
             # OWNER
             case CommandIdentifier.SET_ROLE_OWNER:
-                return self._set_role(command=command, message_body=message.body, destination_role=SecurityLevel.OWNER)
+                return self._set_role(command=command, message=message, destination_role=SecurityLevel.OWNER)
             case CommandIdentifier.REMOVE_ROLE_OWNER:
-                return self._set_role(command=command, message_body=message.body, destination_role=SecurityLevel.ADMIN, revoke=True)
+                return self._set_role(command=command, message=message, destination_role=SecurityLevel.ADMIN, revoke=True)
             # ADMIN
             case CommandIdentifier.SET_ROLE_ADMIN:
-                return self._set_role(command=command, message_body=message.body, destination_role=SecurityLevel.ADMIN)
+                return self._set_role(command=command, message=message, destination_role=SecurityLevel.ADMIN)
             case CommandIdentifier.REMOVE_ROLE_ADMIN:
-                return self._set_role(command=command, message_body=message.body, destination_role=SecurityLevel.USER, revoke=True)
+                return self._set_role(command=command, message=message, destination_role=SecurityLevel.USER, revoke=True)
             # USER
             case CommandIdentifier.SET_ROLE_USER:
-                return self._set_role(command=command, message_body=message.body, destination_role=SecurityLevel.USER)
+                return self._set_role(command=command, message=message, destination_role=SecurityLevel.USER)
             case CommandIdentifier.REMOVE_ROLE_USER:
-                return self._set_role(command=command, message_body=message.body, destination_role=SecurityLevel.GUEST, revoke=True)
+                return self._set_role(command=command, message=message, destination_role=SecurityLevel.GUEST, revoke=True)
             case _:
                 return
 
-    def _list_users(self) -> str:
-        return f"The current users\n{self._users_registry.get_user_listing()}"
+    def _list_users(self, command: Command, message: Message) -> Optional[str]:
+        argument = message.get_arguments(command.get_trigger()).strip()
+        if argument and not argument.isdigit():
+            return
+        page = max(int(argument or 1), 1)
+        pages = self._users_registry.count_user_listing_pages()
+        if pages <= 1:
+            return f"The current users\n{self._users_registry.get_user_listing()}"
+        return f"The current users, page {page}/{pages}\n{self._users_registry.get_user_listing(page=page)}"
+
+    def _last_seen(self, command: Command, message: Message) -> Optional[str]:
+        if not self._activity_tracker:
+            return
+        user_identifier = message.get_arguments(command.get_trigger())
+        last_seen = self._activity_tracker.last_seen(user_identifier)
+        if not last_seen:
+            return f"I haven't seen {user_identifier} yet"
+        return f"{user_identifier} was last seen {last_seen}"
 
-    def _set_substitution(self, command: Command, message_body: str, security_level: SecurityLevel) -> Optional[str]:
-        trigger, substitution = message_body.split(command.get_trigger())
-        new_command = self._command_registry.register_substitution(
-            trigger=trigger, substitution=substitution, security_level=security_level
+    def _list_silent_members(self, command: Command, message: Message) -> Optional[str]:
+        if not self._activity_tracker:
+            return
+        arguments = message.get_arguments(command.get_trigger()).split()
+        if not 1 <= len(arguments) <= 2 or not all(argument.isdigit() for argument in arguments):
+            return f"Usage: {command.get_trigger()}<days> [page]"
+        days, page = int(arguments[0]), max(int(arguments[1]), 1) if len(arguments) == 2 else 1
+        since = int(time.time() * 1000) - days * DAY_IN_MILLISECONDS
+        members, total = self._activity_tracker.get_silent_members(
+            group=message.sent_in, since=since, offset=(page - 1) * SILENT_MEMBERS_PAGE_SIZE, limit=SILENT_MEMBERS_PAGE_SIZE
+        )
+        if not total:
+            return f"Nobody has been silent for {days} days"
+        pages = -(-total // SILENT_MEMBERS_PAGE_SIZE)
+        lines = [
+            f"{jid_to_username(identifier)}: {ago(timestamp_to_datetime(last_seen / 1000)) if last_seen else 'never'}"
+            for last_seen, identifier in members
+        ]
+        return "\n".join([f"{total} members silent for {days} days, page {page}/{pages}", *lines])
+
+    def _set_substitution(
+        self, command: Command, message: Message, security_level: SecurityLevel, command_registry: CommandRegistry
+    ) -> Optional[str]:
+        trigger, substitution = message.body.split(command.get_trigger())
+        new_command = command_registry.register_substitution(
+            trigger=trigger, substitution=substitution, security_level=security_level, group=message.sent_in
         )
         if not new_command:
             return
         return f'When you say: "{new_command.get_trigger()}", I say: {new_command}'
 
+    def _set_pattern_substitution(self, command: Command, message: Message, command_registry: CommandRegistry) -> Optional[str]:
+        trigger, substitution = message.body.split(command.get_trigger())
+        try:
+            new_command = command_registry.register_pattern_substitution(
+                trigger=trigger, substitution=substitution, security_level=SecurityLevel.USER, group=message.sent_in
+            )
+        except re.error as error:
+            return f'The pattern "{trigger}" is not valid: {error.msg}'
+        if not new_command:
+            return
+        return f'When you say something like: "{new_command.get_trigger()}", I say: {new_command}'
+
+    def _render_pattern_substitution(self, command: PatternSubstitutionCommand, message: Message) -> str:
+        return command.render(
+            {
+                "sender": jid_to_username(message.sent_by),
+                "theme": self._theme,
+                "since": ago(timestamp_to_datetime(command.get_created_at())),
+            }
+        )
+
     def _get_theme(self) -> str:
         return self._theme
 
-    def _set_theme(self, command: Command, message_body: str) -> str:
-        self._theme = message_body[len(command.get_trigger()) :]
+    def _set_theme(self, command: Command, message: Message) -> str:
+        self._theme = message.get_arguments(command.get_trigger())
         return f"Theme set to: {self._theme}"
 
-    def _list_substitutions(self, user_security_level: SecurityLevel) -> str:
-        substitutions_string = self._command_registry.get_substitution_listing(user_security_level)
+    def _list_substitutions(self, user_security_level: SecurityLevel, command_registry: CommandRegistry) -> str:
+        substitutions_string = command_registry.get_substitution_listing(user_security_level)
         return f"These substitutions are set: {substitutions_string}"
 
-    def _list_commands(self, user_security_level: SecurityLevel) -> str:
-        commands_string = self._command_registry.get_commands_string(user_security_level=user_security_level)
+    def _list_commands(self, user_security_level: SecurityLevel, command_registry: CommandRegistry) -> str:
+        commands_string = command_registry.get_commands_string(user_security_level=user_security_level)
         return f"These commands are available:\n{commands_string}"
 
-    def _set_role(self, command: Command, message_body: str, destination_role: SecurityLevel, revoke: bool = False) -> str:
-        user_identifier = message_body[len(command.get_trigger()) :]
+    def _set_role(self, command: Command, message: Message, destination_role: SecurityLevel, revoke: bool = False) -> str:
+        user_identifier = message.get_arguments(command.get_trigger())
         user_role = self._get_user_security_level(user_identifier)
         if revoke:
             if user_role < destination_role:
@@ -1,27 +1,42 @@
+import re
+import time
+from typing import Dict, Optional
+
 from bot.command_identifier import CommandIdentifier
 from bot.command_type import CommandType
+from bot.patterns import MAX_PATTERN_MESSAGE_LENGTH, compile_pattern
 from bot.security_level import SecurityLevel
 
 
 class Command:
+    # slotted, and the type is a class attribute, so a registry of many substitutions stays small
+    __slots__ = ("_trigger", "_trigger_lower_case", "_description", "identifier", "_security_level")
+    _type: CommandType = CommandType.UNSET
+
     def __init__(self, identifier: CommandIdentifier, trigger: str, description: str, security_level: SecurityLevel):
         self._trigger: str = trigger
+        trigger_lower_case = trigger.casefold()
+        # an already casefolded trigger shares its string instead of holding a copy
+        self._trigger_lower_case: str = trigger if trigger_lower_case == trigger else trigger_lower_case
         self._description: str = description
         self.identifier: CommandIdentifier = identifier
-        self._type: CommandType = CommandType.UNSET
         self._security_level: SecurityLevel = security_level
 
     def __repr__(self):
         return f'"{self._trigger}" - {self._description}'
 
-    def has_match(self, message_body: str, user_security_level: SecurityLevel) -> bool:
+    def has_match(self, message_body: str, user_security_level: SecurityLevel, casefolded_body: Optional[str] = None) -> bool:
+        """Pass the casefolded body when testing a message against several commands, so it is only casefolded once."""
         pass
 
     def get_trigger(self) -> str:
         return self._trigger
 
     def get_trigger_lower_case(self) -> str:
-        return self._trigger.casefold()
+        return self._trigger_lower_case
+
+    def get_type(self) -> CommandType:
+        return self._type
 
     def is_substitution(self):
         return self._type == CommandType.SUBSTITUTION
@@ -34,48 +49,88 @@ class Command:
 
 
 class StartsWithCommand(Command):
-    def __init__(self, identifier: CommandIdentifier, trigger: str, description: str, security_level: SecurityLevel):
-        super().__init__(identifier, trigger, description, security_level)
-        self._type: CommandType = CommandType.STARTS_WITH
+    __slots__ = ()
+    _type: CommandType = CommandType.STARTS_WITH
 
-    def has_match(self, message: str, user_security_level: SecurityLevel) -> bool:
+    def has_match(self, message: str, user_security_level: SecurityLevel, casefolded_body: Optional[str] = None) -> bool:
         if not self.has_clearance(user_security_level):
             return False
-        return message.casefold().startswith(self.get_trigger_lower_case())
+        return (casefolded_body or message.casefold()).startswith(self._trigger_lower_case)
 
 
 class ContainsCommand(Command):
-    def __init__(self, identifier: CommandIdentifier, trigger: str, description: str, security_level: SecurityLevel):
-        super().__init__(identifier, trigger, description, security_level)
-        self._type: CommandType = CommandType.CONTAINS
+    __slots__ = ()
+    _type: CommandType = CommandType.CONTAINS
 
-    def has_match(self, message_body: str, user_security_level: SecurityLevel) -> bool:
+    def has_match(self, message_body: str, user_security_level: SecurityLevel, casefolded_body: Optional[str] = None) -> bool:
         if not self.has_clearance(user_security_level):
             return False
-        return self.get_trigger_lower_case() in message_body.casefold()
+        return self._trigger_lower_case in (casefolded_body or message_body.casefold())
 
 
 class ExactCommand(Command):
-    def __init__(self, identifier: CommandIdentifier, trigger: str, description: str, security_level: SecurityLevel):
-        super().__init__(identifier, trigger, description, security_level)
-        self._type: CommandType = CommandType.EXACT
+    __slots__ = ()
+    _type: CommandType = CommandType.EXACT
 
-    def has_match(self, message_body: str, user_security_level: SecurityLevel) -> bool:
+    def has_match(self, message_body: str, user_security_level: SecurityLevel, casefolded_body: Optional[str] = None) -> bool:
         if not self.has_clearance(user_security_level):
             return False
-        return self.get_trigger_lower_case() == message_body.casefold()
+        return self._trigger_lower_case == (casefolded_body or message_body.casefold())
 
 
 class SubstitutionCommand(Command):
+    __slots__ = ("_substitution",)
+    _type: CommandType = CommandType.SUBSTITUTION
+
     def __init__(self, identifier: CommandIdentifier, trigger: str, substitution: str, security_level: SecurityLevel):
         super().__init__(identifier, trigger, "substitution", security_level)
-        self._type: CommandType = CommandType.SUBSTITUTION
         self._substitution = substitution
 
-    def has_match(self, message_body: str, user_security_level: SecurityLevel) -> bool:
+    def has_match(self, message_body: str, user_security_level: SecurityLevel, casefolded_body: Optional[str] = None) -> bool:
         if not self.has_clearance(user_security_level):
             return False
-        return self.get_trigger_lower_case() == message_body.casefold()
+        return self._trigger_lower_case == (casefolded_body or message_body.casefold())
+
+    def get_substitution(self) -> str:
+        return self._substitution
 
     def __repr__(self):
         return self._substitution
+
+
+class PatternSubstitutionCommand(SubstitutionCommand):
+    """
+    A substitution on a glob or /regex/ trigger, matched against the whole message.
+    The substitution is a template, {sender}, {theme} and {since} are filled in when it is rendered.
+    """
+
+    __slots__ = ("_pattern", "_created_at")
+    _type: CommandType = CommandType.PATTERN
+    _PLACEHOLDER = re.compile(r"\{(sender|theme|since)\}")
+
+    def __init__(
+        self,
+        identifier: CommandIdentifier,
+        trigger: str,
+        substitution: str,
+        security_level: SecurityLevel,
+        created_at: Optional[float] = None,
+    ):
+        super().__init__(identifier, trigger, substitution, security_level)
+        # raises re.error for a trigger that doesn't compile or isn't supported
+        self._pattern: re.Pattern = compile_pattern(trigger)
+        self._created_at: float = created_at if created_at is not None else time.time()
+
+    def has_match(self, message_body: str, user_security_level: SecurityLevel, casefolded_body: Optional[str] = None) -> bool:
+        if not self.has_clearance(user_security_level) or len(message_body) > MAX_PATTERN_MESSAGE_LENGTH:
+            return False
+        return self._pattern.fullmatch(casefolded_body or message_body.casefold()) is not None
+
+    def is_substitution(self):
+        return True
+
+    def get_created_at(self) -> float:
+        return self._created_at
+
+    def render(self, values: Dict[str, str]) -> str:
+        return self._PLACEHOLDER.sub(lambda placeholder: values.get(placeholder.group(1), placeholder.group(0)), self._substitution)
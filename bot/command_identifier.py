@@ -10,10 +10,14 @@ class CommandIdentifier(Enum):
     SET_ADMIN_SUBSTITUTION = auto()
     LIST_SUBSTITUTIONS = auto()
     GET_SUBSTITUTION = auto()
+    SET_PATTERN_SUBSTITUTION = auto()
+    GET_PATTERN_SUBSTITUTION = auto()
     SET_ROLE_OWNER = auto()
     REMOVE_ROLE_OWNER = auto()
     SET_ROLE_ADMIN = auto()
     REMOVE_ROLE_ADMIN = auto()
     SET_ROLE_USER = auto()
     REMOVE_ROLE_USER = auto()
+    LAST_SEEN = auto()
+    LIST_SILENT_MEMBERS = auto()
     UNSET = auto()
@@ -0,0 +1,239 @@
+import re
+from collections import deque
+from itertools import count
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from bot.command import Command
+from bot.command_type import CommandType
+from bot.patterns import MAX_PATTERN_MESSAGE_LENGTH, compile_alternation
+from bot.security_level import SecurityLevel
+
+
+Entry = Tuple[int, Command]
+
+
+class _TrieNode:
+    __slots__ = ("children", "entries")
+
+    def __init__(self):
+        self.children: Dict[str, "_TrieNode"] = {}
+        self.entries: List[Entry] = []
+
+
+class _PrefixTrie:
+    def __init__(self):
+        self._root = _TrieNode()
+
+    def add(self, key: str, entry: Entry) -> None:
+        node = self._root
+        for character in key:
+            node = node.children.setdefault(character, _TrieNode())
+        node.entries.append(entry)
+
+    def remove(self, key: str, entry: Entry) -> None:
+        path = [self._root]
+        for character in key:
+            path.append(path[-1].children[character])
+        path[-1].entries.remove(entry)
+        for depth in range(len(key), 0, -1):
+            node = path[depth]
+            if node.entries or node.children:
+                break
+            del path[depth - 1].children[key[depth - 1]]
+
+    def search(self, text: str) -> Iterator[Entry]:
+        node = self._root
+        yield from node.entries
+        for character in text:
+            node = node.children.get(character)
+            if node is None:
+                return
+            yield from node.entries
+
+
+class _AhoCorasick:
+    def __init__(self):
+        self._patterns: Dict[str, List[Entry]] = {}
+        self._goto: List[Dict[str, int]] = []
+        self._fail: List[int] = []
+        self._output: List[List[str]] = []
+        self._compiled = True
+
+    def add(self, pattern: str, entry: Entry) -> None:
+        self._patterns.setdefault(pattern, []).append(entry)
+        self._compiled = False
+
+    def remove(self, pattern: str, entry: Entry) -> None:
+        entries = self._patterns[pattern]
+        entries.remove(entry)
+        if not entries:
+            del self._patterns[pattern]
+        self._compiled = False
+
+    def search(self, text: str) -> Iterator[Entry]:
+        if not self._patterns:
+            return
+        if not self._compiled:
+            self._compile()
+        matched = set(self._output[0])
+        state = 0
+        for character in text:
+            while state and character not in self._goto[state]:
+                state = self._fail[state]
+            state = self._goto[state].get(character, 0)
+            matched.update(self._output[state])
+        for pattern in matched:
+            yield from self._patterns[pattern]
+
+    def _compile(self) -> None:
+        self._goto = [{}]
+        self._fail = [0]
+        self._output = [[]]
+        for pattern in self._patterns:
+            state = 0
+            for character in pattern:
+                if character not in self._goto[state]:
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._output.append([])
+                    self._goto[state][character] = len(self._goto) - 1
+                state = self._goto[state][character]
+            self._output[state].append(pattern)
+
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for character, next_state in self._goto[state].items():
+                queue.append(next_state)
+                fallback = self._fail[state]
+                while fallback and character not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                self._fail[next_state] = self._goto[fallback].get(character, 0)
+                self._output[next_state] = self._output[next_state] + self._output[self._fail[next_state]]
+        self._compiled = True
+
+
+class _PatternSet:
+    """
+    Pattern triggers compiled into a single alternation in rank order, so a message costs one regex evaluation
+    however many patterns there are. The alternation is recompiled on every change, or taken from the cache,
+    and a pattern that doesn't compile into it is rejected with re.error before it is added.
+    """
+
+    def __init__(self):
+        self._entries: Dict[int, Entry] = {}
+        self._alternation: Optional[re.Pattern] = None
+
+    def add(self, entry: Entry) -> None:
+        entries = {**self._entries, entry[0]: entry}
+        self._alternation = self._compile(entries)
+        self._entries = entries
+
+    def remove(self, entry: Entry) -> None:
+        del self._entries[entry[0]]
+        self._alternation = self._compile(self._entries)
+
+    def search(self, text: str) -> Iterator[Entry]:
+        if self._alternation is None or len(text) > MAX_PATTERN_MESSAGE_LENGTH:
+            return
+        match = self._alternation.fullmatch(text)
+        if match:
+            yield self._entries[int(match.lastgroup[1:])]
+
+    @staticmethod
+    def _compile(entries: Dict[int, Entry]) -> Optional[re.Pattern]:
+        if not entries:
+            return None
+        return compile_alternation(tuple((rank, command.get_trigger()) for rank, command in sorted(entries.values())))
+
+
+class _Partition:
+    """The compiled triggers of the commands of one SecurityLevel."""
+
+    def __init__(self):
+        self.exact: Dict[str, List[Entry]] = {}
+        self.starts_with = _PrefixTrie()
+        self.contains = _AhoCorasick()
+        self.patterns = _PatternSet()
+
+    def add(self, trigger: str, command_type: CommandType, entry: Entry) -> None:
+        match command_type:
+            case CommandType.EXACT | CommandType.SUBSTITUTION:
+                self.exact.setdefault(trigger, []).append(entry)
+            case CommandType.STARTS_WITH:
+                self.starts_with.add(trigger, entry)
+            case CommandType.CONTAINS:
+                self.contains.add(trigger, entry)
+            case CommandType.PATTERN:
+                self.patterns.add(entry)
+
+    def remove(self, trigger: str, command_type: CommandType, entry: Entry) -> None:
+        match command_type:
+            case CommandType.EXACT | CommandType.SUBSTITUTION:
+                entries = self.exact[trigger]
+                entries.remove(entry)
+                if not entries:
+                    del self.exact[trigger]
+            case CommandType.STARTS_WITH:
+                self.starts_with.remove(trigger, entry)
+            case CommandType.CONTAINS:
+                self.contains.remove(trigger, entry)
+            case CommandType.PATTERN:
+                self.patterns.remove(entry)
+
+    def candidates(self, casefolded_message: str) -> Iterator[Entry]:
+        yield from self.exact.get(casefolded_message, ())
+        yield from self.starts_with.search(casefolded_message)
+        yield from self.contains.search(casefolded_message)
+        yield from self.patterns.search(casefolded_message)
+
+
+class CommandMatcher:
+    """
+    Compiled lookup over a set of commands.
+    Exact and substitution triggers live in a hash map, starts-with triggers in a prefix trie
+    and contains triggers in an Aho-Corasick automaton, so a message is casefolded once and
+    never compared against every command. Each command keeps the rank it was added with;
+    the lowest ranked cleared match wins, just like walking the commands in order.
+    The triggers are partitioned by the SecurityLevel of their command and a message is only
+    searched in the partitions the sender has clearance for, so a guest never touches admin commands.
+    """
+
+    def __init__(self, commands: Iterable[Command] = ()):
+        self._ranks = count()
+        self._entries: Dict[Command, Entry] = {}
+        self._partitions: Dict[SecurityLevel, _Partition] = {}
+        self._cleared_partitions: Dict[SecurityLevel, List[_Partition]] = {}
+        for command in commands:
+            self.add(command)
+
+    def add(self, command: Command) -> None:
+        """Raises re.error, without adding the command, when its pattern can't be combined with the others."""
+        entry = (next(self._ranks), command)
+        partition = self._partitions.get(command.get_security_level())
+        if partition is None:
+            partition = self._partitions[command.get_security_level()] = _Partition()
+            self._cleared_partitions.clear()
+        partition.add(command.get_trigger_lower_case(), command.get_type(), entry)
+        self._entries[command] = entry
+
+    def remove(self, command: Command) -> None:
+        entry = self._entries.pop(command)
+        self._partitions[command.get_security_level()].remove(command.get_trigger_lower_case(), command.get_type(), entry)
+
+    def match(self, casefolded_message: str, user_security_level: SecurityLevel) -> Optional[Command]:
+        best: Optional[Entry] = None
+        for partition in self._get_cleared_partitions(user_security_level):
+            for entry in partition.candidates(casefolded_message):
+                if best is None or entry[0] < best[0]:
+                    best = entry
+        if best:
+            return best[1]
+
+    def _get_cleared_partitions(self, user_security_level: SecurityLevel) -> List[_Partition]:
+        cleared_partitions = self._cleared_partitions.get(user_security_level)
+        if cleared_partitions is None:
+            cleared_partitions = self._cleared_partitions[user_security_level] = [
+                partition for level, partition in self._partitions.items() if level <= user_security_level
+            ]
+        return cleared_partitions
@@ -1,135 +1,248 @@
-from typing import List, Optional
+import re
+from typing import Dict, List, Optional, Set
 
-from bot.command import Command, ContainsCommand, ExactCommand, StartsWithCommand, SubstitutionCommand
+from bot.command import Command, ContainsCommand, ExactCommand, PatternSubstitutionCommand, StartsWithCommand, SubstitutionCommand
 from bot.command_identifier import CommandIdentifier
+from bot.command_matcher import CommandMatcher
+from bot.metrics import count, instrument
 from bot.security_level import SecurityLevel
+from bot.substitution_storage import SubstitutionStorage
 
 
-class CommandRegistry:
-    def __init__(self, bot_name: str = "Dotty"):
-        self._bot_name = bot_name
-        self._all_commands: List[Command] = []
-        self._all_commands.append(
-            ExactCommand(CommandIdentifier.LIST_COMMANDS, "Usage", "List all commands and their usage", SecurityLevel.USER)
+def create_builtin_commands(bot_name: str) -> List[Command]:
+    builtin_commands: List[Command] = []
+    builtin_commands.append(ExactCommand(CommandIdentifier.LIST_COMMANDS, "Usage", "List all commands and their usage", SecurityLevel.USER))
+    builtin_commands.append(ExactCommand(CommandIdentifier.LIST_SUBSTITUTIONS, "List", "List all substitutions", SecurityLevel.USER))
+    builtin_commands.append(
+        ContainsCommand(
+            CommandIdentifier.SET_USER_SUBSTITUTION,
+            " -> ",
+            f"On the trigger (before) -> {bot_name} will respond with message (after) [USERS]",
+            SecurityLevel.ADMIN,
         )
-        self._all_commands.append(ExactCommand(CommandIdentifier.LIST_SUBSTITUTIONS, "List", "List all substitutions", SecurityLevel.USER))
-        self._all_commands.append(
-            ContainsCommand(
-                CommandIdentifier.SET_USER_SUBSTITUTION,
-                " -> ",
-                f"On the trigger (before) -> {self._bot_name} will respond with message (after) [USERS]",
-                SecurityLevel.ADMIN,
-            )
+    )
+    builtin_commands.append(
+        ContainsCommand(
+            CommandIdentifier.SET_ADMIN_SUBSTITUTION,
+            " => ",
+            f"On the trigger (before) => {bot_name} will respond with message (after) [ADMINS]",
+            SecurityLevel.ADMIN,
         )
-        self._all_commands.append(
-            ContainsCommand(
-                CommandIdentifier.SET_ADMIN_SUBSTITUTION,
-                " => ",
-                f"On the trigger (before) => {self._bot_name} will respond with message (after) [ADMINS]",
-                SecurityLevel.ADMIN,
-            )
+    )
+    builtin_commands.append(
+        ContainsCommand(
+            CommandIdentifier.SET_PATTERN_SUBSTITUTION,
+            " ~> ",
+            f"On a glob or /regex/ (before) ~> {bot_name} will respond with message (after), "
+            "{sender}, {theme} and {since} are filled in [USERS]",
+            SecurityLevel.ADMIN,
         )
-        self._all_commands.append(
-            ExactCommand(CommandIdentifier.GET_THEME, "Theme", "This will give back the current theme", SecurityLevel.USER)
+    )
+    builtin_commands.append(ExactCommand(CommandIdentifier.GET_THEME, "Theme", "This will give back the current theme", SecurityLevel.USER))
+    builtin_commands.append(
+        StartsWithCommand(
+            CommandIdentifier.SET_THEME,
+            "Set Theme ",
+            'This will set a theme, anything after "set theme " will be the theme',
+            SecurityLevel.ADMIN,
         )
-        self._all_commands.append(
-            StartsWithCommand(
-                CommandIdentifier.SET_THEME,
-                "Set Theme ",
-                'This will set a theme, anything after "set theme " will be the theme',
-                SecurityLevel.ADMIN,
-            )
+    )
+    builtin_commands.append(
+        StartsWithCommand(
+            CommandIdentifier.SET_ROLE_USER,
+            "Grant User ",
+            "Command to grant a member user status",
+            SecurityLevel.ADMIN,
         )
-        self._all_commands.append(
-            StartsWithCommand(
-                CommandIdentifier.SET_ROLE_USER,
-                "Grant User ",
-                "Command to grant a member user status",
-                SecurityLevel.ADMIN,
-            )
+    )
+    builtin_commands.append(
+        StartsWithCommand(
+            CommandIdentifier.SET_ROLE_ADMIN,
+            "Grant Admin ",
+            "Command to grant a member admin status",
+            SecurityLevel.OWNER,
         )
-        self._all_commands.append(
-            StartsWithCommand(
-                CommandIdentifier.SET_ROLE_ADMIN,
-                "Grant Admin ",
-                "Command to grant a member admin status",
-                SecurityLevel.OWNER,
-            )
+    )
+    builtin_commands.append(
+        StartsWithCommand(
+            CommandIdentifier.SET_ROLE_OWNER,
+            "Grant Owner ",
+            "Command to grant a member owner status",
+            SecurityLevel.OWNER,
         )
-        self._all_commands.append(
-            StartsWithCommand(
-                CommandIdentifier.SET_ROLE_OWNER,
-                "Grant Owner ",
-                "Command to grant a member owner status",
-                SecurityLevel.OWNER,
-            )
+    )
+    builtin_commands.append(
+        StartsWithCommand(
+            CommandIdentifier.REMOVE_ROLE_OWNER,
+            "Revoke Owner ",
+            "Command to revoke a member owner status",
+            SecurityLevel.OWNER,
         )
-        self._all_commands.append(
-            StartsWithCommand(
-                CommandIdentifier.REMOVE_ROLE_OWNER,
-                "Revoke Owner ",
-                "Command to revoke a member owner status",
-                SecurityLevel.OWNER,
-            )
+    )
+    builtin_commands.append(
+        StartsWithCommand(
+            CommandIdentifier.REMOVE_ROLE_ADMIN,
+            "Revoke Admin ",
+            "Command to revoke a member admin status",
+            SecurityLevel.OWNER,
         )
-        self._all_commands.append(
-            StartsWithCommand(
-                CommandIdentifier.REMOVE_ROLE_ADMIN,
-                "Revoke Admin ",
-                "Command to revoke a member admin status",
-                SecurityLevel.OWNER,
-            )
+    )
+    builtin_commands.append(
+        StartsWithCommand(
+            CommandIdentifier.REMOVE_ROLE_USER,
+            "Revoke User ",
+            "Command to revoke a member user status",
+            SecurityLevel.ADMIN,
         )
-        self._all_commands.append(
-            StartsWithCommand(
-                CommandIdentifier.REMOVE_ROLE_USER,
-                "Revoke User ",
-                "Command to revoke a member user status",
-                SecurityLevel.ADMIN,
-            )
+    )
+    builtin_commands.append(
+        StartsWithCommand(
+            CommandIdentifier.LIST_USERS,
+            "User List",
+            'List all known Users by Security Level, "user list 2" shows the second page',
+            SecurityLevel.ADMIN,
         )
-        self._all_commands.append(
-            ExactCommand(
-                CommandIdentifier.LIST_USERS,
-                "User List",
-                "List all known Users",
-                SecurityLevel.ADMIN,
-            )
+    )
+    builtin_commands.append(
+        StartsWithCommand(
+            CommandIdentifier.LAST_SEEN,
+            "Last Seen ",
+            'Tells when a member last posted or read, anything after "last seen " is the member',
+            SecurityLevel.USER,
         )
+    )
+    builtin_commands.append(
+        StartsWithCommand(
+            CommandIdentifier.LIST_SILENT_MEMBERS,
+            "Silent ",
+            'Lists the members without a post in this group for a number of days, "silent 30 2" shows the second page',
+            SecurityLevel.ADMIN,
+        )
+    )
+    return builtin_commands
+
+
+class CommandRegistry:
+    def __init__(
+        self,
+        bot_name: str = "Dotty",
+        substitution_storage: Optional[SubstitutionStorage] = None,
+        builtin_commands: Optional[List[Command]] = None,
+    ):
+        self._bot_name = bot_name
+        self._substitution_storage = substitution_storage
+        self._loaded_groups: Set[str] = set()
+        if builtin_commands is None:
+            builtin_commands = create_builtin_commands(bot_name=bot_name)
+        self._all_commands: Dict[str, Command] = {command.get_trigger(): command for command in builtin_commands}
+        self._matcher = CommandMatcher(self._all_commands.values())
+        # rendered listings per SecurityLevel, dropped whenever a substitution changes the commands
+        self._commands_strings: Dict[SecurityLevel, str] = {}
+        self._substitution_listings: Dict[SecurityLevel, str] = {}
+        self._listings_generation = 0
 
-    def get_matching_command(self, message: str, user_security_level: SecurityLevel) -> Optional[Command]:
-        for command in self._all_commands:
-            if command.has_match(message, user_security_level):
-                return command
+    @instrument(stage="command_registry")
+    def get_matching_command(
+        self, message: str, user_security_level: SecurityLevel, casefolded_message: Optional[str] = None
+    ) -> Optional[Command]:
+        command = self._matcher.match(casefolded_message or message.casefold(), user_security_level)
+        if command:
+            count("command_matches", command.get_type().name)
+        return command
 
     def get_commands_string(self, user_security_level: SecurityLevel) -> str:
-        return "".join(
-            [
-                f"{command}\n"
-                for command in self._all_commands
-                if command.has_clearance(user_security_level) and not command.is_substitution()
-            ]
-        )
+        commands_string = self._commands_strings.get(user_security_level)
+        if commands_string is None:
+            generation = self._listings_generation
+            commands_string = "".join(
+                [
+                    f"{command}\n"
+                    for command in list(self._all_commands.values())
+                    if command.has_clearance(user_security_level) and not command.is_substitution()
+                ]
+            )
+            if generation == self._listings_generation:
+                self._commands_strings[user_security_level] = commands_string
+        return commands_string
 
-    def get_substitution_listing(self, user_security_level: SecurityLevel):
-        return ", ".join(
-            [
-                command.get_trigger()
-                for command in self._all_commands
-                if command.has_clearance(user_security_level) and command.is_substitution()
-            ]
-        )
+    def get_substitution_listing(self, user_security_level: SecurityLevel) -> str:
+        substitution_listing = self._substitution_listings.get(user_security_level)
+        if substitution_listing is None:
+            generation = self._listings_generation
+            substitution_listing = ", ".join(
+                [
+                    command.get_trigger()
+                    for command in list(self._all_commands.values())
+                    if command.has_clearance(user_security_level) and command.is_substitution()
+                ]
+            )
+            if generation == self._listings_generation:
+                self._substitution_listings[user_security_level] = substitution_listing
+        return substitution_listing
+
+    def for_group(self, group: str) -> "CommandRegistry":
+        self.load_group(group)
+        return self
+
+    def load_group(self, group: str) -> None:
+        if not self._substitution_storage or group in self._loaded_groups:
+            return
+        # a failed retrieval raises before the group counts as loaded, so its next message tries again
+        stored_commands = self._substitution_storage.retrieve_substitutions(group=group)
+        self._loaded_groups.add(group)
+        for command in stored_commands:
+            try:
+                self._upsert_substitution(command)
+            except re.error as error:
+                print(f"Skipping the stored pattern {command.get_trigger()!r} of {group}: {error.msg}")
 
-    def register_substitution(self, trigger: str, substitution: str, security_level: SecurityLevel) -> Optional[Command]:
-        if trigger in [command.get_trigger() for command in self._all_commands]:
-            if security_level < [command.get_security_level() for command in self._all_commands if command.get_trigger() == trigger].pop():
-                return
-        self._all_commands = [command for command in self._all_commands if command.get_trigger() != trigger]
+    def register_substitution(
+        self, trigger: str, substitution: str, security_level: SecurityLevel, group: Optional[str] = None
+    ) -> Optional[Command]:
         new_command = SubstitutionCommand(
             identifier=CommandIdentifier.GET_SUBSTITUTION,
             trigger=trigger,
             substitution=substitution,
             security_level=security_level,
         )
-        self._all_commands.append(new_command)
+        if not self._upsert_substitution(new_command):
+            return
+        if self._substitution_storage and group:
+            self._substitution_storage.store_substitution(group=group, command=new_command)
         return new_command
+
+    def register_pattern_substitution(
+        self, trigger: str, substitution: str, security_level: SecurityLevel, group: Optional[str] = None
+    ) -> Optional[Command]:
+        """Like register_substitution for a glob or /regex/ trigger, raises re.error when the trigger isn't supported."""
+        new_command = PatternSubstitutionCommand(
+            identifier=CommandIdentifier.GET_PATTERN_SUBSTITUTION,
+            trigger=trigger,
+            substitution=substitution,
+            security_level=security_level,
+        )
+        if not self._upsert_substitution(new_command):
+            return
+        if self._substitution_storage and group:
+            self._substitution_storage.store_substitution(group=group, command=new_command)
+        return new_command
+
+    def _upsert_substitution(self, new_command: SubstitutionCommand) -> bool:
+        trigger = new_command.get_trigger()
+        existing_command = self._all_commands.get(trigger)
+        if existing_command:
+            if new_command.get_security_level() < existing_command.get_security_level():
+                return False
+            self._matcher.remove(existing_command)
+        try:
+            self._matcher.add(new_command)
+        except re.error:
+            if existing_command:
+                self._matcher.add(existing_command)
+            raise
+        self._all_commands.pop(trigger, None)
+        self._all_commands[trigger] = new_command
+        self._listings_generation += 1
+        self._commands_strings.clear()
+        self._substitution_listings.clear()
+        return True
@@ -4,6 +4,7 @@ from enum import Enum, auto
 class CommandType(Enum):
     CONTAINS = auto()
     EXACT = auto()
+    PATTERN = auto()
     SUBSTITUTION = auto()
     STARTS_WITH = auto()
     UNSET = auto()
@@ -0,0 +1,72 @@
+import os
+import signal
+import threading
+import time
+from json import loads
+from types import MappingProxyType
+from typing import Any, Mapping, Optional
+
+
+def freeze(value: Any) -> Any:
+    if isinstance(value, dict):
+        return MappingProxyType({key: freeze(item) for key, item in value.items()})
+    if isinstance(value, list):
+        return tuple(freeze(item) for item in value)
+    return value
+
+
+class ConfigCache:
+    """
+    Parses the config file once and hands out an immutable snapshot.
+    The file's mtime is checked at most every check_interval seconds (never when it is None),
+    the file is only parsed again when that mtime changed or a reload was requested, e.g. by SIGHUP.
+    Once there is a snapshot, a missing or invalid file is logged and the last good snapshot is kept.
+    """
+
+    def __init__(self, path: str = "config.json", check_interval: Optional[float] = 5.0):
+        self._path = path
+        self._check_interval = check_interval
+        self._snapshot: Optional[Mapping] = None
+        self._mtime: Optional[int] = None
+        self._next_check = 0.0
+        self._reload_requested = False
+        self._lock = threading.Lock()
+
+    def get(self) -> Mapping:
+        if self._snapshot is not None and not self._reload_requested and not self._is_check_due():
+            return self._snapshot
+        with self._lock:
+            self._refresh()
+            return self._snapshot
+
+    def request_reload(self) -> None:
+        self._reload_requested = True
+
+    def install_signal_handler(self) -> None:
+        reload_signal = getattr(signal, "SIGHUP", None)
+        if reload_signal:
+            signal.signal(reload_signal, lambda signal_number, frame: self.request_reload())
+
+    def _is_check_due(self) -> bool:
+        return self._check_interval is not None and time.monotonic() >= self._next_check
+
+    def _refresh(self) -> None:
+        if self._check_interval is not None:
+            self._next_check = time.monotonic() + self._check_interval
+        try:
+            mtime = os.stat(self._path).st_mtime_ns
+            if self._snapshot is not None and mtime == self._mtime and not self._reload_requested:
+                return
+            self._reload_requested = False
+            with open(self._path) as config_file:
+                snapshot = freeze(loads(config_file.read()))
+        except (OSError, ValueError) as error:
+            if self._snapshot is None:
+                raise
+            print(f"Keeping the last good config, reading {self._path} failed: {error}")
+            return
+        self._snapshot = snapshot
+        self._mtime = mtime
+
+
+config_cache = ConfigCache()
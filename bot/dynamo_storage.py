@@ -1,10 +1,57 @@
-from boto3 import client, resource
+from concurrent.futures import ThreadPoolExecutor
+from queue import Queue
+from typing import Dict, Iterator, List, Optional
+
+from bot.batch_writer import BatchWriter
+from bot.schema_marker import SchemaMarker
+
+
+_SEGMENT_DONE = object()
 
 
 class DynamoStorage:
-    def __init__(self):
-        self._dyn_db_resource = resource("dynamodb")
-        self._dyn_db_client = client("dynamodb")
+    """
+    Base for the DynamoDB backed storages.
+    boto3 is only imported, and the resource and client only created, on first use, so building a storage is free.
+    """
+
+    def __init__(self, session=None, endpoint_url: Optional[str] = None, schema_marker: Optional[SchemaMarker] = None):
+        self._session = session
+        self._endpoint_url = endpoint_url
+        self._schema_marker = schema_marker or SchemaMarker()
+        self._resource = None
+        self._client = None
+
+    @property
+    def _dyn_db_resource(self):
+        if self._resource is None:
+            self._resource = self._get_connection().resource("dynamodb", endpoint_url=self._endpoint_url)
+        return self._resource
+
+    @property
+    def _dyn_db_client(self):
+        if self._client is None:
+            self._client = self._get_connection().client("dynamodb", endpoint_url=self._endpoint_url)
+        return self._client
+
+    def _get_connection(self):
+        if self._session:
+            return self._session
+        import boto3
+
+        return boto3
+
+    def _verify_schema(self, table_name: str, gsi_names: List[str] = ()) -> bool:
+        endpoint = self._endpoint_url or "default"
+        if self._schema_marker.is_verified(endpoint=endpoint, table_name=table_name):
+            return True
+        if not self._table_exists(table_name=table_name):
+            return False
+        table = self._get_table(table_name=table_name)
+        if not all(self._check_for_gsi(table=table, gsi_name=gsi_name) for gsi_name in gsi_names):
+            return False
+        self._schema_marker.mark_verified(endpoint=endpoint, table_name=table_name)
+        return True
 
     def _table_exists(self, table_name: str) -> bool:
         existing_tables = self._dyn_db_client.list_tables()["TableNames"]
@@ -13,5 +60,56 @@ class DynamoStorage:
     def _get_table(self, table_name: str):
         return self._dyn_db_resource.Table(table_name)
 
-    def _check_for_gsi(self, table, gsi_name: str):
-        return table.global_secondary_indexes or gsi_name not in [gsi["IndexName"] for gsi in table.global_secondary_indexes]
+    def _check_for_gsi(self, table, gsi_name: str) -> bool:
+        return gsi_name in [gsi["IndexName"] for gsi in table.global_secondary_indexes or []]
+
+    def _get_batch_writer(self, table_name: str, key_name: str) -> BatchWriter:
+        return BatchWriter(dyn_db_resource=self._dyn_db_resource, table_name=table_name, key_name=key_name)
+
+    def _scan(self, table_name: str, attributes: List[str], total_segments: int = 1) -> Iterator[Dict]:
+        """
+        Scan a whole table, following LastEvaluatedKey.
+        With more than one segment, every segment is scanned on its own thread and items are yielded as they arrive.
+        """
+        if total_segments <= 1:
+            yield from self._scan_segment(table_name=table_name, attributes=attributes)
+            return
+        items: Queue = Queue()
+        with ThreadPoolExecutor(max_workers=total_segments) as executor:
+            futures = [
+                executor.submit(self._scan_segment_into, items, table_name, attributes, segment, total_segments)
+                for segment in range(total_segments)
+            ]
+            finished_segments = 0
+            while finished_segments < total_segments:
+                item = items.get()
+                if item is _SEGMENT_DONE:
+                    finished_segments += 1
+                    continue
+                yield item
+            for future in futures:
+                future.result()
+
+    def _scan_segment_into(self, items: Queue, table_name: str, attributes: List[str], segment: int, total_segments: int) -> None:
+        try:
+            for item in self._scan_segment(table_name=table_name, attributes=attributes, segment=segment, total_segments=total_segments):
+                items.put(item)
+        finally:
+            items.put(_SEGMENT_DONE)
+
+    def _scan_segment(
+        self, table_name: str, attributes: List[str], segment: Optional[int] = None, total_segments: Optional[int] = None
+    ) -> Iterator[Dict]:
+        from boto3.dynamodb.types import TypeDeserializer
+
+        deserializer = TypeDeserializer()
+        parameters = {
+            "TableName": table_name,
+            "ProjectionExpression": ", ".join(f"#a{index}" for index in range(len(attributes))),
+            "ExpressionAttributeNames": {f"#a{index}": attribute for index, attribute in enumerate(attributes)},
+        }
+        if total_segments:
+            parameters.update(Segment=segment, TotalSegments=total_segments)
+        for page in self._dyn_db_client.get_paginator("scan").paginate(**parameters):
+            for item in page["Items"]:
+                yield {name: deserializer.deserialize(value) for name, value in item.items()}
@@ -1,10 +1,30 @@
+from typing import Optional
+
+
 class Message:
+    __slots__ = ("sent_by", "sent_in", "body", "_casefolded_body", "_arguments_trigger", "_arguments")
+
     def __init__(self, body: str, sent_by: str, sent_in: str):
         self.sent_by: str = sent_by
         self.sent_in: str = sent_in
         self.body: str = body
+        self._casefolded_body: Optional[str] = None
+        self._arguments_trigger: Optional[str] = None
+        self._arguments: Optional[str] = None
 
     def __eq__(self, other):
         if isinstance(other, Message):
             return self.body == other.body and self.sent_by == other.sent_by and self.sent_in == other.sent_in
         raise TypeError
+
+    def get_casefolded_body(self) -> str:
+        if self._casefolded_body is None:
+            self._casefolded_body = self.body.casefold()
+        return self._casefolded_body
+
+    def get_arguments(self, trigger: str) -> str:
+        """The body after the trigger of the matched starts-with command, sliced once per message."""
+        if self._arguments_trigger != trigger:
+            self._arguments_trigger = trigger
+            self._arguments = self.body[len(trigger) :]
+        return self._arguments
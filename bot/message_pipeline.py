@@ -0,0 +1,139 @@
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Optional
+
+from bot.async_chat_bot import AsyncChatBot
+from bot.message import Message
+
+
+class MessagePipeline:
+    """
+    Asyncio pipeline between a chat client and the bot, running its own event loop on a background thread.
+    Ingest: submit blocks the client's callback thread once max_pending messages are waiting.
+    Process: every group has its own queue and worker, so messages stay in order within a group and a burst in one group
+    doesn't hold up the others. A group with more than max_pending_per_group waiting messages drops new ones.
+    The worker of a group that has been idle for group_idle_timeout seconds is stopped, it starts again on the next message.
+    Send: read receipts are queued as soon as a message is ingested, replies once the bot answered.
+    Messages submitted once stop was called are dropped, everything submitted before it is still answered.
+    """
+
+    def __init__(
+        self,
+        chat_bot: AsyncChatBot,
+        send_message: Callable[[str, str], None],
+        send_read_receipt: Callable[[Message, str], None],
+        max_pending: int = 1000,
+        max_pending_per_group: int = 100,
+        group_idle_timeout: float = 300.0,
+    ):
+        self._chat_bot = chat_bot
+        self._send_message = send_message
+        self._send_read_receipt = send_read_receipt
+        self._max_pending = max_pending
+        self._max_pending_per_group = max_pending_per_group
+        self._group_idle_timeout = group_idle_timeout
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._ingest_queue: Optional[asyncio.Queue] = None
+        self._send_queue: Optional[asyncio.Queue] = None
+        self._group_queues: Dict[str, asyncio.Queue] = {}
+        self._stopped = False
+        self._stop_lock = threading.Lock()
+        self._send_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="message-send")
+        self.dropped_messages = 0
+
+    def start(self) -> None:
+        started = threading.Event()
+        self._thread = threading.Thread(target=self._run_loop, args=(started,), name="message-pipeline", daemon=True)
+        self._thread.start()
+        started.wait()
+
+    def submit(self, message: Message, message_id: str) -> None:
+        # the put is scheduled under the lock, so it always runs on the loop before the drain of stop
+        with self._stop_lock:
+            if self._stopped:
+                print(f"Dropped a message in {message.sent_in}, the message pipeline is stopped")
+                self.dropped_messages += 1
+                return
+            ingested = asyncio.run_coroutine_threadsafe(self._ingest_queue.put((message, message_id)), self._loop)
+        ingested.result()
+
+    def stop(self, timeout: Optional[float] = None) -> None:
+        with self._stop_lock:
+            self._stopped = True
+        asyncio.run_coroutine_threadsafe(self._drain(), self._loop).result(timeout)
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join(timeout)
+        self._send_executor.shutdown(wait=True)
+
+    def _run_loop(self, started: threading.Event) -> None:
+        self._loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self._loop)
+        self._ingest_queue = asyncio.Queue(maxsize=self._max_pending)
+        self._send_queue = asyncio.Queue()
+        self._loop.create_task(self._dispatch())
+        self._loop.create_task(self._send())
+        started.set()
+        self._loop.run_forever()
+        tasks = asyncio.all_tasks(self._loop)
+        for task in tasks:
+            task.cancel()
+        self._loop.run_until_complete(asyncio.gather(*tasks, return_exceptions=True))
+        self._loop.close()
+
+    async def _drain(self) -> None:
+        await self._ingest_queue.join()
+        for group_queue in list(self._group_queues.values()):
+            await group_queue.join()
+        await self._send_queue.join()
+
+    async def _dispatch(self) -> None:
+        while True:
+            message, message_id = await self._ingest_queue.get()
+            self._send_queue.put_nowait((self._send_read_receipt, (message, message_id)))
+            try:
+                self._get_group_queue(message.sent_in).put_nowait(message)
+            except asyncio.QueueFull:
+                self.dropped_messages += 1
+            self._ingest_queue.task_done()
+
+    def _get_group_queue(self, group: str) -> asyncio.Queue:
+        group_queue = self._group_queues.get(group)
+        if group_queue is None:
+            group_queue = asyncio.Queue(maxsize=self._max_pending_per_group)
+            self._group_queues[group] = group_queue
+            self._loop.create_task(self._process_group(group, group_queue))
+        return group_queue
+
+    def count_group_workers(self) -> int:
+        return len(self._group_queues)
+
+    async def _process_group(self, group: str, group_queue: asyncio.Queue) -> None:
+        while True:
+            try:
+                message: Message = await asyncio.wait_for(group_queue.get(), timeout=self._group_idle_timeout)
+            except asyncio.TimeoutError:
+                # a message put while the wait timed out is still in the queue, the worker keeps it
+                if not group_queue.empty():
+                    continue
+                del self._group_queues[group]
+                return
+            try:
+                answer = await self._chat_bot.process_message_async(message)
+                if answer:
+                    self._send_queue.put_nowait((self._send_message, (message.sent_in, answer)))
+            except Exception as error:
+                print(f"Processing a message in {message.sent_in} failed: {error}")
+            finally:
+                group_queue.task_done()
+
+    async def _send(self) -> None:
+        while True:
+            send, arguments = await self._send_queue.get()
+            try:
+                await self._loop.run_in_executor(self._send_executor, send, *arguments)
+            except Exception as error:
+                print(f"Sending failed: {error}")
+            finally:
+                self._send_queue.task_done()
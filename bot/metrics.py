@@ -0,0 +1,142 @@
+import threading
+import time
+from bisect import bisect_left
+from functools import wraps
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, List, Optional, Tuple, Union
+
+
+class MetricsHook:
+    """Receives the timings and counts of the instrumented code, see set_metrics_hook."""
+
+    def observe(self, stage: str, label: str, seconds: float) -> None:
+        pass
+
+    def count(self, name: str, label: str) -> None:
+        pass
+
+
+class HistogramMetrics(MetricsHook):
+    BUCKETS: Tuple[float, ...] = (0.00001, 0.00005, 0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0)
+
+    def __init__(self):
+        self._histograms: Dict[Tuple[str, str], List[float]] = {}
+        self._counters: Dict[Tuple[str, str], int] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, stage: str, label: str, seconds: float) -> None:
+        with self._lock:
+            histogram = self._histograms.get((stage, label))
+            if histogram is None:
+                # one count per bucket plus +Inf, then the sum and the total count
+                histogram = self._histograms[(stage, label)] = [0] * (len(self.BUCKETS) + 3)
+            histogram[bisect_left(self.BUCKETS, seconds)] += 1
+            histogram[-2] += seconds
+            histogram[-1] += 1
+
+    def count(self, name: str, label: str) -> None:
+        with self._lock:
+            self._counters[(name, label)] = self._counters.get((name, label), 0) + 1
+
+    def prometheus_text(self) -> str:
+        lines = ["# TYPE dotty_stage_seconds histogram"]
+        with self._lock:
+            for (stage, label), histogram in sorted(self._histograms.items()):
+                cumulative = 0
+                for bound, bucket_count in zip([*map(str, self.BUCKETS), "+Inf"], histogram):
+                    cumulative += bucket_count
+                    lines.append(f'dotty_stage_seconds_bucket{{stage="{stage}",label="{label}",le="{bound}"}} {cumulative}')
+                lines.append(f'dotty_stage_seconds_sum{{stage="{stage}",label="{label}"}} {histogram[-2]}')
+                lines.append(f'dotty_stage_seconds_count{{stage="{stage}",label="{label}"}} {histogram[-1]}')
+            lines.append("# TYPE dotty_events_total counter")
+            for (name, label), counter in sorted(self._counters.items()):
+                lines.append(f'dotty_events_total{{name="{name}",label="{label}"}} {counter}')
+        return "\n".join(lines) + "\n"
+
+    def summary_line(self) -> str:
+        with self._lock:
+            stages = [
+                f"{stage}.{label}: n={histogram[-1]} avg={histogram[-2] / histogram[-1] * 1000:.3f}ms"
+                for (stage, label), histogram in sorted(self._histograms.items())
+            ]
+            counters = [f"{name}.{label}={counter}" for (name, label), counter in sorted(self._counters.items())]
+        return " | ".join(stages + counters)
+
+
+_hook: Optional[MetricsHook] = None
+
+
+def set_metrics_hook(hook: Optional[MetricsHook]) -> None:
+    global _hook
+    _hook = hook
+
+
+def get_metrics_hook() -> Optional[MetricsHook]:
+    return _hook
+
+
+def count(name: str, label: str) -> None:
+    if _hook is not None:
+        _hook.count(name, label)
+
+
+def instrument(stage: str, label: Union[None, str, Callable[..., str]] = None):
+    """
+    Times every call of the decorated function into the metrics hook under stage and label.
+    The label defaults to the function name, a callable label is called with the function's arguments.
+    Without a hook the wrapper only checks for one and calls through.
+    """
+
+    def decorator(function):
+        fixed_label = label or function.__name__
+
+        @wraps(function)
+        def wrapper(*args, **kwargs):
+            hook = _hook
+            if hook is None:
+                return function(*args, **kwargs)
+            started = time.perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                hook.observe(stage, fixed_label(*args, **kwargs) if callable(fixed_label) else fixed_label, time.perf_counter() - started)
+
+        return wrapper
+
+    return decorator
+
+
+def serve_prometheus(metrics: HistogramMetrics, port: int, host: str = "0.0.0.0") -> ThreadingHTTPServer:
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            body = metrics.prometheus_text().encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), MetricsHandler)
+    threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
+    return server
+
+
+class PeriodicLogReporter:
+    def __init__(self, metrics: HistogramMetrics, interval: float = 60.0, log: Callable[[str], None] = print):
+        self._metrics = metrics
+        self._interval = interval
+        self._log = log
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="metrics-log", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stopped.set()
+        self._thread.join()
+
+    def _run(self) -> None:
+        while not self._stopped.wait(self._interval):
+            self._log(f"metrics {self._metrics.summary_line()}")
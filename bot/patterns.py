@@ -0,0 +1,133 @@
+import re
+from fnmatch import translate
+from functools import lru_cache
+from typing import Optional, Tuple
+
+
+# longer messages are never matched against pattern triggers, together with PATTERN_COST_LIMIT it bounds their matching time
+MAX_PATTERN_MESSAGE_LENGTH = 280
+
+# the most paths a single regex trigger may make the matcher try, about two unbounded repeats in a row
+PATTERN_COST_LIMIT = 1_000_000
+
+_REPEAT = re.compile(r"[*+?]|\{(\d*)(,?)(\d*)\}")
+
+
+def is_regex_trigger(trigger: str) -> bool:
+    return len(trigger) > 2 and trigger.startswith("/") and trigger.endswith("/")
+
+
+def pattern_to_regex(trigger: str) -> str:
+    """A trigger between slashes is a regular expression, any other trigger a glob with * and ?."""
+    if is_regex_trigger(trigger):
+        return f"(?:{trigger[1:-1]})"
+    return translate(trigger.casefold())
+
+
+def pattern_cost(regex: str) -> int:
+    """
+    An upper bound of the paths the backtracking matcher can try on a message of MAX_PATTERN_MESSAGE_LENGTH,
+    for the supported subset: repeats of a single character, class or escape, and (?:...) groups that are at most
+    optional, so alternatives are tried one after the other and only the repeats in a sequence multiply.
+    Raises re.error for anything outside that subset.
+    """
+    cost, position = _alternatives_cost(regex, 0)
+    if position < len(regex):
+        raise re.error("unbalanced parenthesis", regex, position)
+    return cost
+
+
+def _alternatives_cost(regex: str, position: int) -> Tuple[int, int]:
+    cost, position = _sequence_cost(regex, position)
+    while regex.startswith("|", position):
+        branch_cost, position = _sequence_cost(regex, position + 1)
+        cost += branch_cost
+    return cost, position
+
+
+def _sequence_cost(regex: str, position: int) -> Tuple[int, int]:
+    cost = 1
+    while position < len(regex) and regex[position] not in "|)":
+        if regex.startswith("(", position):
+            if not regex.startswith("(?:", position):
+                raise re.error("groups are not supported, use (?:...)")
+            atom_cost, position = _alternatives_cost(regex, position + 3)
+            position += 1
+            repeat = _match_repeat(regex, position)
+            if repeat:
+                if repeat.group(0) != "?":
+                    raise re.error("a group can't be repeated, only made optional with ?")
+                atom_cost += 1
+                position = repeat.end()
+        else:
+            position = _skip_atom(regex, position)
+            atom_cost, position = _repeat_choices(regex, position)
+        cost = min(cost * atom_cost, PATTERN_COST_LIMIT + 1)
+    return cost, position
+
+
+def _skip_atom(regex: str, position: int) -> int:
+    if regex.startswith("\\", position):
+        return position + 2
+    if not regex.startswith("[", position):
+        return position + 1
+    position += 1
+    # a ] right after [ or [^ is part of the class
+    if regex.startswith("^", position):
+        position += 1
+    if regex.startswith("]", position):
+        position += 1
+    while position < len(regex) and regex[position] != "]":
+        position += 2 if regex[position] == "\\" else 1
+    return position + 1
+
+
+def _match_repeat(regex: str, position: int) -> Optional[re.Match]:
+    repeat = _REPEAT.match(regex, position)
+    # braces without a number are a literal
+    if repeat and repeat.group(0).startswith("{") and not (repeat.group(1) or repeat.group(3)):
+        return None
+    return repeat
+
+
+def _repeat_choices(regex: str, position: int) -> Tuple[int, int]:
+    repeat = _match_repeat(regex, position)
+    if not repeat:
+        return 1, position
+    position = repeat.end()
+    # a lazy or possessive repeat tries no more positions than a greedy one
+    if regex.startswith(("?", "+"), position):
+        position += 1
+    token = repeat.group(0)
+    if token in ("*", "+"):
+        return MAX_PATTERN_MESSAGE_LENGTH + 1, position
+    if token == "?":
+        return 2, position
+    minimum = int(repeat.group(1) or 0)
+    if not repeat.group(2):
+        return 1, position
+    if not repeat.group(3):
+        return MAX_PATTERN_MESSAGE_LENGTH + 1, position
+    return max(int(repeat.group(3)) - minimum, 0) + 1, position
+
+
+@lru_cache(maxsize=1024)
+def compile_pattern(trigger: str) -> re.Pattern:
+    """
+    Raises re.error for a trigger that doesn't compile, or for a regex outside the subset pattern_cost supports
+    or that can backtrack through more than PATTERN_COST_LIMIT paths. Globs are translated with atomic groups
+    and never backtrack much.
+    """
+    pattern = re.compile(pattern_to_regex(trigger), re.IGNORECASE)
+    if is_regex_trigger(trigger) and pattern_cost(trigger[1:-1]) > PATTERN_COST_LIMIT:
+        raise re.error("the pattern can backtrack too much, use fewer repeats or a glob")
+    return pattern
+
+
+@lru_cache(maxsize=64)
+def compile_alternation(patterns: Tuple[Tuple[int, str], ...]) -> re.Pattern:
+    """
+    One regular expression for all (rank, trigger) patterns, in the given order.
+    Every alternative is a group named after its rank, match.lastgroup tells which one matched.
+    """
+    return re.compile("|".join(f"(?P<r{rank}>{pattern_to_regex(trigger)})" for rank, trigger in patterns), re.IGNORECASE)
@@ -1,37 +1,95 @@
-from typing import List
-
-from boto3.dynamodb.conditions import Key
+from typing import Dict, Iterator, List, Optional, Tuple
 
+from bot.batch_writer import BatchWriter, BatchWriteReport
 from bot.dynamo_storage import DynamoStorage
+from bot.metrics import instrument
+from bot.schema_marker import SchemaMarker
 from bot.security_level import SecurityLevel
 from bot.user import User
 
 
 class ProfileStorage(DynamoStorage):
-    def __init__(self):
-        super().__init__()
-        self._table = self._get_table_profiles()
+    def __init__(self, session=None, endpoint_url: Optional[str] = None, schema_marker: Optional[SchemaMarker] = None):
+        super().__init__(session=session, endpoint_url=endpoint_url, schema_marker=schema_marker)
+        self._profiles_table = None
+        self._profiles_batch_writer: Optional[BatchWriter] = None
+
+    @property
+    def _table(self):
+        if self._profiles_table is None:
+            self._profiles_table = self._get_table(table_name="profiles")
+        return self._profiles_table
+
+    @property
+    def _batch_writer(self) -> BatchWriter:
+        if self._profiles_batch_writer is None:
+            self._profiles_batch_writer = self._get_batch_writer(table_name="profiles", key_name="identifier")
+        return self._profiles_batch_writer
+
+    def provision(self) -> None:
+        self._get_table_profiles()
+        self.verify_schema()
 
+    def verify_schema(self) -> bool:
+        return self._verify_schema(table_name="profiles", gsi_names=["gsi_security_level"])
+
+    @instrument(stage="storage")
     def create_owner(self, identifier: str) -> None:
-        owners = self._get_owners()
-        if not owners or identifier not in [owner["identifier"] for owner in owners["Items"]]:
+        if identifier not in [owner.get_user_identifier() for owner in self.iterate_by_role(security_level=SecurityLevel.OWNER)]:
             self._store_profile(identifier=identifier, security_level=SecurityLevel.OWNER)
 
+    @instrument(stage="storage")
     def store_profile(self, user: User, item=None) -> None:
         self._store_profile(identifier=user.get_user_identifier(), security_level=user.get_user_clearance_level(), item=item)
 
-    def store_profiles(self, users: List[User]) -> None:
-        for user in users:
-            self._store_profile(identifier=user.get_user_identifier(), security_level=user.get_user_clearance_level())
+    @instrument(stage="storage")
+    def store_profiles(self, users: List[User]) -> BatchWriteReport:
+        return self._batch_writer.put_items(
+            self._profile_item(identifier=user.get_user_identifier(), security_level=user.get_user_clearance_level()) for user in users
+        )
+
+    @instrument(stage="storage")
+    def retrieve_profiles(self, total_segments: int = 1) -> List[User]:
+        return list(self.iterate_profiles(total_segments=total_segments))
 
-    def retrieve_profiles(self) -> List[User]:
-        response: List[User] = []
-        stored_profiles = self._table.scan(AttributesToGet=["identifier", "security_level"], Limit=100)
-        if stored_profiles:
-            for profile in stored_profiles["Items"]:
-                security_level_value = int(profile["security_level"])
-                response.append(User(identifier=profile["identifier"], security_level=SecurityLevel(security_level_value)))
-        return response
+    def iterate_profiles(self, total_segments: int = 1) -> Iterator[User]:
+        for profile in self._scan(table_name="profiles", attributes=["identifier", "security_level"], total_segments=total_segments):
+            security_level_value = int(profile["security_level"])
+            yield User(identifier=profile["identifier"], security_level=SecurityLevel(security_level_value))
+
+    @instrument(stage="storage")
+    def retrieve_profile(self, identifier: str) -> Optional[User]:
+        item = self._table.get_item(Key={"identifier": identifier}).get("Item")
+        if not item:
+            return None
+        return User(identifier=item["identifier"], security_level=SecurityLevel(int(item["security_level"])))
+
+    @instrument(stage="storage")
+    def query_by_role(
+        self, security_level: SecurityLevel, limit: Optional[int] = None, start_key: Optional[Dict] = None
+    ) -> Tuple[List[User], Optional[Dict]]:
+        """
+        One page of the users with the SecurityLevel, read from the gsi_security_level index.
+        Pass the returned key as start_key for the next page, it is None after the last page.
+        """
+        from boto3.dynamodb.conditions import Key
+
+        parameters = {"IndexName": "gsi_security_level", "KeyConditionExpression": Key("security_level").eq(security_level.value)}
+        if limit:
+            parameters["Limit"] = limit
+        if start_key:
+            parameters["ExclusiveStartKey"] = start_key
+        response = self._table.query(**parameters)
+        users = [User(identifier=item["identifier"], security_level=security_level) for item in response["Items"]]
+        return users, response.get("LastEvaluatedKey")
+
+    def iterate_by_role(self, security_level: SecurityLevel) -> Iterator[User]:
+        start_key = None
+        while True:
+            users, start_key = self.query_by_role(security_level=security_level, start_key=start_key)
+            yield from users
+            if not start_key:
+                return
 
     def _get_table_profiles(self):
         if self._table_exists(table_name="profiles"):
@@ -76,13 +134,14 @@ class ProfileStorage(DynamoStorage):
             ],
         )
 
-    def _get_owners(self):
-        return self._table.query(IndexName="gsi_security_level", KeyConditionExpression=Key("security_level").eq(9))
-
     def _store_profile(self, identifier: str, security_level: SecurityLevel, item=None) -> None:
         if not item:
-            item = {
-                "identifier": identifier,
-                "security_level": security_level.value,
-            }
+            item = self._profile_item(identifier=identifier, security_level=security_level)
         self._table.put_item(Item=item)
+
+    @staticmethod
+    def _profile_item(identifier: str, security_level: SecurityLevel) -> dict:
+        return {
+            "identifier": identifier,
+            "security_level": security_level.value,
+        }
@@ -0,0 +1,38 @@
+import json
+import os
+import threading
+from typing import Dict, List, Optional
+
+
+class SchemaMarker:
+    """
+    Remembers which tables have had their schema verified, per endpoint, so later starts can skip the DynamoDB calls.
+    Without a path the marker only lives in memory.
+    """
+
+    def __init__(self, path: Optional[str] = ".dotty_schema.json"):
+        self._path = path
+        self._verified: Optional[Dict[str, List[str]]] = None
+        self._lock = threading.Lock()
+
+    def is_verified(self, endpoint: str, table_name: str) -> bool:
+        with self._lock:
+            return table_name in self._load().get(endpoint, [])
+
+    def mark_verified(self, endpoint: str, table_name: str) -> None:
+        with self._lock:
+            verified = self._load()
+            if table_name in verified.setdefault(endpoint, []):
+                return
+            verified[endpoint].append(table_name)
+            if self._path:
+                with open(self._path, "w") as marker_file:
+                    marker_file.write(json.dumps(verified, indent=2, sort_keys=True))
+
+    def _load(self) -> Dict[str, List[str]]:
+        if self._verified is None:
+            self._verified = {}
+            if self._path and os.path.exists(self._path):
+                with open(self._path) as marker_file:
+                    self._verified = json.loads(marker_file.read())
+        return self._verified
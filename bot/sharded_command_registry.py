@@ -0,0 +1,44 @@
+import threading
+from collections import OrderedDict
+from typing import Optional
+
+from bot.command_registry import CommandRegistry, create_builtin_commands
+from bot.substitution_storage import SubstitutionStorage
+
+
+class ShardedCommandRegistry:
+    """
+    One CommandRegistry per group, all sharing the same builtin commands.
+    A group's shard is created, and its substitutions loaded, on the first message from that group.
+    With a substitution storage the least recently used shards are evicted past max_shards,
+    they are reloaded from storage when the group speaks again.
+    """
+
+    def __init__(self, bot_name: str = "Dotty", substitution_storage: Optional[SubstitutionStorage] = None, max_shards: int = 256):
+        self._bot_name = bot_name
+        self._substitution_storage = substitution_storage
+        self._max_shards = max_shards
+        self._builtin_commands = create_builtin_commands(bot_name=bot_name)
+        self._shards: OrderedDict[str, CommandRegistry] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def for_group(self, group: str) -> CommandRegistry:
+        with self._lock:
+            shard = self._shards.get(group)
+            if shard:
+                self._shards.move_to_end(group)
+                return shard
+        shard = CommandRegistry(
+            bot_name=self._bot_name, substitution_storage=self._substitution_storage, builtin_commands=self._builtin_commands
+        )
+        shard.load_group(group)
+        with self._lock:
+            shard = self._shards.setdefault(group, shard)
+            self._shards.move_to_end(group)
+            if self._substitution_storage:
+                while len(self._shards) > self._max_shards:
+                    self._shards.popitem(last=False)
+        return shard
+
+    def shard_count(self) -> int:
+        return len(self._shards)
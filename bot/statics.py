@@ -1,16 +1,15 @@
 import math
 from datetime import datetime as DateTime
 
+from bot.config import config_cache
+
 
 def jid_to_username(jid):
     return jid.split("@")[0][0:-4]
 
 
 def get_config():
-    from json import loads
-
-    with open("config.json") as account_file:
-        return loads(account_file.read())
+    return config_cache.get()
 
 
 def timestamp_to_datetime(ts):
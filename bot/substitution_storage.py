@@ -0,0 +1,97 @@
+import re
+import time
+from typing import List, Optional
+
+from bot.command import PatternSubstitutionCommand, SubstitutionCommand
+from bot.command_identifier import CommandIdentifier
+from bot.dynamo_storage import DynamoStorage
+from bot.metrics import instrument
+from bot.schema_marker import SchemaMarker
+from bot.security_level import SecurityLevel
+
+
+class SubstitutionStorage(DynamoStorage):
+    def __init__(self, session=None, endpoint_url: Optional[str] = None, schema_marker: Optional[SchemaMarker] = None):
+        super().__init__(session=session, endpoint_url=endpoint_url, schema_marker=schema_marker)
+        self._substitutions_table = None
+
+    @property
+    def _table(self):
+        if self._substitutions_table is None:
+            self._substitutions_table = self._get_table(table_name="substitutions")
+        return self._substitutions_table
+
+    def provision(self) -> None:
+        self._get_table_substitutions()
+        self.verify_schema()
+
+    def verify_schema(self) -> bool:
+        return self._verify_schema(table_name="substitutions")
+
+    @instrument(stage="storage")
+    def store_substitution(self, group: str, command: SubstitutionCommand) -> None:
+        item = {
+            "group_jid": group,
+            "trigger": command.get_trigger(),
+            "substitution": command.get_substitution(),
+            "security_level": command.get_security_level().value,
+            "updated_at": time.time_ns(),
+        }
+        if isinstance(command, PatternSubstitutionCommand):
+            item["kind"] = "pattern"
+        self._table.put_item(Item=item)
+
+    @instrument(stage="storage")
+    def retrieve_substitutions(self, group: str) -> List[SubstitutionCommand]:
+        from boto3.dynamodb.conditions import Key
+
+        items = []
+        parameters = {"KeyConditionExpression": Key("group_jid").eq(group)}
+        while True:
+            response = self._table.query(**parameters)
+            items.extend(response["Items"])
+            if "LastEvaluatedKey" not in response:
+                break
+            parameters["ExclusiveStartKey"] = response["LastEvaluatedKey"]
+        commands = []
+        for item in sorted(items, key=lambda item: item["updated_at"]):
+            try:
+                commands.append(self._substitution_command(item))
+            except re.error as error:
+                print(f"Skipping the stored pattern {item['trigger']!r} of {group}: {error.msg}")
+        return commands
+
+    @staticmethod
+    def _substitution_command(item: dict) -> SubstitutionCommand:
+        if item.get("kind") == "pattern":
+            return PatternSubstitutionCommand(
+                identifier=CommandIdentifier.GET_PATTERN_SUBSTITUTION,
+                trigger=item["trigger"],
+                substitution=item["substitution"],
+                security_level=SecurityLevel(int(item["security_level"])),
+                created_at=int(item["updated_at"]) / 1_000_000_000,
+            )
+        return SubstitutionCommand(
+            identifier=CommandIdentifier.GET_SUBSTITUTION,
+            trigger=item["trigger"],
+            substitution=item["substitution"],
+            security_level=SecurityLevel(int(item["security_level"])),
+        )
+
+    def _get_table_substitutions(self):
+        if self._table_exists(table_name="substitutions"):
+            return self._get_table(table_name="substitutions")
+        new_table = self._dyn_db_resource.create_table(
+            TableName="substitutions",
+            KeySchema=[
+                {"AttributeName": "group_jid", "KeyType": "HASH"},
+                {"AttributeName": "trigger", "KeyType": "RANGE"},
+            ],
+            AttributeDefinitions=[
+                {"AttributeName": "group_jid", "AttributeType": "S"},
+                {"AttributeName": "trigger", "AttributeType": "S"},
+            ],
+            ProvisionedThroughput={"ReadCapacityUnits": 5, "WriteCapacityUnits": 5},
+        )
+        new_table.wait_until_exists()
+        return new_table
@@ -4,6 +4,8 @@ from bot.security_level import SecurityLevel
 
 
 class User:
+    __slots__ = ("_identifier", "_security_level")
+
     def __init__(self, identifier: str, security_level: SecurityLevel):
         self._identifier: str = identifier
         self._security_level: SecurityLevel = security_level
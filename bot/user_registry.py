@@ -1,31 +1,232 @@
-from typing import List
+import threading
+from bisect import bisect_left, insort
+from collections import OrderedDict
+from itertools import islice
+from typing import Dict, Iterable, List, Optional, Tuple
 
+from bot.metrics import count, instrument
 from bot.profile_storage import ProfileStorage
 from bot.security_level import SecurityLevel
 from bot.statics import jid_to_username
 from bot.user import User
+from bot.write_behind_queue import WriteBehindQueue
+
+
+LIST_USERS_PAGE_SIZE = 30
+MAX_UNKNOWN_IDENTIFIERS = 10_000
+LOAD_CHUNK_SIZE = 1_000
 
 
 class UserRegistry:
-    def __init__(self, profile_storage: ProfileStorage):
+    """
+    The known users and their SecurityLevel.
+    By default every profile is loaded, with preload_levels only the users of those levels are, read from the
+    security level index, and any other user is faulted in from the profile storage the first time it is looked up.
+    An empty preload_levels starts with no users at all. Until load_profiles completed, any user that isn't known
+    yet is faulted in as well, so roles are never read or changed from a registry that is still loading.
+    With max_cached_users the users are kept in an LRU of that size and an evicted user is faulted in again.
+    Whenever users are faulted in, identifiers without a profile are remembered in a negative cache, of max_cached_users
+    or MAX_UNKNOWN_IDENTIFIERS entries, so unknown guests don't cost a DynamoDB read per message.
+    """
+
+    def __init__(
+        self,
+        profile_storage: ProfileStorage,
+        scan_segments: int = 1,
+        write_queue: Optional[WriteBehindQueue] = None,
+        preload: bool = True,
+        preload_levels: Optional[Iterable[SecurityLevel]] = None,
+        max_cached_users: Optional[int] = None,
+        load_timeout: float = 30.0,
+    ):
         self._profile_storage = profile_storage
-        self._all_users: List[User] = self._profile_storage.retrieve_profiles()
+        self._scan_segments = scan_segments
+        self._preload_levels = list(preload_levels) if preload_levels is not None else None
+        self._write_queue = write_queue
+        self._max_cached_users = max_cached_users
+        self._all_users: Dict[str, User] = OrderedDict() if max_cached_users else {}
+        self._unknown_identifiers: OrderedDict[str, None] = OrderedDict()
+        self._dirty_users: Dict[str, User] = {}
+        # per SecurityLevel the (username, identifier) of its users, kept sorted for the user listing
+        self._level_indexes: Dict[SecurityLevel, List[Tuple[str, str]]] = {}
+        self._listing_pages: Optional[List[str]] = None
+        self._index_lock = threading.Lock()
+        self._loaded = threading.Event()
+        self._load_complete = False
+        self._load_timeout = load_timeout
+        if preload:
+            self.load_profiles()
+
+    def load_profiles(self) -> None:
+        """
+        Fill the registry from the profile storage, safe to run on a background thread while the bot already serves.
+        The users are added in chunks as the storage returns them, users registered in the meantime are kept over
+        their stored profile.
+        """
+        try:
+            if self._preload_levels is None:
+                stored_users = self._profile_storage.iterate_profiles(total_segments=self._scan_segments)
+            else:
+                stored_users = (
+                    user for level in self._preload_levels for user in self._profile_storage.iterate_by_role(security_level=level)
+                )
+            while chunk := list(islice(stored_users, LOAD_CHUNK_SIZE)):
+                self._add_stored_users(chunk)
+            self._load_complete = True
+        finally:
+            self._loaded.set()
 
+    def _add_stored_users(self, stored_users: List[User]) -> None:
+        with self._index_lock:
+            changed_levels = set()
+            for user in stored_users:
+                if user.get_user_identifier() not in self._all_users:
+                    self._all_users[user.get_user_identifier()] = user
+                    self._level_indexes.setdefault(user.get_user_clearance_level(), []).append(self._index_entry(user))
+                    changed_levels.add(user.get_user_clearance_level())
+            # the index stays sorted for the lookups in between chunks, sorting merges the appended run in linear time
+            for level in changed_levels:
+                self._level_indexes[level].sort()
+            self._evict_users()
+            self._listing_pages = None
+
+    def wait_until_loaded(self, timeout: Optional[float] = None) -> bool:
+        return self._loaded.wait(timeout=timeout)
+
+    @instrument(stage="user_registry")
     def register_user(self, identifier: str, role: SecurityLevel) -> None:
-        if self.is_registered_user(identifier=identifier):
-            user = self.get_user(identifier=identifier)
-            user.set_security_level(security_level=role)
-        else:
-            self._all_users.append(User(identifier=identifier, security_level=role))
-        self._profile_storage.store_profiles(users=self._all_users)
+        # faults in a stored user first, so an unchanged role is not written again
+        self.find_user(identifier=identifier)
+        with self._index_lock:
+            user = self._all_users.get(identifier)
+            if user:
+                if user.get_user_clearance_level() == role:
+                    return
+                level_index = self._level_indexes[user.get_user_clearance_level()]
+                del level_index[bisect_left(level_index, self._index_entry(user))]
+                user.set_security_level(security_level=role)
+            else:
+                user = self._all_users[identifier] = User(identifier=identifier, security_level=role)
+                self._unknown_identifiers.pop(identifier, None)
+            insort(self._level_indexes.setdefault(role, []), self._index_entry(user))
+            self._dirty_users[identifier] = user
+            self._evict_users()
+            self._listing_pages = None
+        self._persist_dirty_users()
 
     def is_registered_user(self, identifier: str) -> bool:
-        return identifier in [user.get_user_identifier() for user in self._all_users]
+        # a roster arriving before the load finished must not register stored users again as guests
+        if not self._loaded.wait(timeout=self._load_timeout):
+            # find_user asks the profile storage until the load completes, no need to wait for it again
+            self._load_timeout = 0
+        return self.find_user(identifier=identifier) is not None
 
     def get_user(self, identifier: str) -> User:
-        return [user for user in self._all_users if user.get_user_identifier() == identifier].pop()
+        user = self.find_user(identifier=identifier)
+        if user is None:
+            raise KeyError(identifier)
+        return user
+
+    @instrument(stage="user_registry")
+    def find_user(self, identifier: str) -> Optional[User]:
+        if self._max_cached_users:
+            with self._index_lock:
+                user = self._all_users.get(identifier)
+                if user is not None:
+                    self._all_users.move_to_end(identifier)
+                    return user
+                if identifier in self._unknown_identifiers:
+                    self._unknown_identifiers.move_to_end(identifier)
+                    return None
+        else:
+            user = self._all_users.get(identifier)
+            if user is not None:
+                return user
+            # every profile was loaded and is kept, a missing user has no profile
+            if self._preload_levels is None and self._load_complete:
+                return None
+            with self._index_lock:
+                if identifier in self._unknown_identifiers:
+                    self._unknown_identifiers.move_to_end(identifier)
+                    return None
+        return self._fault_in(identifier=identifier)
+
+    def _fault_in(self, identifier: str) -> Optional[User]:
+        # an evicted user whose write hasn't reached the profile storage yet must not be read back stale
+        stored_user = self._find_unwritten_user(identifier=identifier)
+        if stored_user is None:
+            stored_user = self._profile_storage.retrieve_profile(identifier=identifier)
+        with self._index_lock:
+            if stored_user is None:
+                count("user_faults", "unknown")
+                self._unknown_identifiers[identifier] = None
+                if len(self._unknown_identifiers) > (self._max_cached_users or MAX_UNKNOWN_IDENTIFIERS):
+                    self._unknown_identifiers.popitem(last=False)
+                return self._all_users.get(identifier)
+            count("user_faults", "stored")
+            user = self._all_users.setdefault(identifier, stored_user)
+            if user is stored_user:
+                insort(self._level_indexes.setdefault(user.get_user_clearance_level(), []), self._index_entry(user))
+                self._evict_users()
+                self._listing_pages = None
+        return user
+
+    def _evict_users(self) -> None:
+        if not self._max_cached_users:
+            return
+        while len(self._all_users) > self._max_cached_users:
+            _, user = self._all_users.popitem(last=False)
+            level_index = self._level_indexes[user.get_user_clearance_level()]
+            del level_index[bisect_left(level_index, self._index_entry(user))]
+
+    def _find_unwritten_user(self, identifier: str) -> Optional[User]:
+        with self._index_lock:
+            user = self._dirty_users.get(identifier)
+            if user is None and self._write_queue:
+                user = self._write_queue.peek(key=identifier)
+            return user
+
+    def _persist_dirty_users(self) -> None:
+        if not self._write_queue:
+            with self._index_lock:
+                dirty_users = list(self._dirty_users.values())
+            if not dirty_users:
+                return
+            self._profile_storage.store_profiles(users=dirty_users)
+            with self._index_lock:
+                for user in dirty_users:
+                    if self._dirty_users.get(user.get_user_identifier()) is user:
+                        del self._dirty_users[user.get_user_identifier()]
+            return
+        # handed over under the lock, so _find_unwritten_user always finds a user in one of the two
+        with self._index_lock:
+            for identifier, user in self._dirty_users.items():
+                self._write_queue.put(key=identifier, item=user)
+            self._dirty_users.clear()
+
+    def get_user_listing(self, page: int = 1) -> str:
+        """One page of the users sorted by username under a heading per SecurityLevel, highest level first."""
+        listing_pages = self._get_listing_pages()
+        if not 1 <= page <= len(listing_pages):
+            return ""
+        return listing_pages[page - 1]
+
+    def count_user_listing_pages(self) -> int:
+        return len(self._get_listing_pages())
+
+    def _get_listing_pages(self) -> List[str]:
+        with self._index_lock:
+            if self._listing_pages is None:
+                lines = []
+                for level in sorted(self._level_indexes, reverse=True):
+                    if self._level_indexes[level]:
+                        lines.append(f"{level.name}:")
+                        lines.extend(username for username, _ in self._level_indexes[level])
+                self._listing_pages = [
+                    "\n".join(lines[start : start + LIST_USERS_PAGE_SIZE]) for start in range(0, len(lines), LIST_USERS_PAGE_SIZE)
+                ]
+            return self._listing_pages
 
-    def get_user_listing(self):
-        return "\n".join(
-            [f"{jid_to_username(user.get_user_identifier())}: {user.get_user_clearance_level().name}" for user in self._all_users]
-        )
+    @staticmethod
+    def _index_entry(user: User) -> Tuple[str, str]:
+        return jid_to_username(user.get_user_identifier()), user.get_user_identifier()
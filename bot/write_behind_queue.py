@@ -0,0 +1,98 @@
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+
+class WriteBehindQueue:
+    """
+    Collects writes and flushes them in batches from a background thread.
+    Repeated writes for the same key are coalesced, only the latest item is flushed.
+    A batch is flushed once max_pending keys are waiting or the oldest write has waited max_delay seconds,
+    drain flushes whatever is left and stops the worker.
+    Items of a failed flush, and the unprocessed_keys of the report a flush returns, are queued again.
+    """
+
+    def __init__(self, flush: Callable[[List[Any]], Any], max_delay: float = 2.0, max_pending: int = 100, name: str = "write-behind"):
+        self._flush = flush
+        self._max_delay = max_delay
+        self._max_pending = max_pending
+        self._pending: Dict[str, Any] = {}
+        self._in_flight: Dict[str, Any] = {}
+        self._oldest_write: Optional[float] = None
+        self._stopped = False
+        self._condition = threading.Condition()
+        self._worker = threading.Thread(target=self._run, name=name, daemon=True)
+        self._worker.start()
+
+    def put(self, key: str, item: Any) -> None:
+        with self._condition:
+            if self._stopped:
+                raise RuntimeError("The write-behind queue has been drained")
+            self._pending[key] = item
+            if self._oldest_write is None:
+                self._oldest_write = time.monotonic()
+                self._condition.notify()
+            elif len(self._pending) >= self._max_pending:
+                self._condition.notify()
+
+    def peek(self, key: str) -> Optional[Any]:
+        """The latest item for key that is waiting or being flushed, None once its flush returned."""
+        with self._condition:
+            item = self._pending.get(key)
+            return item if item is not None else self._in_flight.get(key)
+
+    def pending_count(self) -> int:
+        with self._condition:
+            return len(self._pending)
+
+    def drain(self, timeout: Optional[float] = None) -> None:
+        with self._condition:
+            self._stopped = True
+            self._condition.notify()
+        self._worker.join(timeout=timeout)
+
+    def _run(self) -> None:
+        while True:
+            with self._condition:
+                while not self._stopped and not self._is_due():
+                    self._condition.wait(timeout=self._time_until_due())
+                if not self._pending:
+                    return
+                batch = self._in_flight = self._pending
+                self._pending = {}
+                self._oldest_write = None
+            self._write(batch)
+            with self._condition:
+                self._in_flight = {}
+
+    def _is_due(self) -> bool:
+        if not self._pending:
+            return False
+        return len(self._pending) >= self._max_pending or time.monotonic() - self._oldest_write >= self._max_delay
+
+    def _time_until_due(self) -> Optional[float]:
+        if self._oldest_write is None:
+            return None
+        return max(0.0, self._oldest_write + self._max_delay - time.monotonic())
+
+    def _write(self, batch: Dict[str, Any]) -> None:
+        try:
+            report = self._flush(list(batch.values()))
+        except Exception as error:
+            print(f"Write-behind flush of {len(batch)} items failed: {error}")
+            self._requeue(batch)
+            return
+        unprocessed_keys = getattr(report, "unprocessed_keys", None)
+        if unprocessed_keys:
+            print(f"Write-behind flush left {len(unprocessed_keys)} items unprocessed")
+            self._requeue({key: batch[key] for key in unprocessed_keys if key in batch})
+
+    def _requeue(self, batch: Dict[str, Any]) -> None:
+        with self._condition:
+            if self._stopped:
+                print(f"Dropping {len(batch)} items, the write-behind queue is draining")
+                return
+            for key, item in batch.items():
+                self._pending.setdefault(key, item)
+            if self._oldest_write is None:
+                self._oldest_write = time.monotonic()
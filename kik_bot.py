@@ -1,3 +1,6 @@
+import threading
+from typing import Optional
+
 from kik_unofficial.callbacks import KikClientCallback
 from kik_unofficial.client import KikClient
 from kik_unofficial.datatypes.peers import Group, GroupMember, User
@@ -12,17 +15,30 @@ from kik_unofficial.datatypes.xmpp.chatting import (
 from kik_unofficial.datatypes.xmpp.login import ConnectionFailedResponse
 from kik_unofficial.datatypes.xmpp.roster import FetchRosterResponse
 
+from bot.activity_storage import ActivityStorage
+from bot.activity_tracker import ActivityTracker
+from bot.async_chat_bot import AsyncChatBot
 from bot.chat_bot import ChatBot
-from bot.command_registry import CommandRegistry
+from bot.config import config_cache
 from bot.message import Message
+from bot.message_pipeline import MessagePipeline
+from bot.metrics import HistogramMetrics, PeriodicLogReporter, serve_prometheus, set_metrics_hook
 from bot.profile_storage import ProfileStorage
+from bot.security_level import SecurityLevel
+from bot.sharded_command_registry import ShardedCommandRegistry
 from bot.statics import get_config
+from bot.substitution_storage import SubstitutionStorage
 from bot.user_registry import UserRegistry
+from bot.write_behind_queue import WriteBehindQueue
 
 
 class InteractiveChatClient(KikClientCallback):
-    def __init__(self, chat_bot: ChatBot):
+    def __init__(
+        self, chat_bot: ChatBot, message_pipeline: Optional[MessagePipeline] = None, activity_tracker: Optional[ActivityTracker] = None
+    ):
         self.chat_bot = chat_bot
+        self.message_pipeline = message_pipeline
+        self.activity_tracker = activity_tracker
         self._groups = []
         self._users = []
         self._user_info = []
@@ -54,26 +70,49 @@ class InteractiveChatClient(KikClientCallback):
                 self._groups.append({"name": peer.name, "group_jid": peer.jid})
                 for member in peer.members:
                     self._add_group_member(member)
+                    if self.activity_tracker:
+                        self.activity_tracker.add_member(group=peer.jid, identifier=member.jid)
             elif peer.__class__ == User:
                 self._add_user(peer)
         self.update_users()
 
     def on_group_message_received(self, response: IncomingGroupChatMessage):
+        if self.activity_tracker:
+            self.activity_tracker.record_text(
+                identifier=response.from_jid, timestamp=int(response.metadata.timestamp), group=response.group_jid
+            )
         incoming_message = Message(body=response.body, sent_by=response.from_jid, sent_in=response.group_jid)
+        if self.message_pipeline:
+            self.message_pipeline.submit(message=incoming_message, message_id=response.message_id)
+            return
         answer = self.chat_bot.process_message(message=incoming_message)
         if answer and self.client:
-            self.client.send_chat_message(peer_jid=response.group_jid, message=answer)
-        self.client.send_read_receipt(peer_jid=response.from_jid, receipt_message_id=response.message_id, group_jid=response.group_jid)
+            self.send_group_reply(group_jid=response.group_jid, answer=answer)
+        self.send_group_read_receipt(message=incoming_message, message_id=response.message_id)
+
+    def send_group_reply(self, group_jid: str, answer: str):
+        self.client.send_chat_message(peer_jid=group_jid, message=answer)
+
+    def send_group_read_receipt(self, message: Message, message_id: str):
+        self.client.send_read_receipt(peer_jid=message.sent_by, receipt_message_id=message_id, group_jid=message.sent_in)
 
     def on_connection_failed(self, response: ConnectionFailedResponse):
         print(f"Connection failed: {response.message}")
 
     def on_video_received(self, response: IncomingVideoMessage):
         print(f"Video sent on {response.metadata.timestamp} url: {response.video_url}")
+        if self.activity_tracker:
+            self.activity_tracker.record_media(
+                identifier=response.from_jid, timestamp=int(response.metadata.timestamp), group=response.group_jid
+            )
         self.client.send_read_receipt(peer_jid=response.from_jid, receipt_message_id=response.message_id, group_jid=response.group_jid)
 
     def on_image_received(self, response: IncomingImageMessage):
         print(f"Image sent on {response.metadata.timestamp} url: {response.image_url}")
+        if self.activity_tracker:
+            self.activity_tracker.record_media(
+                identifier=response.from_jid, timestamp=int(response.metadata.timestamp), group=response.group_jid
+            )
         self.client.send_read_receipt(peer_jid=response.from_jid, receipt_message_id=response.message_id, group_jid=response.group_jid)
 
     def on_chat_message_received(self, response: IncomingChatMessage):
@@ -85,6 +124,8 @@ class InteractiveChatClient(KikClientCallback):
 
     def on_status_message_received(self, response: IncomingStatusResponse):
         print(f"Status {response.status} sent on {response.metadata.timestamp} by: {response.from_jid}")
+        if self.activity_tracker:
+            self.activity_tracker.record_read(identifier=response.from_jid, timestamp=int(response.metadata.timestamp))
         self.client.send_read_receipt(peer_jid=response.from_jid, receipt_message_id=response.message_id)
 
     def on_group_status_received(self, response: IncomingGroupStatus):
@@ -102,22 +143,93 @@ class InteractiveChatClient(KikClientCallback):
 class BotSetUp:
     def __init__(self, bot_name: str):
         self.exit_loop = False
+        config_cache.install_signal_handler()
         self.config = get_config()
-        self.profile_storage = ProfileStorage()
-        self.users_registry = UserRegistry(profile_storage=self.profile_storage)
-        self.command_registry = CommandRegistry(bot_name=bot_name)
-        self.dotty_bot = ChatBot(
+        self._set_up_metrics(self.config.get("metrics", {}))
+        storage_config = self.config.get("storage", {})
+        self.profile_storage = ProfileStorage(endpoint_url=storage_config.get("endpoint_url"))
+        self.profile_write_queue = WriteBehindQueue(
+            flush=self.profile_storage.store_profiles,
+            max_delay=storage_config.get("write_max_delay", 2.0),
+            max_pending=storage_config.get("write_max_pending", 100),
+        )
+        self.users_registry = UserRegistry(
+            profile_storage=self.profile_storage,
+            scan_segments=storage_config.get("scan_segments", 1),
+            write_queue=self.profile_write_queue,
+            preload=False,
+            preload_levels=self._get_preload_levels(storage_config),
+            max_cached_users=storage_config.get("max_cached_users"),
+        )
+        self.substitution_storage = SubstitutionStorage(endpoint_url=storage_config.get("endpoint_url"))
+        self.command_registry = ShardedCommandRegistry(
+            bot_name=bot_name, substitution_storage=self.substitution_storage, max_shards=storage_config.get("max_group_shards", 256)
+        )
+        self.activity_storage = ActivityStorage(endpoint_url=storage_config.get("endpoint_url"))
+        self.activity_tracker = ActivityTracker(
+            activity_storage=self.activity_storage,
+            max_delay=storage_config.get("activity_max_delay", 30.0),
+            max_pending=storage_config.get("activity_max_pending", 500),
+        )
+        pipeline_config = self.config.get("pipeline", {})
+        self.dotty_bot = AsyncChatBot(
             name=bot_name,
             owner_identifier=self.config["owner"]["jid"],
             users_registry=self.users_registry,
             command_registry=self.command_registry,
+            max_workers=pipeline_config.get("max_workers", 4),
+            activity_tracker=self.activity_tracker,
         )
 
-        self.callback = InteractiveChatClient(self.dotty_bot)
+        self.callback = InteractiveChatClient(self.dotty_bot, activity_tracker=self.activity_tracker)
+        self.message_pipeline = MessagePipeline(
+            chat_bot=self.dotty_bot,
+            send_message=self.callback.send_group_reply,
+            send_read_receipt=self.callback.send_group_read_receipt,
+            max_pending=pipeline_config.get("max_pending", 1000),
+            max_pending_per_group=pipeline_config.get("max_pending_per_group", 100),
+            group_idle_timeout=pipeline_config.get("group_idle_timeout", 300.0),
+        )
+        self.message_pipeline.start()
+        self.callback.message_pipeline = self.message_pipeline
         self.client = KikClient(
             callback=self.callback, kik_username=self.config["bot"]["account"], kik_password=self.config["bot"]["password"]
         )
         self.callback.set_client(self.client)
+        threading.Thread(target=self._warm_up_storage, name="storage-warm-up", daemon=True).start()
+
+    def _warm_up_storage(self):
+        try:
+            for storage in [self.profile_storage, self.substitution_storage, self.activity_storage]:
+                if not storage.verify_schema():
+                    print(f"{type(storage).__name__} tables are missing or incomplete, run `make provision` first")
+        except Exception as error:
+            print(f"Could not verify the storage schema: {error}")
+        try:
+            # load_profiles marks the users registry loaded even when it fails, so rosters never wait for it forever
+            self.users_registry.load_profiles()
+            self.activity_tracker.load_activities()
+            print("Storage warmed up")
+        except Exception as error:
+            print(f"Could not warm up the storage: {error}")
+
+    @staticmethod
+    def _get_preload_levels(storage_config):
+        if "preload_levels" not in storage_config:
+            return None
+        return [SecurityLevel[level_name] for level_name in storage_config["preload_levels"]]
+
+    def _set_up_metrics(self, metrics_config):
+        self.metrics_server = None
+        self.metrics_reporter = None
+        if not metrics_config.get("enabled", False):
+            return
+        metrics = HistogramMetrics()
+        set_metrics_hook(metrics)
+        if metrics_config.get("prometheus_port"):
+            self.metrics_server = serve_prometheus(metrics, port=metrics_config["prometheus_port"])
+        if metrics_config.get("log_interval"):
+            self.metrics_reporter = PeriodicLogReporter(metrics, interval=metrics_config["log_interval"])
 
     def bot_loop(self):
         while not self.exit_loop:
@@ -128,8 +240,17 @@ class BotSetUp:
 
     def stop_session(self):
         self.exit_loop = True
+        # the queued replies and read receipts still need the connected client
+        self.message_pipeline.stop()
         self.client.loop.stop()
         self.client.disconnect()
+        self.dotty_bot.shutdown()
+        self.profile_write_queue.drain()
+        self.activity_tracker.drain()
+        if self.metrics_reporter:
+            self.metrics_reporter.stop()
+        if self.metrics_server:
+            self.metrics_server.shutdown()
 
 
 if __name__ == "__main__":
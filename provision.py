@@ -0,0 +1,19 @@
+"""
+Creates the DynamoDB tables and indexes the bot needs, run once per environment before starting the bot.
+
+    python provision.py [endpoint_url]
+"""
+
+import sys
+
+from bot.activity_storage import ActivityStorage
+from bot.profile_storage import ProfileStorage
+from bot.substitution_storage import SubstitutionStorage
+
+
+if __name__ == "__main__":
+    endpoint_url = sys.argv[1] if len(sys.argv) > 1 else None
+    for storage_class in [ProfileStorage, SubstitutionStorage, ActivityStorage]:
+        storage = storage_class(endpoint_url=endpoint_url)
+        storage.provision()
+        print(f"{type(storage).__name__} schema verified")
@@ -0,0 +1,2 @@
+#!/bin/bash
+poetry run python -m benchmarks.message_hot_path "$@"
\ No newline at end of file
@@ -0,0 +1,89 @@
+import time
+
+from expects import equal, expect
+from mamba import after, before, context, describe, it
+
+from bot.activity import Activity
+from bot.activity_tracker import ActivityTracker
+from spec.fakes import FakeActivityStorage
+
+
+with describe("Given an activity tracker") as self:
+    with before.each:
+        self.activity_storage = FakeActivityStorage()
+        self.activity_tracker = ActivityTracker(activity_storage=self.activity_storage, max_delay=60)
+
+    with after.each:
+        self.activity_tracker.drain()
+
+    with context("when a user posts text, media and reads"):
+        with before.each:
+            self.activity_tracker.record_text(identifier="pascal@", timestamp=1_000)
+            self.activity_tracker.record_media(identifier="pascal@", timestamp=2_000)
+            self.activity_tracker.record_read(identifier="pascal@", timestamp=3_000)
+
+        with it("should keep every timestamp"):
+            activity = self.activity_tracker.get_activity(identifier="pascal@")
+            expect((activity.get_last_text(), activity.get_last_media(), activity.get_last_read())).to(equal((1_000, 2_000, 3_000)))
+
+        with it("should ignore an older timestamp"):
+            self.activity_tracker.record_text(identifier="pascal@", timestamp=500)
+            expect(self.activity_tracker.get_activity(identifier="pascal@").get_last_text()).to(equal(1_000))
+
+    with context("when a user posts many messages before a flush"):
+        with it("should store the user once with the latest timestamp"):
+            for timestamp in range(1, 101):
+                self.activity_tracker.record_text(identifier="pascal@", timestamp=timestamp)
+            self.activity_tracker.drain()
+            stored = [(activity.get_user_identifier(), activity.get_last_text()) for activity in self.activity_storage.stored_activities]
+            expect(stored).to(equal([("pascal@", 100)]))
+
+    with context("when asked when a user was last seen"):
+        with it("should say when the latest activity was"):
+            self.activity_tracker.record_read(identifier="pascal@", timestamp=int(time.time() * 1000) - 2 * 3600 * 1000)
+            expect(self.activity_tracker.last_seen(identifier="pascal@")).to(equal("2 hours ago"))
+
+        with it("should return None for a user never seen"):
+            expect(self.activity_tracker.last_seen(identifier="nobody@")).to(equal(None))
+
+    with context("when the stored activity is loaded"):
+        with it("should keep newer timestamps recorded before the load"):
+            self.activity_storage.stored_activities = [Activity(identifier="pascal@", last_text=5_000, last_media=1_000)]
+            self.activity_tracker.record_text(identifier="pascal@", timestamp=9_000)
+            self.activity_tracker.load_activities()
+            activity = self.activity_tracker.get_activity(identifier="pascal@")
+            expect((activity.get_last_text(), activity.get_last_media())).to(equal((9_000, 1_000)))
+
+    with context("when a group has members with and without activity"):
+        with before.each:
+            for index in range(50):
+                self.activity_tracker.record_text(identifier=f"member_{index}@", timestamp=(index + 1) * 1_000, group="#group")
+            self.activity_tracker.add_member(group="#group", identifier="lurker@")
+            self.activity_tracker.record_text(identifier="elsewhere@", timestamp=1_000, group="#other")
+
+        with it("should list the silent members of the group, oldest first"):
+            members, total = self.activity_tracker.get_silent_members(group="#group", since=3_500)
+            expect((members, total)).to(equal(([(0, "lurker@"), (1_000, "member_0@"), (2_000, "member_1@"), (3_000, "member_2@")], 4)))
+
+        with it("should page through the silent members"):
+            members, total = self.activity_tracker.get_silent_members(group="#group", since=30_500, offset=20, limit=20)
+            expect((members[0], len(members), total)).to(equal(((20_000, "member_19@"), 11, 31)))
+
+        with it("should move a member that posts out of the report"):
+            self.activity_tracker.record_media(identifier="lurker@", timestamp=60_000, group="#group")
+            members, total = self.activity_tracker.get_silent_members(group="#group", since=1_500)
+            expect((members, total)).to(equal(([(1_000, "member_0@")], 1)))
+
+        with it("should not count reads or posts in other groups"):
+            self.activity_tracker.record_read(identifier="lurker@", timestamp=60_000, group="#group")
+            self.activity_tracker.record_text(identifier="member_0@", timestamp=60_000, group="#other")
+            members, total = self.activity_tracker.get_silent_members(group="#group", since=1_500)
+            expect((members, total)).to(equal(([(0, "lurker@"), (1_000, "member_0@")], 2)))
+
+        with it("should store and load the last post per group"):
+            self.activity_tracker.drain()
+            activity_tracker = ActivityTracker(activity_storage=self.activity_storage, max_delay=60)
+            activity_tracker.load_activities()
+            members, total = activity_tracker.get_silent_members(group="#group", since=2_500)
+            expect((members, total)).to(equal(([(1_000, "member_0@"), (2_000, "member_1@")], 2)))
+            activity_tracker.drain()
@@ -0,0 +1,56 @@
+from expects import equal, expect
+from mamba import before, context, describe, it
+
+from bot.batch_writer import BatchWriter
+from spec.fakes import FakeBatchWriteResource
+
+
+with describe("Given a batch writer") as self:
+    with before.each:
+        self.delays = []
+        self.items = [{"identifier": f"user_{index}", "security_level": 5} for index in range(60)]
+
+    with context("when it writes 60 items"):
+        with before.each:
+            self.resource = FakeBatchWriteResource()
+            self.writer = BatchWriter(self.resource, table_name="profiles", key_name="identifier", sleep=self.delays.append)
+            self.report = self.writer.put_items(self.items)
+
+        with it("should send 3 requests of at most 25 items"):
+            expect([len(request["profiles"]) for request in self.resource.requests]).to(equal([25, 25, 10]))
+
+        with it("should report every item as written"):
+            expect(self.report.items_written).to(equal(60))
+
+        with it("should not retry"):
+            expect(self.report.retries).to(equal(0))
+
+    with context("when the same key is written twice"):
+        with it("should only write the last item"):
+            resource = FakeBatchWriteResource()
+            writer = BatchWriter(resource, table_name="profiles", key_name="identifier", sleep=self.delays.append)
+            writer.put_items([{"identifier": "pascal", "security_level": 5}, {"identifier": "pascal", "security_level": 9}])
+            expect(resource.written_items).to(equal([{"identifier": "pascal", "security_level": 9}]))
+
+    with context("when DynamoDB returns unprocessed items"):
+        with before.each:
+            self.resource = FakeBatchWriteResource(unprocessed_rounds=3)
+            self.writer = BatchWriter(self.resource, table_name="profiles", key_name="identifier", base_delay=0.1, sleep=self.delays.append)
+            self.report = self.writer.put_items(self.items[:5])
+
+        with it("should retry them with exponential backoff"):
+            expect(self.delays).to(equal([0.1, 0.2, 0.4]))
+
+        with it("should report the retries"):
+            expect(self.report.retries).to(equal(3))
+
+        with it("should eventually write every item"):
+            expect(self.report.items_written).to(equal(5))
+
+    with context("when DynamoDB keeps returning unprocessed items"):
+        with it("should give them back in the report"):
+            resource = FakeBatchWriteResource(unprocessed_rounds=10)
+            writer = BatchWriter(resource, table_name="profiles", key_name="identifier", max_retries=2, sleep=self.delays.append)
+            report = writer.put_items(self.items[:5])
+            expect(len(report.unprocessed_items)).to(equal(2))
+            expect(report.unprocessed_keys).to(equal([item["identifier"] for item in report.unprocessed_items]))
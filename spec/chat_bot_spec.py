@@ -1,11 +1,17 @@
-from expects import equal, expect
-from mamba import context, describe, it
+import time
 
+from expects import equal, expect, start_with
+from mamba import before, context, describe, it
+
+from bot.activity_tracker import ActivityTracker
 from bot.chat_bot import ChatBot
 from bot.command_identifier import CommandIdentifier
+from bot.command_registry import CommandRegistry
 from bot.message import Message
 from bot.security_level import SecurityLevel
-from spec.fakes import FakeCommand, FakeCommandRegistry, FakeUser, FakeUserRegistry
+from bot.user import User
+from bot.user_registry import UserRegistry
+from spec.fakes import FakeActivityStorage, FakeCommand, FakeCommandRegistry, FakeProfileStorage, FakeUser, FakeUserRegistry
 
 
 with describe("Given the bot Dotty") as self:
@@ -486,3 +492,122 @@ with describe("Given the bot Dotty") as self:
                 input_message = Message("Users", "@owner", "#group")
                 # Assertion
                 expect(self.chat_bot.process_message(input_message)).to(equal("The current users\nPascal"))
+
+        with context("and they ask when a member was last seen"):
+            with it("should tell when the member was last active"):
+                # Set Up
+                self.command_registry = FakeCommandRegistry()
+                self.command_registry.get_matching_command_response = FakeCommand()
+                self.command_registry.get_matching_command_response.identifier = CommandIdentifier.LAST_SEEN
+                self.command_registry.get_matching_command_response.get_trigger_response = "Last Seen "
+                self.users_registry = FakeUserRegistry()
+                self.users_registry.get_user_response = FakeUser()
+                self.users_registry.get_user_response.get_user_clearance_level_response = SecurityLevel.USER
+                self.activity_tracker = ActivityTracker(activity_storage=FakeActivityStorage(), max_delay=60)
+                self.activity_tracker.record_text(identifier="@pascal", timestamp=int(time.time() * 1000) - 3 * 60 * 1000)
+
+                self.chat_bot = ChatBot(
+                    name="Dotty",
+                    owner_identifier="@owner",
+                    users_registry=self.users_registry,
+                    command_registry=self.command_registry,
+                    activity_tracker=self.activity_tracker,
+                )
+                # Run
+                input_message = Message("Last Seen @pascal", "@user", "#group")
+                # Assertion
+                expect(self.chat_bot.process_message(input_message)).to(equal("@pascal was last seen 3 minutes ago"))
+                self.activity_tracker.drain()
+
+        with context("and they ask for the members silent for 30 days"):
+            with before.each:
+                self.command_registry = FakeCommandRegistry()
+                self.command_registry.get_matching_command_response = FakeCommand()
+                self.command_registry.get_matching_command_response.identifier = CommandIdentifier.LIST_SILENT_MEMBERS
+                self.command_registry.get_matching_command_response.get_trigger_response = "Silent "
+                self.users_registry = FakeUserRegistry()
+                self.users_registry.get_user_response = FakeUser()
+                self.users_registry.get_user_response.get_user_clearance_level_response = SecurityLevel.ADMIN
+                self.activity_tracker = ActivityTracker(activity_storage=FakeActivityStorage(), max_delay=60)
+                now = int(time.time() * 1000)
+                self.activity_tracker.record_text(identifier="pascal_abc@talk.kik.com", timestamp=now - 40 * 86_400_000, group="#group")
+                self.activity_tracker.record_text(identifier="dotty_abc@talk.kik.com", timestamp=now, group="#group")
+                self.activity_tracker.add_member(group="#group", identifier="lurker_abc@talk.kik.com")
+                self.chat_bot = ChatBot(
+                    name="Dotty",
+                    owner_identifier="@owner",
+                    users_registry=self.users_registry,
+                    command_registry=self.command_registry,
+                    activity_tracker=self.activity_tracker,
+                )
+
+            with it("should list them oldest first with a page heading"):
+                input_message = Message("Silent 30", "@admin", "#group")
+                expect(self.chat_bot.process_message(input_message)).to(
+                    equal("2 members silent for 30 days, page 1/1\nlurker: never\npascal: 5 weeks ago")
+                )
+                self.activity_tracker.drain()
+
+            with it("should explain the usage without a number of days"):
+                input_message = Message("Silent please", "@admin", "#group")
+                expect(self.chat_bot.process_message(input_message)).to(equal("Usage: Silent <days> [page]"))
+                self.activity_tracker.drain()
+
+    with context("when an admin sets a pattern substitution"):
+        with before.each:
+            self.users_registry = FakeUserRegistry()
+            self.users_registry.get_user_response = FakeUser()
+            self.users_registry.get_user_response.get_user_clearance_level_response = SecurityLevel.ADMIN
+            self.chat_bot = ChatBot(
+                name="Dotty",
+                owner_identifier="@owner",
+                users_registry=self.users_registry,
+                command_registry=CommandRegistry(),
+            )
+
+        with it("should confirm the pattern"):
+            expect(self.chat_bot.process_message(Message("good * ~> Hi {sender}!", "pascal_abc@talk.kik.com", "#group"))).to(
+                equal('When you say something like: "good *", I say: Hi {sender}!')
+            )
+
+        with it("should answer a matching message with the placeholders filled in"):
+            self.chat_bot.process_message(Message("good * ~> Hi {sender}, the theme is {theme}", "pascal_abc@talk.kik.com", "#group"))
+            expect(self.chat_bot.process_message(Message("Good Morning", "dotty_abc@talk.kik.com", "#group"))).to(
+                equal("Hi dotty, the theme is No theme set")
+            )
+
+        with it("should refuse a regex that doesn't compile"):
+            expect(self.chat_bot.process_message(Message("/h(i/ ~> hello", "pascal_abc@talk.kik.com", "#group"))).to(
+                equal('The pattern "/h(i/" is not valid: missing ), unterminated subpattern')
+            )
+
+        with it("should refuse a regex with a backreference"):
+            expect(self.chat_bot.process_message(Message("/(a)\\1/ ~> hello", "pascal_abc@talk.kik.com", "#group"))).to(
+                equal('The pattern "/(a)\\1/" is not valid: groups are not supported, use (?:...)')
+            )
+
+        with it("should refuse a second pattern with the same group name and keep answering"):
+            self.chat_bot.process_message(Message("/(?P<x>hi)/ ~> hello", "pascal_abc@talk.kik.com", "#group"))
+            expect(self.chat_bot.process_message(Message("/(?P<x>yo)/ ~> hello", "pascal_abc@talk.kik.com", "#group"))).to(
+                equal('The pattern "/(?P<x>yo)/" is not valid: groups are not supported, use (?:...)')
+            )
+            expect(self.chat_bot.process_message(Message("Usage", "pascal_abc@talk.kik.com", "#group"))).to(
+                start_with("These commands are available:")
+            )
+
+    with context("when the owner grants a role while the profiles are still loading"):
+        with before.each:
+            self.profile_storage = FakeProfileStorage()
+            self.profile_storage.all_profiles = [User(identifier="bob_abc@talk.kik.com", security_level=SecurityLevel.ADMIN)]
+            self.chat_bot = ChatBot(
+                name="Dotty",
+                owner_identifier="@owner",
+                users_registry=UserRegistry(profile_storage=self.profile_storage, preload=False),
+                command_registry=CommandRegistry(),
+            )
+
+        with it("should see the stored role and keep it"):
+            expect(self.chat_bot.process_message(Message("Grant User bob_abc@talk.kik.com", "@owner", "#group"))).to(
+                equal("User already registered")
+            )
+            expect(self.profile_storage.stored_batches[1:]).to(equal([]))
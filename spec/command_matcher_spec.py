@@ -0,0 +1,97 @@
+import re
+
+from expects import be, equal, expect, raise_error
+from mamba import before, context, describe, it
+
+from bot.command import ContainsCommand, ExactCommand, PatternSubstitutionCommand, StartsWithCommand, SubstitutionCommand
+from bot.command_identifier import CommandIdentifier
+from bot.command_matcher import CommandMatcher
+from bot.command_registry import CommandRegistry
+from bot.security_level import SecurityLevel
+
+
+with describe("Given a command matcher") as self:
+    with before.each:
+        self.exact = ExactCommand(CommandIdentifier.GET_THEME, "Theme", "Get the theme", SecurityLevel.USER)
+        self.starts_with = StartsWithCommand(CommandIdentifier.SET_THEME, "Set Theme ", "Set the theme", SecurityLevel.ADMIN)
+        self.contains = ContainsCommand(CommandIdentifier.SET_USER_SUBSTITUTION, " -> ", "Substitute", SecurityLevel.ADMIN)
+        self.substitution = SubstitutionCommand(CommandIdentifier.GET_SUBSTITUTION, "set theme x", "substituted", SecurityLevel.USER)
+        self.matcher = CommandMatcher([self.exact, self.starts_with, self.contains, self.substitution])
+
+    with context("when the message equals an exact trigger in another case"):
+        with it("should return the exact command"):
+            expect(self.matcher.match("theme", SecurityLevel.USER)).to(be(self.exact))
+
+    with context("when the message starts with a trigger"):
+        with it("should return the starts with command"):
+            expect(self.matcher.match("set theme summer", SecurityLevel.ADMIN)).to(be(self.starts_with))
+
+    with context("when the message contains a trigger"):
+        with it("should return the contains command"):
+            expect(self.matcher.match("hi -> hello", SecurityLevel.ADMIN)).to(be(self.contains))
+
+    with context("when several commands match"):
+        with it("should return the one that was added first"):
+            expect(self.matcher.match("set theme x", SecurityLevel.ADMIN)).to(be(self.starts_with))
+
+        with it("should skip the commands the user has no clearance for"):
+            expect(self.matcher.match("set theme x", SecurityLevel.USER)).to(be(self.substitution))
+
+    with context("when a guest sends a message"):
+        with it("should not search the commands of higher Security Levels"):
+            self.matcher.match("hi -> hello", SecurityLevel.GUEST)
+            expect(self.matcher._partitions[SecurityLevel.ADMIN].contains._compiled).to(equal(False))
+
+    with context("when several pattern triggers match"):
+        with it("should return the one that was added first"):
+            first = PatternSubstitutionCommand(CommandIdentifier.GET_PATTERN_SUBSTITUTION, "good *", "first", SecurityLevel.USER)
+            second = PatternSubstitutionCommand(
+                CommandIdentifier.GET_PATTERN_SUBSTITUTION, "/good (?:morning|night)/", "second", SecurityLevel.USER
+            )
+            matcher = CommandMatcher([second, first])
+            matcher.remove(second)
+            matcher.add(second)
+            expect(matcher.match("good night", SecurityLevel.USER)).to(be(first))
+
+    with context("when a pattern can't be combined with the others"):
+        with it("should refuse it and keep matching the others"):
+            first = PatternSubstitutionCommand(CommandIdentifier.GET_PATTERN_SUBSTITUTION, "/hi/", "first", SecurityLevel.USER)
+            matcher = CommandMatcher([first])
+            broken = PatternSubstitutionCommand(CommandIdentifier.GET_PATTERN_SUBSTITUTION, "/yo/", "broken", SecurityLevel.USER)
+            broken._trigger = "/(?P<r0>yo)/"
+            expect(lambda: matcher.add(broken)).to(raise_error(re.error))
+            expect(matcher.match("hi", SecurityLevel.USER)).to(be(first))
+
+    with context("when a command is removed"):
+        with it("should no longer match it"):
+            self.matcher.remove(self.contains)
+            expect(self.matcher.match("hi -> hello", SecurityLevel.OWNER)).to(equal(None))
+
+    with context("when nothing matches"):
+        with it("should return None"):
+            expect(self.matcher.match("nothing to see here", SecurityLevel.OWNER)).to(equal(None))
+
+    with context("when contains triggers overlap"):
+        with it("should find every trigger in the message"):
+            first = ContainsCommand(CommandIdentifier.UNSET, "abcd", "first", SecurityLevel.USER)
+            second = ContainsCommand(CommandIdentifier.UNSET, "bc", "second", SecurityLevel.GUEST)
+            matcher = CommandMatcher([first, second])
+            expect(matcher.match("xabcdx", SecurityLevel.USER)).to(be(first))
+            expect(matcher.match("xabcdx", SecurityLevel.GUEST)).to(be(second))
+
+with describe("Given a command registry with substitutions") as self:
+    with context("when matching messages"):
+        with it("should give the same command as walking the commands in order"):
+            command_registry = CommandRegistry()
+            command_registry.register_substitution(trigger="hello", substitution="hi", security_level=SecurityLevel.USER)
+            command_registry.register_substitution(trigger="Usage", substitution="nope", security_level=SecurityLevel.ADMIN)
+            command_registry.register_substitution(trigger="hello", substitution="hey", security_level=SecurityLevel.ADMIN)
+            command_registry.register_pattern_substitution(trigger="hel*", substitution="glob", security_level=SecurityLevel.USER)
+            command_registry.register_pattern_substitution(trigger="/no+thing/", substitution="regex", security_level=SecurityLevel.GUEST)
+            messages = ["hello", "HELLO", "help", "usage", "List", "set theme fun", "a -> b", "a => b", "revoke user x", "User List"]
+            messages.append("nothing")
+            commands = list(command_registry._all_commands.values())
+            for message in messages:
+                for level in SecurityLevel:
+                    expected = next((command for command in commands if command.has_match(message, level)), None)
+                    expect(command_registry.get_matching_command(message, level)).to(be(expected))
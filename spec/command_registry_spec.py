@@ -1,8 +1,11 @@
-from expects import equal, expect
+from expects import equal, expect, raise_error
 from mamba import before, context, describe, it
 
+from bot.command import SubstitutionCommand
+from bot.command_identifier import CommandIdentifier
 from bot.command_registry import CommandRegistry
 from bot.security_level import SecurityLevel
+from spec.fakes import FakeSubstitutionStorage
 
 
 with describe("Given a command registry") as self:
@@ -48,6 +51,14 @@ with describe("Given a command registry") as self:
                     )
                 ).to(equal(None))
 
+            with it("should keep the higher level substitution"):
+                self.command_registry.register_substitution(
+                    trigger="trigger", substitution="This is an even better text", security_level=SecurityLevel.USER
+                )
+                expect(
+                    self.command_registry.get_matching_command(message="trigger", user_security_level=SecurityLevel.ADMIN).__repr__()
+                ).to(equal("This is a better text"))
+
         with context("and a you try to register the same trigger and security level combo again"):
             with it("should replace the command"):
                 expect(
@@ -55,3 +66,74 @@ with describe("Given a command registry") as self:
                         trigger="trigger", substitution="This is an even better text", security_level=SecurityLevel.ADMIN
                     ).__repr__()
                 ).to(equal("This is an even better text"))
+
+    with context("when it has a substitution storage"):
+        with before.each:
+            self.substitution_storage = FakeSubstitutionStorage()
+            self.command_registry = CommandRegistry(substitution_storage=self.substitution_storage)
+
+        with context("and a substitution is registered in a group"):
+            with it("should store it for that group"):
+                self.command_registry.register_substitution(
+                    trigger="trigger", substitution="text", security_level=SecurityLevel.USER, group="#group"
+                )
+                expect([command.get_trigger() for command in self.substitution_storage.substitutions["#group"]]).to(equal(["trigger"]))
+
+        with context("and nothing has been said in a group yet"):
+            with it("should not load the group's substitutions"):
+                expect(self.substitution_storage.retrieved_groups).to(equal([]))
+
+        with context("and a group is loaded twice"):
+            with before.each:
+                self.substitution_storage.store_substitution(
+                    group="#group",
+                    command=SubstitutionCommand(CommandIdentifier.GET_SUBSTITUTION, "trigger", "text", SecurityLevel.USER),
+                )
+                self.command_registry.load_group("#group")
+                self.command_registry.load_group("#group")
+
+            with it("should retrieve the substitutions only once"):
+                expect(self.substitution_storage.retrieved_groups).to(equal(["#group"]))
+
+            with it("should match the stored substitutions"):
+                expect(str(self.command_registry.get_matching_command(message="trigger", user_security_level=SecurityLevel.USER))).to(
+                    equal("text")
+                )
+
+        with context("and retrieving a group's substitutions fails"):
+            with it("should retrieve them again on the next load"):
+                self.substitution_storage.store_substitution(
+                    group="#group",
+                    command=SubstitutionCommand(CommandIdentifier.GET_SUBSTITUTION, "trigger", "text", SecurityLevel.USER),
+                )
+                retrieve_substitutions = self.substitution_storage.retrieve_substitutions
+
+                def failing_retrieve_substitutions(group):
+                    self.substitution_storage.retrieve_substitutions = retrieve_substitutions
+                    raise ConnectionError("DynamoDB is unreachable")
+
+                self.substitution_storage.retrieve_substitutions = failing_retrieve_substitutions
+                expect(lambda: self.command_registry.load_group("#group")).to(raise_error(ConnectionError))
+                self.command_registry.load_group("#group")
+                expect(str(self.command_registry.get_matching_command(message="trigger", user_security_level=SecurityLevel.USER))).to(
+                    equal("text")
+                )
+
+    with context("when the substitutions are listed twice"):
+        with before.each:
+            self.command_registry = CommandRegistry()
+            self.command_registry.register_substitution(trigger="hello", substitution="hi", security_level=SecurityLevel.USER)
+            self.command_registry.register_substitution(trigger="secret", substitution="psst", security_level=SecurityLevel.ADMIN)
+
+        with it("should reuse the rendered listing"):
+            first_listing = self.command_registry.get_substitution_listing(user_security_level=SecurityLevel.ADMIN)
+            expect(self.command_registry.get_substitution_listing(user_security_level=SecurityLevel.ADMIN) is first_listing).to(equal(True))
+
+        with it("should only list what the Security Level may use"):
+            expect(self.command_registry.get_substitution_listing(user_security_level=SecurityLevel.USER)).to(equal("hello"))
+
+        with context("and a substitution is registered in between"):
+            with it("should list the new substitution"):
+                self.command_registry.get_substitution_listing(user_security_level=SecurityLevel.USER)
+                self.command_registry.register_substitution(trigger="bye", substitution="later", security_level=SecurityLevel.USER)
+                expect(self.command_registry.get_substitution_listing(user_security_level=SecurityLevel.USER)).to(equal("hello, bye"))
@@ -1,8 +1,11 @@
-from expects import equal, expect
+import re
+
+from expects import equal, expect, raise_error
 from mamba import context, describe, it
 
-from bot.command import Command, ContainsCommand, ExactCommand, StartsWithCommand, SubstitutionCommand
+from bot.command import Command, ContainsCommand, ExactCommand, PatternSubstitutionCommand, StartsWithCommand, SubstitutionCommand
 from bot.command_identifier import CommandIdentifier
+from bot.patterns import MAX_PATTERN_MESSAGE_LENGTH
 from bot.security_level import SecurityLevel
 
 
@@ -238,3 +241,80 @@ with describe("Given the a chat bot command") as self:
                     security_level=SecurityLevel.USER,
                 )
                 expect(my_command.__repr__()).to(equal("Will become just this"))
+
+        with context("and its trigger is already lower case"):
+            with it("should share the trigger instead of keeping a casefolded copy"):
+                my_command = SubstitutionCommand(
+                    identifier=CommandIdentifier.GET_SUBSTITUTION,
+                    trigger="this trigger",
+                    substitution="Will become just this",
+                    security_level=SecurityLevel.USER,
+                )
+                expect(my_command.get_trigger_lower_case() is my_command.get_trigger()).to(equal(True))
+
+        with context("and its memory layout is inspected"):
+            with it("should not have an instance dict"):
+                my_command = SubstitutionCommand(
+                    identifier=CommandIdentifier.GET_SUBSTITUTION,
+                    trigger="This Trigger",
+                    substitution="Will become just this",
+                    security_level=SecurityLevel.USER,
+                )
+                expect(hasattr(my_command, "__dict__")).to(equal(False))
+
+
+with describe("Given a pattern substitution command") as self:
+    with context("when its trigger is a glob"):
+        with it("should match the whole message in any case"):
+            my_command = PatternSubstitutionCommand(CommandIdentifier.GET_PATTERN_SUBSTITUTION, "good *", "hi", SecurityLevel.USER)
+            expect(
+                (
+                    my_command.has_match(message_body="Good Morning", user_security_level=SecurityLevel.USER),
+                    my_command.has_match(message_body="very good morning", user_security_level=SecurityLevel.USER),
+                )
+            ).to(equal((True, False)))
+
+    with context("when its trigger is a regex between slashes"):
+        with it("should match the regex"):
+            my_command = PatternSubstitutionCommand(CommandIdentifier.GET_PATTERN_SUBSTITUTION, "/h(?:i|ey)!*/", "hi", SecurityLevel.USER)
+            expect(my_command.has_match(message_body="Hey!!", user_security_level=SecurityLevel.USER)).to(equal(True))
+
+        with it("should refuse a regex that doesn't compile"):
+            expect(lambda: PatternSubstitutionCommand(CommandIdentifier.GET_PATTERN_SUBSTITUTION, "/h(i/", "hi", SecurityLevel.USER)).to(
+                raise_error(re.error)
+            )
+
+        with it("should refuse groups and backreferences"):
+            for trigger in ["/(a)\\1/", "/(?P<x>hi)/"]:
+                expect(
+                    lambda: PatternSubstitutionCommand(CommandIdentifier.GET_PATTERN_SUBSTITUTION, trigger, "hi", SecurityLevel.USER)
+                ).to(raise_error(re.error, "groups are not supported, use (?:...)"))
+
+        with it("should refuse a repeated group, even around an alternation"):
+            for trigger in ["/(?:a+)+$/", "/(?:a|a)*b/"]:
+                expect(
+                    lambda: PatternSubstitutionCommand(CommandIdentifier.GET_PATTERN_SUBSTITUTION, trigger, "hi", SecurityLevel.USER)
+                ).to(raise_error(re.error, "a group can't be repeated, only made optional with ?"))
+
+        with it("should refuse stacked repeats that can backtrack too much"):
+            expect(
+                lambda: PatternSubstitutionCommand(CommandIdentifier.GET_PATTERN_SUBSTITUTION, "/.*.*.*.*x/", "hi", SecurityLevel.USER)
+            ).to(raise_error(re.error, "the pattern can backtrack too much, use fewer repeats or a glob"))
+
+        with it("should accept a repeat on either side of an optional alternation"):
+            my_command = PatternSubstitutionCommand(
+                CommandIdentifier.GET_PATTERN_SUBSTITUTION, "/.*(?:hi|hey)?!.*/", "hi", SecurityLevel.USER
+            )
+            expect(my_command.has_match(message_body="well hey! you", user_security_level=SecurityLevel.USER)).to(equal(True))
+
+        with it("should not match a message longer than the pattern message length"):
+            my_command = PatternSubstitutionCommand(CommandIdentifier.GET_PATTERN_SUBSTITUTION, "/a*/", "hi", SecurityLevel.USER)
+            message_body = "a" * (MAX_PATTERN_MESSAGE_LENGTH + 1)
+            expect(my_command.has_match(message_body=message_body, user_security_level=SecurityLevel.USER)).to(equal(False))
+
+    with context("when it is rendered"):
+        with it("should fill in the known placeholders only"):
+            my_command = PatternSubstitutionCommand(
+                CommandIdentifier.GET_PATTERN_SUBSTITUTION, "hi*", "Hi {sender}, the theme is {theme} {unknown}", SecurityLevel.USER
+            )
+            expect(my_command.render({"sender": "Pascal", "theme": "summer"})).to(equal("Hi Pascal, the theme is summer {unknown}"))
@@ -0,0 +1,82 @@
+import os
+import tempfile
+
+from expects import be, equal, expect, raise_error
+from mamba import after, before, context, describe, it
+
+from bot.config import ConfigCache
+
+
+def write_config(path, content, mtime):
+    with open(path, "w") as config_file:
+        config_file.write(content)
+    os.utime(path, (mtime, mtime))
+
+
+with describe("Given a config cache") as self:
+    with before.each:
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, "config.json")
+        write_config(self.path, '{"owner": {"jid": "pascal"}, "groups": ["#one"]}', mtime=1000)
+        self.config_cache = ConfigCache(path=self.path, check_interval=0)
+
+    with after.each:
+        self.directory.cleanup()
+
+    with context("when the config is read twice"):
+        with it("should give the same snapshot"):
+            expect(self.config_cache.get()).to(be(self.config_cache.get()))
+
+    with context("when the snapshot is changed"):
+        with it("should raise a type error"):
+            config = self.config_cache.get()
+
+            def change_config():
+                config["owner"]["jid"] = "someone else"
+
+            expect(change_config).to(raise_error(TypeError))
+
+        with it("should have turned lists into tuples"):
+            expect(self.config_cache.get()["groups"]).to(equal(("#one",)))
+
+    with context("when the file changes"):
+        with it("should reload it"):
+            self.config_cache.get()
+            write_config(self.path, '{"owner": {"jid": "dotty"}}', mtime=2000)
+            expect(self.config_cache.get()["owner"]["jid"]).to(equal("dotty"))
+
+    with context("when mtime checks are turned off"):
+        with before.each:
+            self.config_cache = ConfigCache(path=self.path, check_interval=None)
+            self.config_cache.get()
+            write_config(self.path, '{"owner": {"jid": "dotty"}}', mtime=2000)
+
+        with it("should keep the old snapshot"):
+            expect(self.config_cache.get()["owner"]["jid"]).to(equal("pascal"))
+
+        with it("should reload when asked to"):
+            self.config_cache.request_reload()
+            expect(self.config_cache.get()["owner"]["jid"]).to(equal("dotty"))
+
+    with context("when the file becomes invalid or missing"):
+        with before.each:
+            self.config_cache.get()
+
+        with it("should keep the last good snapshot when it is half written"):
+            write_config(self.path, '{"owner": {"jid": "dot', mtime=2000)
+            expect(self.config_cache.get()["owner"]["jid"]).to(equal("pascal"))
+
+        with it("should keep the last good snapshot when it is missing"):
+            os.remove(self.path)
+            expect(self.config_cache.get()["owner"]["jid"]).to(equal("pascal"))
+
+        with it("should load the file once it is fixed"):
+            write_config(self.path, '{"owner": {"jid": "dot', mtime=2000)
+            self.config_cache.get()
+            write_config(self.path, '{"owner": {"jid": "dotty"}}', mtime=3000)
+            expect(self.config_cache.get()["owner"]["jid"]).to(equal("dotty"))
+
+    with context("when there is no snapshot yet"):
+        with it("should raise for an invalid file"):
+            write_config(self.path, "{", mtime=2000)
+            expect(lambda: self.config_cache.get()).to(raise_error(ValueError))
@@ -0,0 +1,233 @@
+"""
+In-process stand-in for DynamoDB, usable wherever DynamoStorage accepts a boto3 session.
+
+    session = FakeDynamoSession(latency=0.001, throttle_rate=0.1)
+    profile_storage = ProfileStorage(session=session)
+
+Items are kept in DynamoDB's typed wire format, so numbers come back as Decimal and floats are rejected like boto3 does.
+Every call sleeps for `latency` seconds and is counted per operation in `session.request_counts`.
+With a throttle_rate, that share of the items in a batch write comes back as UnprocessedItems and single writes
+raise ProvisionedThroughputExceededException.
+"""
+
+import random
+import threading
+import time
+from collections import Counter
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from boto3.dynamodb.types import TypeDeserializer, TypeSerializer
+from botocore.exceptions import ClientError
+
+
+_serializer = TypeSerializer()
+_deserializer = TypeDeserializer()
+
+
+def _serialize(item: Dict) -> Dict:
+    return {name: _serializer.serialize(value) for name, value in item.items()}
+
+
+def _deserialize(item: Dict) -> Dict:
+    return {name: _deserializer.deserialize(value) for name, value in item.items()}
+
+
+class FakeDynamoSession:
+    def __init__(self, latency: float = 0.0, throttle_rate: float = 0.0, page_size: int = 100, seed: int = 42):
+        self.latency = latency
+        self.throttle_rate = throttle_rate
+        self.page_size = page_size
+        self.request_counts: Counter = Counter()
+        self.tables: Dict[str, "FakeTableData"] = {}
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def resource(self, service_name: str, endpoint_url: Optional[str] = None, **kwargs) -> "FakeDynamoResource":
+        return FakeDynamoResource(self)
+
+    def client(self, service_name: str, endpoint_url: Optional[str] = None, **kwargs) -> "FakeDynamoClient":
+        return FakeDynamoClient(self)
+
+    def call(self, operation: str) -> None:
+        with self._lock:
+            self.request_counts[operation] += 1
+        if self.latency:
+            time.sleep(self.latency)
+
+    def is_throttled(self) -> bool:
+        with self._lock:
+            return self._random.random() < self.throttle_rate
+
+    def get_table_data(self, table_name: str) -> "FakeTableData":
+        if table_name not in self.tables:
+            raise ClientError({"Error": {"Code": "ResourceNotFoundException", "Message": f"{table_name} not found"}}, "GetTable")
+        return self.tables[table_name]
+
+
+class FakeTableData:
+    def __init__(self, key_schema: List[Dict]):
+        self.hash_key, self.range_key = _key_names(key_schema)
+        self.items: Dict[Tuple, Dict] = {}
+        self.indexes: Dict[str, Tuple[str, Optional[str]]] = {}
+        self.lock = threading.Lock()
+
+    def key_of(self, item: Dict) -> Tuple:
+        if self.range_key:
+            return str(item[self.hash_key]), str(item[self.range_key])
+        return (str(item[self.hash_key]),)
+
+    def put(self, typed_item: Dict) -> None:
+        with self.lock:
+            self.items[self.key_of(typed_item)] = typed_item
+
+    def sorted_items(self) -> List[Dict]:
+        with self.lock:
+            return [self.items[key] for key in sorted(self.items)]
+
+
+def _key_names(key_schema: List[Dict]) -> Tuple[str, Optional[str]]:
+    hash_key = next(key["AttributeName"] for key in key_schema if key["KeyType"] == "HASH")
+    range_key = next((key["AttributeName"] for key in key_schema if key["KeyType"] == "RANGE"), None)
+    return hash_key, range_key
+
+
+class FakeDynamoResource:
+    def __init__(self, session: FakeDynamoSession):
+        self._session = session
+
+    def Table(self, table_name: str) -> "FakeTable":
+        return FakeTable(self._session, table_name)
+
+    def create_table(self, TableName: str, KeySchema: List[Dict], **kwargs) -> "FakeTable":
+        self._session.call("CreateTable")
+        self._session.tables[TableName] = FakeTableData(KeySchema)
+        for index in kwargs.get("GlobalSecondaryIndexes", []):
+            self._session.tables[TableName].indexes[index["IndexName"]] = _key_names(index["KeySchema"])
+        return FakeTable(self._session, TableName)
+
+    def batch_write_item(self, RequestItems: Dict[str, List[Dict]]) -> Dict:
+        self._session.call("BatchWriteItem")
+        unprocessed: Dict[str, List[Dict]] = {}
+        for table_name, requests in RequestItems.items():
+            table_data = self._session.get_table_data(table_name)
+            for request in requests:
+                if self._session.is_throttled():
+                    unprocessed.setdefault(table_name, []).append(request)
+                    continue
+                table_data.put(_serialize(request["PutRequest"]["Item"]))
+        return {"UnprocessedItems": unprocessed}
+
+
+class FakeTable:
+    def __init__(self, session: FakeDynamoSession, table_name: str):
+        self._session = session
+        self.table_name = table_name
+
+    @property
+    def global_secondary_indexes(self) -> Optional[List[Dict]]:
+        indexes = self._session.get_table_data(self.table_name).indexes
+        return [{"IndexName": index_name} for index_name in indexes] or None
+
+    def wait_until_exists(self) -> None:
+        self._session.get_table_data(self.table_name)
+
+    def put_item(self, Item: Dict) -> Dict:
+        self._session.call("PutItem")
+        if self._session.is_throttled():
+            raise ClientError({"Error": {"Code": "ProvisionedThroughputExceededException", "Message": "Throttled"}}, "PutItem")
+        self._session.get_table_data(self.table_name).put(_serialize(Item))
+        return {}
+
+    def get_item(self, Key: Dict) -> Dict:
+        self._session.call("GetItem")
+        table_data = self._session.get_table_data(self.table_name)
+        with table_data.lock:
+            item = table_data.items.get(table_data.key_of(_serialize(Key)))
+        return {"Item": _deserialize(item)} if item else {}
+
+    def query(self, KeyConditionExpression, IndexName: Optional[str] = None, ExclusiveStartKey: Optional[Dict] = None, Limit=None):
+        self._session.call("Query")
+        table_data = self._session.get_table_data(self.table_name)
+        hash_key, range_key = table_data.indexes[IndexName] if IndexName else (table_data.hash_key, table_data.range_key)
+        items = [
+            _deserialize(item)
+            for item in table_data.sorted_items()
+            if hash_key in item and _matches(KeyConditionExpression, _deserialize(item))
+        ]
+        if range_key:
+            items.sort(key=lambda item: (item.get(range_key), str(item[table_data.hash_key])))
+        if ExclusiveStartKey:
+            start = next(index for index, item in enumerate(items) if all(item[name] == value for name, value in ExclusiveStartKey.items()))
+            items = items[start + 1 :]
+        page_size = min(Limit or self._session.page_size, self._session.page_size)
+        response = {"Items": items[:page_size], "Count": len(items[:page_size])}
+        if len(items) > page_size:
+            last_item = items[page_size - 1]
+            key_names = {table_data.hash_key, table_data.range_key, hash_key, range_key} - {None}
+            response["LastEvaluatedKey"] = {name: last_item[name] for name in key_names}
+        return response
+
+
+def _matches(condition, item: Dict) -> bool:
+    expression = condition.get_expression()
+    operator, values = expression["operator"], expression["values"]
+    if operator == "AND":
+        return all(_matches(value, item) for value in values)
+    name = values[0].name
+    if name not in item:
+        return False
+    value = item[name]
+    match operator:
+        case "=":
+            return value == values[1]
+        case "<":
+            return value < values[1]
+        case "<=":
+            return value <= values[1]
+        case ">":
+            return value > values[1]
+        case ">=":
+            return value >= values[1]
+        case "BETWEEN":
+            return values[1] <= value <= values[2]
+        case "begins_with":
+            return str(value).startswith(values[1])
+    raise NotImplementedError(operator)
+
+
+class FakeDynamoClient:
+    def __init__(self, session: FakeDynamoSession):
+        self._session = session
+
+    def list_tables(self) -> Dict:
+        self._session.call("ListTables")
+        return {"TableNames": sorted(self._session.tables)}
+
+    def update_table(self, TableName: str, GlobalSecondaryIndexUpdates: List[Dict] = (), **kwargs) -> Dict:
+        self._session.call("UpdateTable")
+        table_data = self._session.get_table_data(TableName)
+        for update in GlobalSecondaryIndexUpdates:
+            if "Create" in update:
+                table_data.indexes[update["Create"]["IndexName"]] = _key_names(update["Create"]["KeySchema"])
+        return {}
+
+    def get_paginator(self, operation_name: str) -> "FakeScanPaginator":
+        if operation_name != "scan":
+            raise NotImplementedError(operation_name)
+        return FakeScanPaginator(self._session)
+
+
+class FakeScanPaginator:
+    def __init__(self, session: FakeDynamoSession):
+        self._session = session
+
+    def paginate(self, TableName: str, Segment: int = 0, TotalSegments: int = 1, **kwargs) -> Iterator[Dict]:
+        items = self._session.get_table_data(TableName).sorted_items()
+        segment_items = [item for index, item in enumerate(items) if index % TotalSegments == Segment]
+        attributes = kwargs.get("ExpressionAttributeNames", {}).values()
+        for start in range(0, max(len(segment_items), 1), self._session.page_size):
+            self._session.call("Scan")
+            page = segment_items[start : start + self._session.page_size]
+            if attributes:
+                page = [{name: value for name, value in item.items() if name in attributes} for item in page]
+            yield {"Items": page, "Count": len(page)}
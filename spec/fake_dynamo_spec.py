@@ -0,0 +1,146 @@
+from expects import equal, expect
+from mamba import before, context, describe, it
+
+from bot.activity import Activity
+from bot.activity_storage import ActivityStorage
+from bot.command import PatternSubstitutionCommand, SubstitutionCommand
+from bot.command_identifier import CommandIdentifier
+from bot.profile_storage import ProfileStorage
+from bot.schema_marker import SchemaMarker
+from bot.security_level import SecurityLevel
+from bot.substitution_storage import SubstitutionStorage
+from bot.user import User
+from spec.fake_dynamo import FakeDynamoSession
+
+
+with describe("Given a profile storage on the fake DynamoDB") as self:
+    with before.each:
+        self.session = FakeDynamoSession(page_size=10)
+        self.profile_storage = ProfileStorage(session=self.session, schema_marker=SchemaMarker(path=None))
+        self.profile_storage.provision()
+
+    with context("when it is provisioned"):
+        with it("should create the profiles table with the security level index"):
+            expect(self.session.tables["profiles"].indexes).to(equal({"gsi_security_level": ("security_level", "identifier")}))
+
+        with it("should verify the schema without asking DynamoDB again"):
+            self.session.request_counts.clear()
+            expect((self.profile_storage.verify_schema(), sum(self.session.request_counts.values()))).to(equal((True, 0)))
+
+    with context("when it is created without provisioning"):
+        with it("should not make any request"):
+            session = FakeDynamoSession()
+            ProfileStorage(session=session, schema_marker=SchemaMarker(path=None))
+            expect(sum(session.request_counts.values())).to(equal(0))
+
+        with it("should report the schema as missing"):
+            session = FakeDynamoSession()
+            expect(ProfileStorage(session=session, schema_marker=SchemaMarker(path=None)).verify_schema()).to(equal(False))
+
+    with context("when 60 profiles are stored"):
+        with before.each:
+            self.report = self.profile_storage.store_profiles(
+                [User(identifier=f"user_{index}", security_level=SecurityLevel.USER) for index in range(60)]
+            )
+
+        with it("should write them in 3 batch requests"):
+            expect(self.session.request_counts["BatchWriteItem"]).to(equal(3))
+
+        with it("should retrieve all of them"):
+            expect(len(self.profile_storage.retrieve_profiles(total_segments=3))).to(equal(60))
+
+    with context("when DynamoDB throttles writes"):
+        with it("should still store every profile"):
+            self.session.throttle_rate = 0.3
+            self.profile_storage._batch_writer._sleep = lambda delay: None
+            report = self.profile_storage.store_profiles(
+                [User(identifier=f"user_{index}", security_level=SecurityLevel.USER) for index in range(60)]
+            )
+            expect((report.items_written, report.retries > 0)).to(equal((60, True)))
+
+    with context("when the users of a role are queried"):
+        with before.each:
+            levels = [SecurityLevel.USER, SecurityLevel.ADMIN, SecurityLevel.OWNER]
+            self.profile_storage.store_profiles(
+                [User(identifier=f"user_{index:02}", security_level=levels[index % 3]) for index in range(30)]
+            )
+
+        with it("should page through the security level index"):
+            users, start_key = self.profile_storage.query_by_role(security_level=SecurityLevel.ADMIN, limit=4)
+            expect(([user.get_user_identifier() for user in users], start_key is not None)).to(
+                equal((["user_01", "user_04", "user_07", "user_10"], True))
+            )
+
+        with it("should return every user of the role"):
+            admins = [user.get_user_identifier() for user in self.profile_storage.iterate_by_role(security_level=SecurityLevel.ADMIN)]
+            expect(admins).to(equal([f"user_{index:02}" for index in range(1, 30, 3)]))
+
+        with it("should retrieve a single profile by identifier"):
+            user = self.profile_storage.retrieve_profile(identifier="user_02")
+            expect(user.get_user_clearance_level()).to(equal(SecurityLevel.OWNER))
+
+    with context("when the owner is created twice"):
+        with it("should store it once"):
+            self.profile_storage.create_owner("pascal")
+            self.profile_storage.create_owner("pascal")
+            expect(self.session.request_counts["PutItem"]).to(equal(1))
+
+with describe("Given a substitution storage on the fake DynamoDB") as self:
+    with context("when substitutions are stored in two groups"):
+        with it("should only retrieve the ones of the requested group"):
+            session = FakeDynamoSession(page_size=2)
+            substitution_storage = SubstitutionStorage(session=session, schema_marker=SchemaMarker(path=None))
+            substitution_storage.provision()
+            for index in range(5):
+                substitution_storage.store_substitution(
+                    group="#one",
+                    command=SubstitutionCommand(CommandIdentifier.GET_SUBSTITUTION, f"hi {index}", "hello", SecurityLevel.USER),
+                )
+            substitution_storage.store_substitution(
+                group="#two", command=SubstitutionCommand(CommandIdentifier.GET_SUBSTITUTION, "bye", "later", SecurityLevel.USER)
+            )
+            triggers = [command.get_trigger() for command in substitution_storage.retrieve_substitutions(group="#one")]
+            expect(triggers).to(equal([f"hi {index}" for index in range(5)]))
+
+    with context("when a pattern substitution is stored"):
+        with it("should retrieve it as a pattern substitution"):
+            substitution_storage = SubstitutionStorage(session=FakeDynamoSession(), schema_marker=SchemaMarker(path=None))
+            substitution_storage.provision()
+            substitution_storage.store_substitution(
+                group="#one",
+                command=PatternSubstitutionCommand(CommandIdentifier.GET_PATTERN_SUBSTITUTION, "hi*", "hello {sender}", SecurityLevel.USER),
+            )
+            command = substitution_storage.retrieve_substitutions(group="#one")[0]
+            expect((type(command), command.identifier)).to(equal((PatternSubstitutionCommand, CommandIdentifier.GET_PATTERN_SUBSTITUTION)))
+
+        with it("should skip a stored pattern that is no longer supported"):
+            substitution_storage = SubstitutionStorage(session=FakeDynamoSession(), schema_marker=SchemaMarker(path=None))
+            substitution_storage.provision()
+            substitution_storage._table.put_item(
+                Item={
+                    "group_jid": "#one",
+                    "trigger": "/(a)\\1/",
+                    "substitution": "hi",
+                    "security_level": 1,
+                    "updated_at": 1,
+                    "kind": "pattern",
+                }
+            )
+            expect(substitution_storage.retrieve_substitutions(group="#one")).to(equal([]))
+
+with describe("Given an activity storage on the fake DynamoDB") as self:
+    with context("when activities are stored"):
+        with it("should retrieve their timestamps"):
+            activity_storage = ActivityStorage(session=FakeDynamoSession(page_size=2), schema_marker=SchemaMarker(path=None))
+            activity_storage.provision()
+            activity_storage.store_activities([Activity(identifier=f"user_{index}", last_text=index * 1_000) for index in range(5)])
+            activities = list(activity_storage.iterate_activities())
+            stored = sorted((activity.get_user_identifier(), activity.get_last_text()) for activity in activities)
+            expect(stored).to(equal([(f"user_{index}", index * 1_000) for index in range(5)]))
+
+        with it("should retrieve the last post per group"):
+            activity_storage = ActivityStorage(session=FakeDynamoSession(), schema_marker=SchemaMarker(path=None))
+            activity_storage.provision()
+            activity_storage.store_activities([Activity(identifier="pascal@", last_text=2_000, group_posts={"#one": 2_000})])
+            activities = list(activity_storage.iterate_activities())
+            expect(activities[0].get_group_posts()).to(equal({"#one": 2_000}))
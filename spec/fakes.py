@@ -1,9 +1,15 @@
-from typing import List
+from typing import Dict, Iterator, List, Optional, Tuple
 
-from bot.command import Command
+from boto3.dynamodb.types import TypeSerializer
+
+from bot.activity import Activity
+from bot.activity_storage import ActivityStorage
+from bot.batch_writer import BatchWriteReport
+from bot.command import Command, SubstitutionCommand
 from bot.command_registry import CommandRegistry
 from bot.profile_storage import ProfileStorage
 from bot.security_level import SecurityLevel
+from bot.substitution_storage import SubstitutionStorage
 from bot.user import User
 from bot.user_registry import UserRegistry
 
@@ -38,9 +44,16 @@ class FakeUserRegistry(UserRegistry):
     def get_user(self, identifier):
         return self.get_user_response
 
-    def get_user_listing(self):
+    def find_user(self, identifier):
+        if self.is_registered_user_outcome:
+            return self.get_user_response
+
+    def get_user_listing(self, page=1):
         return self.get_user_listing_response
 
+    def count_user_listing_pages(self):
+        return 1
+
 
 class FakeCommand(Command):
     def __init__(self):
@@ -55,7 +68,7 @@ class FakeCommand(Command):
     def __repr__(self):
         return self.repr_response
 
-    def has_match(self, message_body, user_security_level):
+    def has_match(self, message_body, user_security_level, casefolded_body=None):
         return self.has_match_response
 
     def get_trigger(self):
@@ -88,7 +101,7 @@ class FakeCommandRegistry(CommandRegistry):
     def set_bot_name(self, bot_name):
         pass
 
-    def get_matching_command(self, message, user_security_level):
+    def get_matching_command(self, message, user_security_level, casefolded_message=None):
         return self.get_matching_command_response
 
     def get_commands_string(self, user_security_level):
@@ -97,19 +110,122 @@ class FakeCommandRegistry(CommandRegistry):
     def get_substitution_listing(self, user_security_level):
         return self.get_substitution_listing_response
 
-    def register_substitution(self, trigger, substitution, security_level):
+    def for_group(self, group):
+        return self
+
+    def register_substitution(self, trigger, substitution, security_level, group=None):
+        return self.register_substitution_response
+
+    def register_pattern_substitution(self, trigger, substitution, security_level, group=None):
         return self.register_substitution_response
 
 
 class FakeProfileStorage(ProfileStorage):
     def __init__(self):
         self.all_profiles: List[User] = []
+        self.stored_batches: List[List[User]] = []
+        self.retrieved_identifiers: List[str] = []
 
     def create_owner(self, identifier: str) -> None:
         self.all_profiles.append(User(identifier=identifier, security_level=SecurityLevel.OWNER))
 
-    def store_profiles(self, users: List[User]) -> None:
-        self.all_profiles = users
+    def store_profiles(self, users: List[User]) -> BatchWriteReport:
+        self.stored_batches.append(users)
+        stored = {profile.get_user_identifier(): profile for profile in self.all_profiles}
+        stored.update({user.get_user_identifier(): user for user in users})
+        self.all_profiles = list(stored.values())
+        report = BatchWriteReport()
+        report.items_written = len(users)
+        return report
 
-    def retrieve_profiles(self) -> List[User]:
+    def retrieve_profiles(self, total_segments: int = 1) -> List[User]:
         return self.all_profiles
+
+    def iterate_profiles(self, total_segments: int = 1) -> Iterator[User]:
+        yield from self.all_profiles
+
+    def retrieve_profile(self, identifier: str) -> Optional[User]:
+        self.retrieved_identifiers.append(identifier)
+        return next((user for user in self.all_profiles if user.get_user_identifier() == identifier), None)
+
+    def query_by_role(
+        self, security_level: SecurityLevel, limit: Optional[int] = None, start_key: Optional[Dict] = None
+    ) -> Tuple[List[User], Optional[Dict]]:
+        users = [user for user in self.all_profiles if user.get_user_clearance_level() == security_level]
+        return users, None
+
+    def iterate_by_role(self, security_level: SecurityLevel) -> Iterator[User]:
+        yield from self.query_by_role(security_level=security_level)[0]
+
+
+class FakeBatchWriteResource:
+    def __init__(self, unprocessed_rounds: int = 0):
+        self.unprocessed_rounds = unprocessed_rounds
+        self.requests: List[dict] = []
+        self.written_items: List[dict] = []
+
+    def batch_write_item(self, RequestItems):
+        self.requests.append(RequestItems)
+        response = {"UnprocessedItems": {}}
+        for table_name, put_requests in RequestItems.items():
+            if self.unprocessed_rounds:
+                self.unprocessed_rounds -= 1
+                response["UnprocessedItems"][table_name] = put_requests[1:]
+                put_requests = put_requests[:1]
+            self.written_items.extend(request["PutRequest"]["Item"] for request in put_requests)
+        return response
+
+
+class FakeScanPaginator:
+    def __init__(self, items: List[dict], page_size: int):
+        self.items = items
+        self.page_size = page_size
+        self.calls: List[dict] = []
+
+    def paginate(self, **parameters):
+        self.calls.append(parameters)
+        serializer = TypeSerializer()
+        segment_items = [
+            {name: serializer.serialize(value) for name, value in item.items()}
+            for index, item in enumerate(self.items)
+            if "TotalSegments" not in parameters or index % parameters["TotalSegments"] == parameters["Segment"]
+        ]
+        for start in range(0, len(segment_items), self.page_size):
+            yield {"Items": segment_items[start : start + self.page_size]}
+
+
+class FakeScanClient:
+    def __init__(self, items: List[dict], page_size: int = 100):
+        self.paginator = FakeScanPaginator(items=items, page_size=page_size)
+
+    def get_paginator(self, operation_name):
+        return self.paginator
+
+
+class FakeSubstitutionStorage(SubstitutionStorage):
+    def __init__(self):
+        self.substitutions: dict = {}
+        self.retrieved_groups: List[str] = []
+
+    def store_substitution(self, group: str, command: SubstitutionCommand) -> None:
+        self.substitutions.setdefault(group, []).append(command)
+
+    def retrieve_substitutions(self, group: str) -> List[SubstitutionCommand]:
+        self.retrieved_groups.append(group)
+        return list(self.substitutions.get(group, []))
+
+
+class FakeActivityStorage(ActivityStorage):
+    def __init__(self):
+        self.stored_activities: List[Activity] = []
+        self.stored_batches: List[List[Activity]] = []
+
+    def store_activities(self, activities: List[Activity]) -> BatchWriteReport:
+        self.stored_batches.append(activities)
+        self.stored_activities.extend(activities)
+        report = BatchWriteReport()
+        report.items_written = len(activities)
+        return report
+
+    def iterate_activities(self, total_segments: int = 1) -> Iterator[Activity]:
+        yield from self.stored_activities
@@ -0,0 +1,129 @@
+import asyncio
+import threading
+import time
+
+from expects import equal, expect
+from mamba import after, before, context, describe, it
+
+from bot.async_chat_bot import AsyncChatBot
+from bot.command_registry import CommandRegistry
+from bot.message import Message
+from bot.message_pipeline import MessagePipeline
+from bot.security_level import SecurityLevel
+from bot.user_registry import UserRegistry
+from spec.fakes import FakeProfileStorage
+
+
+with describe("Given a message pipeline") as self:
+    with before.each:
+        self.replies = []
+        self.receipts = []
+        self.chat_bot = AsyncChatBot(
+            name="Dotty",
+            owner_identifier="@owner",
+            users_registry=UserRegistry(profile_storage=FakeProfileStorage()),
+            command_registry=CommandRegistry(),
+        )
+        self.pipeline = MessagePipeline(
+            chat_bot=self.chat_bot,
+            send_message=lambda group, answer: self.replies.append((group, answer)),
+            send_read_receipt=lambda message, message_id: self.receipts.append(message_id),
+        )
+        self.pipeline.start()
+
+    with after.each:
+        self.chat_bot.shutdown()
+
+    with context("when messages arrive in two groups"):
+        with before.each:
+            self.pipeline.submit(message=Message("Set Theme Summer", "@owner", "#one"), message_id="1")
+            self.pipeline.submit(message=Message("Theme", "@owner", "#one"), message_id="2")
+            self.pipeline.submit(message=Message("Theme", "@guest", "#two"), message_id="3")
+            self.pipeline.stop()
+
+        with it("should send a read receipt for every message"):
+            expect(sorted(self.receipts)).to(equal(["1", "2", "3"]))
+
+        with it("should answer the messages of a group in order"):
+            expect([answer for group, answer in self.replies if group == "#one"]).to(equal(["Theme set to: Summer", "Summer"]))
+
+        with it("should not answer a guest"):
+            expect([answer for group, answer in self.replies if group == "#two"]).to(equal([]))
+
+    with context("when a group is still busy"):
+        with it("should keep answering the other groups"):
+            release = threading.Event()
+            answered = threading.Event()
+            process_message = self.chat_bot.process_message
+
+            def slow_process_message(message):
+                if message.sent_in == "#busy":
+                    release.wait(timeout=5)
+                return process_message(message)
+
+            self.chat_bot.process_message = slow_process_message
+            self.pipeline._send_message = lambda group, answer: answered.set() if group == "#quiet" else None
+            self.pipeline.submit(message=Message("Theme", "@owner", "#busy"), message_id="1")
+            self.pipeline.submit(message=Message("Theme", "@owner", "#quiet"), message_id="2")
+            expect(answered.wait(timeout=5)).to(equal(True))
+            release.set()
+            self.pipeline.stop()
+
+    with context("when a group has more waiting messages than allowed"):
+        with it("should drop the extra messages"):
+            release = threading.Event()
+            process_message = self.chat_bot.process_message
+
+            def blocked_process_message(message):
+                release.wait(timeout=5)
+                return process_message(message)
+
+            self.chat_bot.process_message = blocked_process_message
+            self.pipeline._max_pending_per_group = 1
+            for message_id in range(5):
+                self.pipeline.submit(message=Message("Theme", "@owner", "#busy"), message_id=str(message_id))
+            release.set()
+            self.pipeline.stop()
+            expect(self.pipeline.dropped_messages > 0).to(equal(True))
+
+    with context("when a message is submitted after stop"):
+        with it("should drop it"):
+            self.pipeline.submit(message=Message("Theme", "@owner", "#one"), message_id="1")
+            self.pipeline.stop()
+            self.pipeline.submit(message=Message("Theme", "@owner", "#one"), message_id="2")
+            expect((self.receipts, self.replies, self.pipeline.dropped_messages)).to(equal((["1"], [("#one", "No theme set")], 1)))
+
+    with context("when a group has been idle for group_idle_timeout"):
+        with it("should stop its worker and start a new one for the next message"):
+            pipeline = MessagePipeline(
+                chat_bot=self.chat_bot,
+                send_message=lambda group, answer: self.replies.append((group, answer)),
+                send_read_receipt=lambda message, message_id: self.receipts.append(message_id),
+                group_idle_timeout=0.01,
+            )
+            pipeline.start()
+            pipeline.submit(message=Message("Theme", "@owner", "#one"), message_id="1")
+            for _ in range(500):
+                if not pipeline.count_group_workers():
+                    break
+                time.sleep(0.01)
+            idle_workers = pipeline.count_group_workers()
+            pipeline.submit(message=Message("Theme", "@owner", "#one"), message_id="2")
+            pipeline.stop()
+            expect((idle_workers, self.replies)).to(equal((0, [("#one", "No theme set"), ("#one", "No theme set")])))
+            self.pipeline.stop()
+
+
+with describe("Given an async chat bot") as self:
+    with context("when a message is processed"):
+        with it("should give the same answer as the chat bot"):
+            chat_bot = AsyncChatBot(
+                name="Dotty",
+                owner_identifier="@owner",
+                users_registry=UserRegistry(profile_storage=FakeProfileStorage()),
+                command_registry=CommandRegistry(),
+            )
+            answer = asyncio.run(chat_bot.process_message_async(Message("Theme", "@owner", "#group")))
+            chat_bot.shutdown()
+            expect(answer).to(equal("No theme set"))
+            expect(chat_bot._get_user_security_level("@owner")).to(equal(SecurityLevel.OWNER))
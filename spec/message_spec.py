@@ -14,3 +14,13 @@ with describe("Given a message") as self:
         with it("should raise a type error"):
             my_message = Message(body="my body", sent_by="me", sent_in="unit test")
             expect(lambda: my_message == "some string").to(raise_error(TypeError))
+
+    with context("when its casefolded body is requested twice"):
+        with it("should casefold the body once"):
+            my_message = Message(body="Set Theme Hello", sent_by="me", sent_in="unit test")
+            expect(my_message.get_casefolded_body() is my_message.get_casefolded_body()).to(equal(True))
+
+    with context("when the arguments after a trigger are requested"):
+        with it("should return the body after the trigger"):
+            my_message = Message(body="Set Theme Hello", sent_by="me", sent_in="unit test")
+            expect(my_message.get_arguments("Set Theme ")).to(equal("Hello"))
@@ -0,0 +1,92 @@
+from expects import contain, equal, expect
+from mamba import after, before, context, describe, it
+
+from bot.chat_bot import ChatBot
+from bot.command_registry import CommandRegistry
+from bot.message import Message
+from bot.metrics import HistogramMetrics, MetricsHook, instrument, set_metrics_hook
+from bot.user_registry import UserRegistry
+from spec.fakes import FakeProfileStorage
+
+
+class RecordingHook(MetricsHook):
+    def __init__(self):
+        self.observed = []
+        self.counted = []
+
+    def observe(self, stage, label, seconds):
+        self.observed.append((stage, label))
+
+    def count(self, name, label):
+        self.counted.append((name, label))
+
+
+with describe("Given an instrumented function") as self:
+    with after.each:
+        set_metrics_hook(None)
+
+    with context("when no metrics hook is set"):
+        with it("should just call the function"):
+            expect(instrument(stage="test")(lambda value: value * 2)(21)).to(equal(42))
+
+    with context("when a metrics hook is set"):
+        with it("should observe the call under its stage and label"):
+            hook = RecordingHook()
+            set_metrics_hook(hook)
+
+            @instrument(stage="test", label=lambda value: f"value_{value}")
+            def double(value):
+                return value * 2
+
+            double(21)
+            expect(hook.observed).to(equal([("test", "value_21")]))
+
+with describe("Given a chat bot with a metrics hook") as self:
+    with before.each:
+        self.hook = RecordingHook()
+        set_metrics_hook(self.hook)
+        self.chat_bot = ChatBot(
+            name="Dotty",
+            owner_identifier="@owner",
+            users_registry=UserRegistry(profile_storage=FakeProfileStorage()),
+            command_registry=CommandRegistry(),
+        )
+        self.chat_bot.process_message(Message("Theme", "@owner", "#group"))
+
+    with after.each:
+        set_metrics_hook(None)
+
+    with context("when a message triggers a command"):
+        with it("should time every stage"):
+            expect(self.hook.observed).to(
+                contain(
+                    ("user_registry", "find_user"),
+                    ("command_registry", "get_matching_command"),
+                    ("command", "GET_THEME"),
+                    ("chat_bot", "process_message"),
+                )
+            )
+
+        with it("should count the match by command type"):
+            expect(self.hook.counted).to(equal([("command_matches", "EXACT")]))
+
+with describe("Given histogram metrics") as self:
+    with before.each:
+        self.metrics = HistogramMetrics()
+        self.metrics.observe("storage", "store_profiles", 0.002)
+        self.metrics.observe("storage", "store_profiles", 2.0)
+        self.metrics.count("command_matches", "EXACT")
+
+    with context("when exported as Prometheus text"):
+        with it("should give cumulative buckets"):
+            text = self.metrics.prometheus_text()
+            expect(text).to(contain('dotty_stage_seconds_bucket{stage="storage",label="store_profiles",le="0.005"} 1'))
+            expect(text).to(contain('dotty_stage_seconds_bucket{stage="storage",label="store_profiles",le="+Inf"} 2'))
+            expect(text).to(contain('dotty_stage_seconds_count{stage="storage",label="store_profiles"} 2'))
+
+        with it("should give the counters"):
+            expect(self.metrics.prometheus_text()).to(contain('dotty_events_total{name="command_matches",label="EXACT"} 1'))
+
+    with context("when summarised for the log"):
+        with it("should give the count and average per stage"):
+            expect(self.metrics.summary_line()).to(equal("storage.store_profiles: n=2 avg=1001.000ms | command_matches.EXACT=1"))
@@ -0,0 +1,36 @@
+from expects import contain_only, equal, expect
+from mamba import before, context, describe, it
+
+from bot.profile_storage import ProfileStorage
+from bot.security_level import SecurityLevel
+from spec.fakes import FakeScanClient
+
+
+class ScannedProfileStorage(ProfileStorage):
+    def __init__(self, dyn_db_client):
+        self._client = dyn_db_client
+
+
+with describe("Given a profile storage with 250 stored profiles") as self:
+    with before.each:
+        self.client = FakeScanClient(
+            items=[{"identifier": f"user_{index}", "security_level": SecurityLevel.USER.value} for index in range(250)], page_size=100
+        )
+        self.profile_storage = ScannedProfileStorage(dyn_db_client=self.client)
+
+    with context("when the profiles are retrieved"):
+        with it("should follow every page"):
+            expect(len(self.profile_storage.retrieve_profiles())).to(equal(250))
+
+        with it("should turn them into users"):
+            user = self.profile_storage.retrieve_profiles()[0]
+            expect((user.get_user_identifier(), user.get_user_clearance_level())).to(equal(("user_0", SecurityLevel.USER)))
+
+    with context("when the profiles are retrieved with 4 segments"):
+        with it("should scan every segment"):
+            self.profile_storage.retrieve_profiles(total_segments=4)
+            expect([call["Segment"] for call in self.client.paginator.calls]).to(contain_only(0, 1, 2, 3))
+
+        with it("should return every profile once"):
+            identifiers = [user.get_user_identifier() for user in self.profile_storage.retrieve_profiles(total_segments=4)]
+            expect(sorted(identifiers)).to(equal(sorted(f"user_{index}" for index in range(250))))
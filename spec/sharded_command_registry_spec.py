@@ -0,0 +1,59 @@
+from expects import be, equal, expect
+from mamba import before, context, describe, it
+
+from bot.security_level import SecurityLevel
+from bot.sharded_command_registry import ShardedCommandRegistry
+from spec.fakes import FakeSubstitutionStorage
+
+
+with describe("Given a sharded command registry") as self:
+    with before.each:
+        self.substitution_storage = FakeSubstitutionStorage()
+        self.registry = ShardedCommandRegistry(substitution_storage=self.substitution_storage, max_shards=2)
+
+    with context("when a substitution is registered in one group"):
+        with before.each:
+            self.registry.for_group("#one").register_substitution(
+                trigger="hi", substitution="hello", security_level=SecurityLevel.USER, group="#one"
+            )
+
+        with it("should match in that group"):
+            command = self.registry.for_group("#one").get_matching_command(message="hi", user_security_level=SecurityLevel.USER)
+            expect(str(command)).to(equal("hello"))
+
+        with it("should not match in another group"):
+            command = self.registry.for_group("#two").get_matching_command(message="hi", user_security_level=SecurityLevel.USER)
+            expect(command).to(equal(None))
+
+    with context("when two groups are used"):
+        with it("should share the builtin commands"):
+            usage_one = self.registry.for_group("#one").get_matching_command(message="usage", user_security_level=SecurityLevel.USER)
+            usage_two = self.registry.for_group("#two").get_matching_command(message="usage", user_security_level=SecurityLevel.USER)
+            expect(usage_one).to(be(usage_two))
+
+    with context("when a group is used again"):
+        with it("should give the same shard"):
+            expect(self.registry.for_group("#one")).to(be(self.registry.for_group("#one")))
+
+    with context("when more groups are active than max_shards"):
+        with before.each:
+            self.registry.for_group("#one").register_substitution(
+                trigger="hi", substitution="hello", security_level=SecurityLevel.USER, group="#one"
+            )
+            self.registry.for_group("#two")
+            self.registry.for_group("#three")
+
+        with it("should evict the least recently used shard"):
+            expect(self.registry.shard_count()).to(equal(2))
+
+        with it("should reload an evicted group from storage"):
+            command = self.registry.for_group("#one").get_matching_command(message="hi", user_security_level=SecurityLevel.USER)
+            expect(str(command)).to(equal("hello"))
+            expect(self.substitution_storage.retrieved_groups.count("#one")).to(equal(2))
+
+    with context("when there is no substitution storage"):
+        with it("should never evict a shard"):
+            registry = ShardedCommandRegistry(max_shards=1)
+            registry.for_group("#one")
+            registry.for_group("#two")
+            expect(registry.shard_count()).to(equal(2))
@@ -0,0 +1,40 @@
+from expects import equal, expect
+from mamba import before, context, describe, it
+
+from bot.substitution_storage import SubstitutionStorage
+
+
+class FakeQueryTable:
+    def __init__(self, pages):
+        self.pages = pages
+        self.calls = []
+
+    def query(self, **parameters):
+        self.calls.append(parameters)
+        return self.pages[len(self.calls) - 1]
+
+
+class QueriedSubstitutionStorage(SubstitutionStorage):
+    def __init__(self, table):
+        self._substitutions_table = table
+
+
+with describe("Given a substitution storage") as self:
+    with context("when the substitutions of a group span two pages"):
+        with before.each:
+            self.table = FakeQueryTable(
+                pages=[
+                    {
+                        "Items": [{"trigger": "hi", "substitution": "hello", "security_level": 5, "updated_at": 20}],
+                        "LastEvaluatedKey": {"group_jid": "#group", "trigger": "hi"},
+                    },
+                    {"Items": [{"trigger": "bye", "substitution": "later", "security_level": 7, "updated_at": 10}]},
+                ]
+            )
+            self.substitutions = QueriedSubstitutionStorage(table=self.table).retrieve_substitutions(group="#group")
+
+        with it("should follow the LastEvaluatedKey"):
+            expect(self.table.calls[1]["ExclusiveStartKey"]).to(equal({"group_jid": "#group", "trigger": "hi"}))
+
+        with it("should return them in the order they were stored"):
+            expect([command.get_trigger() for command in self.substitutions]).to(equal(["bye", "hi"]))
@@ -1,8 +1,9 @@
-from expects import equal, expect
+from expects import equal, expect, raise_error
 from mamba import before, context, describe, it
 
 from bot.security_level import SecurityLevel
-from bot.user_registry import UserRegistry
+from bot.user import User
+from bot.user_registry import LOAD_CHUNK_SIZE, UserRegistry
 from spec.fakes import FakeProfileStorage
 
 
@@ -29,4 +30,192 @@ with describe("Given a user registry") as self:
 
         with context("and you request the get_user_listing"):
             with it("should return the users registered and their Security Level"):
-                expect(self.user_registry.get_user_listing()).to(equal("Pascal: OWNER"))
+                expect(self.user_registry.get_user_listing()).to(equal("OWNER:\nPascal"))
+
+    with context("when you look up a user"):
+        with before.each:
+            self.profile_storage = FakeProfileStorage()
+            self.user_registry = UserRegistry(profile_storage=self.profile_storage)
+            self.user_registry.register_user(identifier="Pascal_6df@", role=SecurityLevel.OWNER)
+            self.user_registry.register_user(identifier="Dotty_a1b@", role=SecurityLevel.USER)
+
+        with it("should find a registered user"):
+            expect(self.user_registry.find_user(identifier="Dotty_a1b@").get_user_clearance_level()).to(equal(SecurityLevel.USER))
+
+        with it("should return None for an unknown user"):
+            expect(self.user_registry.find_user(identifier="Nobody_123@")).to(equal(None))
+
+        with it("should list the users under a heading per Security Level, highest first"):
+            expect(self.user_registry.get_user_listing()).to(equal("OWNER:\nPascal\nUSER:\nDotty"))
+
+    with context("when you register a user next to existing users"):
+        with before.each:
+            self.profile_storage = FakeProfileStorage()
+            self.user_registry = UserRegistry(profile_storage=self.profile_storage)
+            self.user_registry.register_user(identifier="Pascal_6df@", role=SecurityLevel.OWNER)
+            self.user_registry.register_user(identifier="Dotty_a1b@", role=SecurityLevel.USER)
+
+        with it("should only store the new user"):
+            stored = [user.get_user_identifier() for user in self.profile_storage.stored_batches[-1]]
+            expect(stored).to(equal(["Dotty_a1b@"]))
+
+        with context("and you register a user with the SecurityLevel it already has"):
+            with it("should not store anything"):
+                self.user_registry.register_user(identifier="Pascal_6df@", role=SecurityLevel.OWNER)
+                expect(len(self.profile_storage.stored_batches)).to(equal(2))
+
+    with context("when the profiles are loaded after startup"):
+        with before.each:
+            self.profile_storage = FakeProfileStorage()
+            self.profile_storage.all_profiles = [
+                User(identifier="Pascal_6df@", security_level=SecurityLevel.OWNER),
+                User(identifier="Dotty_a1b@", security_level=SecurityLevel.USER),
+            ]
+            self.user_registry = UserRegistry(profile_storage=self.profile_storage, preload=False)
+
+        with it("should read a stored user from the profile storage before the load"):
+            user = self.user_registry.find_user(identifier="Pascal_6df@")
+            expect((user.get_user_clearance_level(), self.profile_storage.retrieved_identifiers)).to(
+                equal((SecurityLevel.OWNER, ["Pascal_6df@"]))
+            )
+
+        with it("should change the stored role of a user granted before the load"):
+            self.user_registry.register_user(identifier="Pascal_6df@", role=SecurityLevel.OWNER)
+            self.user_registry.register_user(identifier="Dotty_a1b@", role=SecurityLevel.USER)
+            expect(self.profile_storage.stored_batches).to(equal([]))
+
+        with it("should keep a user registered before the load over its stored profile"):
+            self.user_registry.register_user(identifier="Dotty_a1b@", role=SecurityLevel.ADMIN)
+            self.user_registry.load_profiles()
+            expect(self.user_registry.get_user_listing()).to(equal("OWNER:\nPascal\nADMIN:\nDotty"))
+
+        with it("should add the users while the storage still returns them"):
+            found_during_load = []
+
+            def iterate_profiles(total_segments: int = 1):
+                for index in range(LOAD_CHUNK_SIZE + 1):
+                    if index == LOAD_CHUNK_SIZE:
+                        found_during_load.append(self.user_registry.find_user(identifier="member0_abc@") is not None)
+                    yield User(identifier=f"member{index}_abc@", security_level=SecurityLevel.USER)
+
+            self.profile_storage.iterate_profiles = iterate_profiles
+            self.user_registry.load_profiles()
+            expect((found_during_load, self.user_registry.find_user(identifier=f"member{LOAD_CHUNK_SIZE}_abc@") is not None)).to(
+                equal(([True], True))
+            )
+
+        with it("should ask the profile storage when the load doesn't finish in time"):
+            user_registry = UserRegistry(profile_storage=self.profile_storage, preload=False, load_timeout=0.01)
+            expect((user_registry.is_registered_user("Pascal_6df@"), user_registry.is_registered_user("guest_abc@"))).to(
+                equal((True, False))
+            )
+
+        with it("should ask the profile storage when the load failed"):
+
+            def iterate_profiles(total_segments: int = 1):
+                raise ConnectionError("DynamoDB is unreachable")
+                yield
+
+            self.profile_storage.iterate_profiles = iterate_profiles
+            expect(lambda: self.user_registry.load_profiles()).to(raise_error(ConnectionError))
+            expect(self.user_registry.is_registered_user("Pascal_6df@")).to(equal(True))
+
+    with context("when you list a big roster"):
+        with before.each:
+            self.profile_storage = FakeProfileStorage()
+            self.profile_storage.all_profiles = [
+                User(identifier=f"member{index:02}_abc@", security_level=SecurityLevel.USER) for index in range(40)
+            ]
+            self.user_registry = UserRegistry(profile_storage=self.profile_storage)
+            self.user_registry.register_user(identifier="Pascal_6df@", role=SecurityLevel.OWNER)
+
+        with it("should sort the users of a level by username"):
+            expect(self.user_registry.get_user_listing().split("\n")[:4]).to(equal(["OWNER:", "Pascal", "USER:", "member00"]))
+
+        with it("should split the listing in pages"):
+            expect((self.user_registry.count_user_listing_pages(), self.user_registry.get_user_listing(page=2).split("\n")[0])).to(
+                equal((2, "member27"))
+            )
+
+        with context("and a user changes Security Level"):
+            with it("should move the user to the heading of the new level"):
+                self.user_registry.get_user_listing()
+                self.user_registry.register_user(identifier="member05_abc@", role=SecurityLevel.ADMIN)
+                expect(self.user_registry.get_user_listing().split("\n")[:6]).to(
+                    equal(["OWNER:", "Pascal", "ADMIN:", "member05", "USER:", "member00"])
+                )
+
+    with context("when only the privileged users are preloaded"):
+        with before.each:
+            self.profile_storage = FakeProfileStorage()
+            self.profile_storage.all_profiles = [
+                User(identifier="Pascal_6df@", security_level=SecurityLevel.OWNER),
+                User(identifier="Dotty_a1b@", security_level=SecurityLevel.USER),
+            ]
+            self.user_registry = UserRegistry(
+                profile_storage=self.profile_storage, preload_levels=[SecurityLevel.OWNER, SecurityLevel.ADMIN]
+            )
+
+        with it("should only hold the privileged users"):
+            expect(self.user_registry.get_user_listing()).to(equal("OWNER:\nPascal"))
+
+        with it("should fault in a regular user when it is looked up"):
+            user = self.user_registry.find_user(identifier="Dotty_a1b@")
+            expect((user.get_user_clearance_level(), self.profile_storage.retrieved_identifiers)).to(
+                equal((SecurityLevel.USER, ["Dotty_a1b@"]))
+            )
+
+        with it("should only fault in a user once"):
+            self.user_registry.find_user(identifier="Dotty_a1b@")
+            self.user_registry.find_user(identifier="Dotty_a1b@")
+            expect(self.profile_storage.retrieved_identifiers).to(equal(["Dotty_a1b@"]))
+
+        with it("should not store a faulted in user registered with its stored role"):
+            self.user_registry.register_user(identifier="Dotty_a1b@", role=SecurityLevel.USER)
+            expect(self.profile_storage.stored_batches).to(equal([]))
+
+        with it("should only read an unknown guest once"):
+            for _ in range(3):
+                expect(self.user_registry.is_registered_user(identifier="guest_abc@")).to(equal(False))
+            expect(self.profile_storage.retrieved_identifiers).to(equal(["guest_abc@"]))
+
+    with context("when the users are kept in a bounded cache"):
+        with before.each:
+            self.profile_storage = FakeProfileStorage()
+            self.profile_storage.all_profiles = [
+                User(identifier=f"member{index}_abc@", security_level=SecurityLevel.USER) for index in range(5)
+            ]
+            self.user_registry = UserRegistry(profile_storage=self.profile_storage, preload_levels=[], max_cached_users=2)
+
+        with it("should start without any user"):
+            expect(self.user_registry.get_user_listing()).to(equal(""))
+
+        with it("should fault in a user with a single read"):
+            self.user_registry.find_user(identifier="member0_abc@")
+            self.user_registry.find_user(identifier="member0_abc@")
+            expect(self.profile_storage.retrieved_identifiers).to(equal(["member0_abc@"]))
+
+        with it("should evict the least recently used user"):
+            for identifier in ["member0_abc@", "member1_abc@", "member0_abc@", "member2_abc@"]:
+                self.user_registry.find_user(identifier=identifier)
+            expect(self.user_registry.get_user_listing()).to(equal("USER:\nmember0\nmember2"))
+
+        with it("should only read an unknown guest once"):
+            for _ in range(3):
+                expect(self.user_registry.is_registered_user(identifier="guest_abc@")).to(equal(False))
+            expect(self.profile_storage.retrieved_identifiers).to(equal(["guest_abc@"]))
+
+        with it("should fault in an evicted user when every profile was preloaded"):
+            self.profile_storage.all_profiles.append(User(identifier="Pascal_6df@", security_level=SecurityLevel.ADMIN))
+            self.user_registry = UserRegistry(profile_storage=self.profile_storage, max_cached_users=2)
+            self.user_registry.find_user(identifier="member0_abc@")
+            self.user_registry.find_user(identifier="member1_abc@")
+            user = self.user_registry.find_user(identifier="Pascal_6df@")
+            expect((user.get_user_clearance_level(), self.profile_storage.retrieved_identifiers)).to(
+                equal((SecurityLevel.ADMIN, ["member0_abc@", "member1_abc@", "Pascal_6df@"]))
+            )
+
+        with it("should forget an unknown guest once it is registered"):
+            self.user_registry.find_user(identifier="guest_abc@")
+            self.user_registry.register_user(identifier="guest_abc@", role=SecurityLevel.GUEST)
+            expect(self.user_registry.find_user(identifier="guest_abc@").get_user_clearance_level()).to(equal(SecurityLevel.GUEST))
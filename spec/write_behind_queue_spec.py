@@ -0,0 +1,141 @@
+import threading
+
+from expects import equal, expect
+from mamba import after, before, context, describe, it
+
+from bot.batch_writer import BatchWriteReport
+from bot.security_level import SecurityLevel
+from bot.user_registry import UserRegistry
+from bot.write_behind_queue import WriteBehindQueue
+from spec.fakes import FakeProfileStorage
+
+
+with describe("Given a write-behind queue") as self:
+    with before.each:
+        self.batches = []
+        self.flushed = threading.Event()
+
+        def flush(items):
+            self.batches.append(items)
+            self.flushed.set()
+
+        self.flush = flush
+
+    with context("when the same key is written several times before a flush"):
+        with it("should only flush the latest item"):
+            queue = WriteBehindQueue(flush=self.flush, max_delay=60)
+            queue.put(key="pascal", item=1)
+            queue.put(key="pascal", item=2)
+            queue.drain()
+            expect(self.batches).to(equal([[2]]))
+
+    with context("when max_pending keys are waiting"):
+        with it("should flush without waiting for max_delay"):
+            queue = WriteBehindQueue(flush=self.flush, max_delay=60, max_pending=2)
+            queue.put(key="pascal", item=1)
+            queue.put(key="dotty", item=2)
+            expect(self.flushed.wait(timeout=5)).to(equal(True))
+            expect(self.batches).to(equal([[1, 2]]))
+            queue.drain()
+
+    with context("when max_delay has passed"):
+        with it("should flush the pending items"):
+            queue = WriteBehindQueue(flush=self.flush, max_delay=0.01, max_pending=100)
+            queue.put(key="pascal", item=1)
+            expect(self.flushed.wait(timeout=5)).to(equal(True))
+            expect(queue.pending_count()).to(equal(0))
+            queue.drain()
+
+    with context("when a flush fails"):
+        with it("should retry the items"):
+            attempts = []
+
+            def failing_flush(items):
+                attempts.append(items)
+                if len(attempts) == 1:
+                    raise IOError("throttled")
+                self.flushed.set()
+
+            queue = WriteBehindQueue(flush=failing_flush, max_delay=0.01)
+            queue.put(key="pascal", item=1)
+            expect(self.flushed.wait(timeout=5)).to(equal(True))
+            expect(attempts).to(equal([[1], [1]]))
+            queue.drain()
+
+    with context("when a flush leaves items unprocessed"):
+        with it("should retry only the unprocessed items"):
+            attempts = []
+
+            def throttled_flush(items):
+                attempts.append(items)
+                report = BatchWriteReport()
+                if len(attempts) == 1:
+                    report.unprocessed_keys = ["dotty"]
+                else:
+                    self.flushed.set()
+                return report
+
+            queue = WriteBehindQueue(flush=throttled_flush, max_delay=0.05)
+            queue.put(key="pascal", item=1)
+            queue.put(key="dotty", item=2)
+            expect(self.flushed.wait(timeout=5)).to(equal(True))
+            expect(attempts).to(equal([[1, 2], [2]]))
+            queue.drain()
+
+with describe("Given a user registry with a write-behind queue") as self:
+    with before.each:
+        self.profile_storage = FakeProfileStorage()
+        self.write_queue = WriteBehindQueue(flush=self.profile_storage.store_profiles, max_delay=60)
+        self.user_registry = UserRegistry(profile_storage=self.profile_storage, write_queue=self.write_queue)
+
+    with after.each:
+        self.write_queue.drain()
+
+    with context("when a user is registered"):
+        with it("should not write to storage straight away"):
+            self.user_registry.register_user(identifier="Pascal_6df@", role=SecurityLevel.OWNER)
+            expect(self.profile_storage.stored_batches).to(equal([]))
+
+        with it("should write the user when the queue is drained"):
+            self.user_registry.register_user(identifier="Pascal_6df@", role=SecurityLevel.OWNER)
+            self.user_registry.register_user(identifier="Pascal_6df@", role=SecurityLevel.ADMIN)
+            self.write_queue.drain()
+            stored = [(user.get_user_identifier(), user.get_user_clearance_level()) for user in self.profile_storage.all_profiles]
+            expect(stored).to(equal([("Pascal_6df@", SecurityLevel.ADMIN)]))
+
+    with context("when the users are kept in a bounded cache"):
+        with before.each:
+            self.user_registry = UserRegistry(
+                profile_storage=self.profile_storage, write_queue=self.write_queue, preload_levels=[], max_cached_users=2
+            )
+
+        with it("should find an evicted user whose write is still waiting"):
+            self.user_registry.register_user(identifier="bob@", role=SecurityLevel.ADMIN)
+            self.user_registry.register_user(identifier="carol@", role=SecurityLevel.USER)
+            self.user_registry.register_user(identifier="dave@", role=SecurityLevel.USER)
+            expect(self.user_registry.find_user(identifier="bob@").get_user_clearance_level()).to(equal(SecurityLevel.ADMIN))
+            expect(self.user_registry.is_registered_user(identifier="bob@")).to(equal(True))
+
+        with it("should find an evicted user while its write is being flushed"):
+            release = threading.Event()
+            flushing = threading.Event()
+
+            def slow_flush(users):
+                flushing.set()
+                release.wait(timeout=5)
+                return self.profile_storage.store_profiles(users)
+
+            write_queue = WriteBehindQueue(flush=slow_flush, max_delay=0, max_pending=1)
+            user_registry = UserRegistry(
+                profile_storage=self.profile_storage, write_queue=write_queue, preload_levels=[], max_cached_users=1
+            )
+            user_registry.register_user(identifier="bob@", role=SecurityLevel.ADMIN)
+            flushing.wait(timeout=5)
+            user_registry.register_user(identifier="carol@", role=SecurityLevel.USER)
+            found = user_registry.find_user(identifier="bob@")
+            release.set()
+            write_queue.drain()
+            # only the lookups before registering, none for finding bob again
+            expect((found.get_user_clearance_level(), self.profile_storage.retrieved_identifiers)).to(
+                equal((SecurityLevel.ADMIN, ["bob@", "carol@"]))
+            )